@@ -1,14 +1,21 @@
 import os
+import time
+import uuid
+import asyncio
 from fastapi import FastAPI, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import HTMLResponse
 from uvicorn import run as app_run
 from typing import Optional
-from usvisa.constants import APP_HOST, APP_PORT
-from usvisa.pipeline.prediction_pipeline import UsVisaData, UsVisaClassifier
+from usvisa.constants import APP_HOST, APP_PORT, LOG_REQUEST_ID_HEADER
+from usvisa.logger.logger import request_id_var
+from usvisa.pipeline.prediction_pipeline import UsVisaData
+from usvisa.pipeline.inference_pool import InferencePool, InferencePoolSaturatedError
+from usvisa.pipeline.admission_control import AdmissionController, AdmissionRejectedError
+from usvisa.pipeline.model_warmup import ModelWarmup
 from usvisa.pipeline.training_pipeline import TrainingPipeline
 
 app = FastAPI(debug=True)
@@ -21,6 +28,32 @@ app.mount(
 )
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
+# Predictions run on this pool, off the event loop; see InferencePoolConfig for its size and mode
+inference_pool: Optional[InferencePool] = None
+# Bounds the in-flight and queued requests of the routes in config/admission_control.yaml
+admission_controller = AdmissionController()
+# Preloads and warms up the model; /readyz reports ready once it is done
+model_warmup: Optional[ModelWarmup] = None
+warmup_task: Optional[asyncio.Task] = None
+# Reloads and warms up the model when a new version is pushed to S3
+refresh_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_inference_pool():
+    global inference_pool, model_warmup, warmup_task, refresh_task
+    inference_pool = InferencePool()
+    model_warmup = ModelWarmup(inference_pool)
+    # The warm-up runs in the background so /healthz answers while the model loads
+    warmup_task = asyncio.create_task(model_warmup.run())
+    if model_warmup.model_warmup_config.refresh_interval_seconds > 0:
+        refresh_task = asyncio.create_task(model_warmup.watch())
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    if refresh_task is not None:
+        refresh_task.cancel()
+    inference_pool.shutdown()
+
 origins = ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +63,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    limiter = admission_controller.get_limiter(request.url.path)
+    if limiter is None:
+        return await call_next(request)
+    request.state.deadline = admission_controller.get_deadline(request.headers)
+    try:
+        await limiter.acquire(request.state.deadline)
+    except AdmissionRejectedError as e:
+        if e.retry_after_seconds is None:
+            return Response(str(e), status_code=504)
+        return Response(str(e), status_code=503, headers={"Retry-After": str(e.retry_after_seconds)})
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release()
+
+@app.middleware("http")
+async def add_request_id(request: Request, call_next):
+    # Every log record written while serving the request carries its id
+    request_id = request.headers.get(LOG_REQUEST_ID_HEADER) or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[LOG_REQUEST_ID_HEADER] = request_id
+    return response
+
 class DataForm:
     def __init__(self, request: Request):
         self.request: Request = request
@@ -71,6 +133,24 @@ async def about(request: Request):
         {"request": request}
     )
 
+@app.get("/healthz", tags=["monitoring"])
+async def healthz():
+    return JSONResponse({"status": "alive"})
+
+@app.get("/readyz", tags=["monitoring"])
+async def readyz():
+    if model_warmup is None:
+        return JSONResponse({"ready": False}, status_code=503)
+    status = model_warmup.get_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", tags=["monitoring"])
+async def metrics():
+    return JSONResponse({
+        "routes": admission_controller.get_metrics(),
+        "inference_pool": inference_pool.get_metrics() if inference_pool is not None else None
+    })
+
 @app.get("/train", tags=["training"])
 async def trainRouteClient():
     try:
@@ -99,15 +179,26 @@ async def predictRouteClient(request: Request):
             full_time_position=form.full_time_position,
         )
         
-        usvisa_df = usvisa_data.get_usvisa_input_data_frame()
-        model_predictor = UsVisaClassifier()
-        value = model_predictor.predict(dataframe=usvisa_df)[0]
+        # The DataFrame is built on the pool, together with the prediction, which is dropped once the caller's
+        # deadline has passed; a prediction already running on a worker finishes but its result is discarded
+        deadline = getattr(request.state, "deadline", None)
+        timeout = None if deadline is None else deadline - time.monotonic()
+        value = (await asyncio.wait_for(inference_pool.predict(usvisa_data.get_usvisa_data_as_dict()), timeout=timeout))[0]
         status = "Certified" if value == 1 else "Denied"
         
         return templates.TemplateResponse(
             "result.html",
             {"request": request, "context": status}
         )
+    except InferencePoolSaturatedError as e:
+        return templates.TemplateResponse(
+            "result.html",
+            {"request": request, "error": f"Server busy, try again shortly: {e}"},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
+    except asyncio.TimeoutError:
+        return Response("Request deadline exceeded", status_code=504)
     except Exception as e:
         return templates.TemplateResponse(
             "result.html",
@@ -0,0 +1,89 @@
+"""
+Compares the drift check run by DataValidation, which streams both CSV files into ReferenceProfile histograms and
+frequency tables and compares them, with the Evidently Profile path it replaced, on notebooks/dataset/Visa.csv
+scaled up by repetition (with jitter on the numerical columns).
+
+    python benchmarks/drift_benchmark.py --scale 10 --scale 50
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from usvisa.constants import SCHEMA_FILE_PATH, DATA_VALIDATION_PROFILE_N_BINS, DATA_VALIDATION_CHUNK_SIZE
+from usvisa.utils.main_utils import read_yaml_file
+from usvisa.entity.reference_profile import ReferenceProfile
+
+DATASET_FILE_PATH = "notebooks/dataset/Visa.csv"
+
+
+def scale_dataset(df: pd.DataFrame, scale: int, numerical_columns: list, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    scaled_df = pd.concat([df] * scale, ignore_index = True)
+    for column in numerical_columns:
+        scaled_df[column] = scaled_df[column] * rng.normal(1.0, 0.01, size = len(scaled_df))
+    return scaled_df.sample(frac = 1.0, random_state = seed).reset_index(drop = True)
+
+
+def run_native(base_file_path: str, current_file_path: str, schema: dict) -> bool:
+    exclude_columns = schema.get("drift_exclude_columns", [])
+    reference_profile = ReferenceProfile.from_csv(base_file_path,
+                                                  numerical_columns = [c for c in schema["numerical_columns"] if c not in exclude_columns],
+                                                  categorical_columns = [c for c in schema["categorical_columns"] if c not in exclude_columns],
+                                                  n_bins = DATA_VALIDATION_PROFILE_N_BINS,
+                                                  chunk_size = DATA_VALIDATION_CHUNK_SIZE)
+    current_profile = reference_profile.profile_csv(current_file_path, chunk_size = DATA_VALIDATION_CHUNK_SIZE)
+    return reference_profile.compare(current_profile)["dataset_drift"]
+
+
+def run_evidently(base_df: pd.DataFrame, current_df: pd.DataFrame) -> bool:
+    # Imported lazily: Evidently is only needed for this comparison
+    from evidently.model_profile import Profile
+    from evidently.model_profile.sections import DataDriftProfileSection
+
+    profile = Profile(sections = [DataDriftProfileSection()])
+    profile.calculate(base_df, current_df)
+    report = json.loads(profile.json())
+    return report["data_drift"]["data"]["metrics"]["dataset_drift"]
+
+
+def time_call(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type = int, action = "append", help = "Replication factor of Visa.csv (repeatable).")
+    parser.add_argument("--skip-evidently", action = "store_true")
+    args = parser.parse_args()
+
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    df = pd.read_csv(DATASET_FILE_PATH)
+    exclude_columns = schema.get("drift_exclude_columns", [])
+
+    print(f"{'rows':>10} {'native (s)':>12} {'evidently (s)':>14} {'speedup':>8} {'same decision':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_file_path, current_file_path = os.path.join(tmp_dir, "base.csv"), os.path.join(tmp_dir, "current.csv")
+        for scale in args.scale or [1, 10]:
+            scaled_df = scale_dataset(df, scale, schema["numerical_columns"])
+            split = int(len(scaled_df) * 0.8)
+            base_df, current_df = scaled_df.iloc[:split], scaled_df.iloc[split:]
+            # DataValidation streams the validated CSV files, so the native check is timed on files as well
+            base_df.to_csv(base_file_path, index = False)
+            current_df.to_csv(current_file_path, index = False)
+
+            native_time, native_drift = time_call(run_native, base_file_path, current_file_path, schema)
+            if args.skip_evidently:
+                print(f"{len(scaled_df):>10} {native_time:>12.3f} {'-':>14} {'-':>8} {'-':>14}")
+                continue
+            evidently_time, evidently_drift = time_call(run_evidently, base_df.drop(columns = exclude_columns),
+                                                        current_df.drop(columns = exclude_columns))
+            print(f"{len(scaled_df):>10} {native_time:>12.3f} {evidently_time:>14.3f} "
+                  f"{evidently_time / native_time:>7.1f}x {str(native_drift == evidently_drift):>14}")
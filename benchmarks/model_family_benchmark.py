@@ -0,0 +1,64 @@
+"""
+Compares the model families of config/model.yaml on notebooks/dataset/Visa.csv scaled up by repetition: fit time,
+batch and single-row predict throughput and test F1 of the first grid point of every family, on the features of the
+DataTransformation preprocessor. Native categorical families get the same NativeCategoricalEncoder step as in the
+model search.
+
+    python benchmarks/model_family_benchmark.py --scale 10 --threads 4
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+
+from usvisa.constants import SCHEMA_FILE_PATH
+from usvisa.components.data_transformation import DataTransformation
+from usvisa.entity.config_entity import DataTransformationConfig, ModelTrainerConfig
+from usvisa.entity.model_search import ModelSearch
+from usvisa.entity.native_categorical import get_feature_layout
+from usvisa.utils.main_utils import read_yaml_file
+from usvisa.utils.feature_utils import engineer_features
+
+DATASET_FILE_PATH = "notebooks/dataset/Visa.csv"
+
+
+def time_call(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type = int, default = 5, help = "Replication factor of Visa.csv.")
+    parser.add_argument("--threads", type = int, default = 1, help = "OpenMP/BLAS threads per model.")
+    parser.add_argument("--single-rows", type = int, default = 200, help = "Rows predicted one by one.")
+    args = parser.parse_args()
+
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    features, target = engineer_features(pd.concat([pd.read_csv(DATASET_FILE_PATH)] * args.scale, ignore_index = True),
+                                         schema["drop_columns"])
+    preprocessor = DataTransformation(None, None, DataTransformationConfig()).get_data_transformer_object()
+    X = np.ascontiguousarray(preprocessor.fit_transform(features), dtype = np.float32)
+    X_train, X_test, y_train, y_test = train_test_split(X, target, test_size = 0.2, random_state = 42, stratify = target)
+
+    model_search = ModelSearch(ModelTrainerConfig().model_config_file_path, feature_layout = get_feature_layout(preprocessor))
+    first_candidates = {}
+    for module_name, estimator, grid_params in model_search.get_candidates():
+        first_candidates.setdefault(module_name, estimator)
+
+    print(f"{'model':>32} {'fit (s)':>8} {'batch rows/s':>13} {'single rows/s':>14} {'test F1':>8}")
+    with threadpool_limits(limits = args.threads):
+        for module_name, estimator in first_candidates.items():
+            name = type(estimator.steps[-1][1] if hasattr(estimator, "steps") else estimator).__name__
+            _, fit_seconds = time_call(estimator.fit, X_train, y_train)
+            y_pred, batch_seconds = time_call(estimator.predict, X_test)
+            single_rows = X_test[:args.single_rows]
+            _, single_seconds = time_call(lambda: [estimator.predict(single_rows[i:i + 1]) for i in range(len(single_rows))])
+            print(f"{name:>32} {fit_seconds:>8.2f} {len(X_test) / batch_seconds:>13.0f} "
+                  f"{len(single_rows) / single_seconds:>14.0f} {f1_score(y_test, y_pred):>8.4f}")
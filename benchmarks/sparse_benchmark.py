@@ -0,0 +1,77 @@
+"""
+Compares dense and sparse (CSR) feature matrices from the DataTransformation preprocessor on
+notebooks/dataset/Visa.csv scaled up by repetition: matrix size, and fit time and peak traced memory of
+estimators that accept sparse input. --region-cardinality splits region_of_employment into more categories
+to show how the one-hot width drives the difference.
+
+    python benchmarks/sparse_benchmark.py --scale 10 --region-cardinality 50
+"""
+
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from usvisa.constants import SCHEMA_FILE_PATH
+from usvisa.components.data_transformation import DataTransformation
+from usvisa.entity.config_entity import DataTransformationConfig
+from usvisa.utils.main_utils import read_yaml_file
+from usvisa.utils.feature_utils import engineer_features
+
+DATASET_FILE_PATH = "notebooks/dataset/Visa.csv"
+
+
+def load_dataset(scale: int, region_cardinality: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.concat([pd.read_csv(DATASET_FILE_PATH)] * scale, ignore_index = True)
+    if region_cardinality:
+        suffixes = rng.integers(0, region_cardinality, size = len(df)).astype(str)
+        df["region_of_employment"] = df["region_of_employment"] + "_" + suffixes
+    return df
+
+
+def matrix_size_mb(matrix) -> float:
+    if sp.issparse(matrix):
+        return (matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 1024 ** 2
+    return matrix.nbytes / 1024 ** 2
+
+
+def profile_fit(estimator, X, y) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    seconds = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak_memory / 1024 ** 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type = int, default = 5, help = "Replication factor of Visa.csv.")
+    parser.add_argument("--region-cardinality", type = int, default = 0,
+                        help = "Split every region into this many categories (0 keeps the original regions).")
+    args = parser.parse_args()
+
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    features, target = engineer_features(load_dataset(args.scale, args.region_cardinality), schema["drop_columns"])
+    data_transformation = DataTransformation(None, None, DataTransformationConfig())
+    estimators = {
+        "RandomForestClassifier": lambda: RandomForestClassifier(n_estimators = 9, max_depth = 15, random_state = 42),
+        "LogisticRegression": lambda: LogisticRegression(max_iter = 200)
+    }
+
+    print(f"{'rows':>10} {'format':>7} {'columns':>8} {'size (MB)':>10} {'estimator':>24} {'fit (s)':>8} {'peak (MB)':>10}")
+    for sparse in (False, True):
+        preprocessor = data_transformation.get_data_transformer_object(sparse = sparse)
+        X = preprocessor.fit_transform(features)
+        X = sp.csr_matrix(X, dtype = np.float32) if sparse else np.ascontiguousarray(X, dtype = np.float32)
+        for name, make_estimator in estimators.items():
+            seconds, peak_memory_mb = profile_fit(make_estimator(), X, target)
+            print(f"{X.shape[0]:>10} {'csr' if sparse else 'dense':>7} {X.shape[1]:>8} {matrix_size_mb(X):>10.2f} "
+                  f"{name:>24} {seconds:>8.2f} {peak_memory_mb:>10.2f}")
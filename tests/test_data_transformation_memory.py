@@ -0,0 +1,76 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from usvisa.constants import DATA_TRANSFORMATION_MAX_PEAK_MEMORY_RATIO, CURRENT_YEAR
+from usvisa.components.data_transformation import DataTransformation
+from usvisa.entity.config_entity import DataTransformationConfig
+from usvisa.utils.feature_utils import engineer_features
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+N_ROWS = 20000
+
+
+@pytest.fixture
+def data_transformation(monkeypatch) -> DataTransformation:
+    # The schema and transformation configs are read from paths relative to the project root
+    monkeypatch.chdir(PROJECT_ROOT)
+    return DataTransformation(data_ingestion_artifact = None, data_validation_artifact = None,
+                              data_transformation_config = DataTransformationConfig())
+
+
+def make_dataset(schema_config: dict, n_rows: int, random_state: int = 42) -> pd.DataFrame:
+    """
+    Builds a raw dataset with the schema columns, categories drawn from the allowed categories.
+    """
+    rng = np.random.default_rng(random_state)
+    dataframe = pd.DataFrame({"case_id": [f"EZYV{i}" for i in range(n_rows)]})
+    for column, categories in schema_config["allowed_categories"].items():
+        dataframe[column] = rng.choice(categories, size = n_rows)
+    dataframe["no_of_employees"] = rng.integers(1, 100000, size = n_rows)
+    dataframe["yr_of_estab"] = rng.integers(1800, CURRENT_YEAR, size = n_rows)
+    dataframe["prevailing_wage"] = rng.integers(100, 300000, size = n_rows)
+    return dataframe[[next(iter(column)) for column in schema_config["columns"]]]
+
+
+def get_peak_memory_ratio(dataframe: pd.DataFrame, drop_cols: list, transform) -> float:
+    """
+    Runs the feature engineering and `transform` on `dataframe` and returns their traced peak memory as a multiple
+    of the in-memory size of the raw data.
+    """
+    raw_data_size = int(dataframe.memory_usage(deep = True).sum())
+    tracemalloc.start()
+    try:
+        features, _ = engineer_features(dataframe, drop_cols)
+        transform(features)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak_memory / raw_data_size
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_fit_transform_peak_memory_is_bounded(data_transformation, sparse):
+    preprocessor = data_transformation.get_data_transformer_object(sparse = sparse)
+    dataframe = make_dataset(data_transformation._schema_config, N_ROWS)
+
+    peak_memory_ratio = get_peak_memory_ratio(dataframe, data_transformation._schema_config["drop_columns"],
+                                              preprocessor.fit_transform)
+
+    assert peak_memory_ratio <= DATA_TRANSFORMATION_MAX_PEAK_MEMORY_RATIO
+
+
+def test_transform_peak_memory_is_bounded(data_transformation):
+    preprocessor = data_transformation.get_data_transformer_object(sparse = False)
+    train_df = make_dataset(data_transformation._schema_config, N_ROWS, random_state = 0)
+    features, _ = engineer_features(train_df, data_transformation._schema_config["drop_columns"])
+    preprocessor.fit(features)
+    dataframe = make_dataset(data_transformation._schema_config, N_ROWS, random_state = 1)
+
+    peak_memory_ratio = get_peak_memory_ratio(dataframe, data_transformation._schema_config["drop_columns"],
+                                              preprocessor.transform)
+
+    assert peak_memory_ratio <= DATA_TRANSFORMATION_MAX_PEAK_MEMORY_RATIO
@@ -2,8 +2,9 @@ import os
 import sys
 import boto3
 import pickle
+import numpy as np
 import pandas as pd
-from io import StringIO
+from io import BytesIO, StringIO
 from typing import List, Union
 from mypy_boto3_s3.service_resource import Bucket
 from botocore.exceptions import ClientError
@@ -23,9 +24,16 @@ class SimpleStorageService:
     modular, allowing for easy integration into larger applications that require AWS S3 storage operations.
     """
     def __init__(self):
-        s3 = S3Client()
-        self.s3_resource = s3.s3_resource
-        self.s3_client = s3.s3_client
+        self.s3 = S3Client()
+
+    @property
+    def s3_resource(self):
+        # Resources are not thread-safe, so every thread uses its own
+        return self.s3.s3_resource
+
+    @property
+    def s3_client(self):
+        return self.s3.s3_client
 
     def s3_key_path_available(self, bucket_name, s3_key)->bool:
         try:
@@ -40,6 +48,24 @@ class SimpleStorageService:
         except Exception as e:
             raise UsVisaException(e, sys)
     
+    def get_object_version(self, bucket_name: str, s3_key: str) -> Union[str, None]:
+        """
+        This method returns the ETag and, in versioned buckets, the version id of the s3_key object without
+        downloading it, or None when the object does not exist.
+        """
+        try:
+            response = self.s3_client.head_object(Bucket = bucket_name, Key = s3_key)
+            etag = response["ETag"].strip('"')
+            return f"{etag}:{response.get('VersionId', '')}"
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise UsVisaException(e, sys)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
     @staticmethod
     def read_object(object_name: str, decode: bool = True, make_readable: bool = False) -> Union[StringIO, str]:
         """
@@ -103,6 +129,17 @@ class SimpleStorageService:
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    def load_numpy_array(self, file_name: str, bucket_name: str) -> np.ndarray:
+        """
+        This method loads the file_name NumPy array, saved with np.save, from bucket_name bucket.
+        """
+        try:
+            file_object = self.get_file_object(file_name, bucket_name)
+            return np.load(BytesIO(self.read_object(file_object, decode = False)), allow_pickle = False)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         This method creates a folder_name folder in bucket_name bucket.
@@ -125,7 +162,7 @@ class SimpleStorageService:
             logging.info(
                 f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket"
             )
-            self.s3_resource.meta.client.upload_file(from_filename, bucket_name, to_filename)
+            self.s3_client.upload_file(from_filename, bucket_name, to_filename)
 
             logging.info(
                 f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket"
@@ -4,6 +4,7 @@ import sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
 from usvisa.logger.logger import logging
 from usvisa.data_access.data import UsVisaData
 
@@ -50,7 +51,8 @@ class DataIngestion:
         try:
             logging.info("Entered training and testing split method of Data Ingestion class")
             train_set, test_set = train_test_split(
-                dataframe, test_size = self.data_ingestion_config.train_test_split_ratio
+                dataframe, test_size = self.data_ingestion_config.train_test_split_ratio,
+                random_state = self.data_ingestion_config.random_state
             )
             dir_path = os.path.dirname(self.data_ingestion_config.training_file_path)
             os.makedirs(dir_path, exist_ok = True)
@@ -67,6 +69,7 @@ class DataIngestion:
         except Exception as e:
             raise UsVisaException(e, sys)
 
+    @profile_stage
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         """
         Initiates the data ingestion components of training pipeline.
@@ -1,17 +1,24 @@
 import os
 import sys
+import dataclasses
+from typing import Tuple
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
+import scipy.sparse as sp
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder, PowerTransformer
 from sklearn.compose import ColumnTransformer
 
 from usvisa.logger.logger import logging
 from usvisa.exception.exception import UsVisaException
-from usvisa.entity.estimator import TargetValueMapping
-from usvisa.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, CURRENT_YEAR
-from usvisa.utils.main_utils import save_numpy_array_data, save_object, drop_columns, read_yaml_file
+from usvisa.utils.profiling_utils import profile_stage
+from usvisa.constants import SCHEMA_FILE_PATH, DATA_TRANSFORMATION_FEATURES_DTYPE, DATA_TRANSFORMATION_TARGET_DTYPE
+from usvisa.utils.main_utils import (save_numpy_array_data, load_numpy_array_data, save_feature_matrix, save_object,
+                                     read_yaml_file, write_yaml_file, trace_memory, time_step)
+from usvisa.utils.feature_utils import engineer_features
+from usvisa.utils.resampling_utils import get_resampler, resample, merge_resampling_reports
+from usvisa.utils.streaming_utils import read_chunks, RowSampler, NpyChunkWriter
+from sklearn.utils.class_weight import compute_sample_weight
 
 from usvisa.entity.config_entity import DataTransformationConfig
 from usvisa.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
@@ -30,6 +37,18 @@ class DataTransformation:
             self.data_validation_artifact = data_validation_artifact
             self.data_transformation_config = data_transformation_config
             self._schema_config = read_yaml_file(file_path = SCHEMA_FILE_PATH)
+            self._transformation_config = read_yaml_file(file_path = self.data_transformation_config.transformation_config_file_path)
+
+            # Sparse features are stored as CSR .npz files; the streaming mode always writes dense arrays
+            self.streaming = self._transformation_config.get("streaming", {}).get("enabled", False)
+            self.sparse_features = self._transformation_config.get("features", {}).get("sparse", False) and not self.streaming
+            if self.sparse_features:
+                self.data_transformation_config = dataclasses.replace(
+                    self.data_transformation_config,
+                    transformed_train_features_file_path = os.path.splitext(
+                        self.data_transformation_config.transformed_train_features_file_path)[0] + ".npz",
+                    transformed_test_features_file_path = os.path.splitext(
+                        self.data_transformation_config.transformed_test_features_file_path)[0] + ".npz")
 
         except Exception as e:
             raise UsVisaException(e, sys)
@@ -42,11 +61,12 @@ class DataTransformation:
             raise UsVisaException(e, sys)
         
          
-    def get_data_transformer_object(self) -> Pipeline:
+    def get_data_transformer_object(self, sparse: bool = None) -> Pipeline:
         """
         Create a data transformation pipeline that includes scaling, encoding, and transformation.
         This method initializes the necessary transformers and returns a pipeline object that can be used
-        to preprocess the data. 
+        to preprocess the data. With `sparse` (by default the `features.sparse` setting of the transformation YAML),
+        the output is a CSR matrix that keeps the one-hot columns sparse; otherwise it is always dense.
         """
         try:
             standard_scaler = StandardScaler()
@@ -70,7 +90,8 @@ class DataTransformation:
                     ("Ordinal_Encoder", ordinal_encoder, or_columns),
                     ("Transformer", transform_pipeline, transform_columns),
                     ("StandardScaler", standard_scaler, num_features)
-                ]
+                ],
+                sparse_threshold = 1.0 if (self.sparse_features if sparse is None else sparse) else 0.0
             )
             logging.info("Created preprocessor object from ColumnTransformer")
             return preprocessor
@@ -78,74 +99,255 @@ class DataTransformation:
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    def save_memory_profile(self, memory_profile: dict, raw_data_size: int) -> None:
+        """
+        Writes the per-step profile with the peak of the traced preprocessor calls expressed as a multiple of the raw
+        data size, and warns when that ratio exceeds the configured limit.
+        """
+        try:
+            peaks = [step["peak_memory_mb"] for steps in memory_profile.values() for step in steps.values()
+                     if "peak_memory_mb" in step]
+            raw_data_mb = raw_data_size / 1024 ** 2
+            peak_memory_ratio = max(peaks, default = 0.0) / raw_data_mb if raw_data_mb else 0.0
+            memory_profile["raw_data_mb"] = round(raw_data_mb, 2)
+            memory_profile["peak_memory_ratio"] = round(peak_memory_ratio, 2)
+            write_yaml_file(self.data_transformation_config.memory_profile_file_path, memory_profile, replace = True)
+
+            if peak_memory_ratio > self.data_transformation_config.max_peak_memory_ratio:
+                logging.warning(f"Data transformation peaked at {peak_memory_ratio:.2f}x the raw data size, "
+                                f"above the limit of {self.data_transformation_config.max_peak_memory_ratio}x")
+            else:
+                logging.info(f"Data transformation peaked at {peak_memory_ratio:.2f}x the raw data size")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def transform_in_memory(self, preprocessor: ColumnTransformer, resampler: object, memory_profile: dict) -> Tuple[dict, int]:
+        """
+        Fits the preprocessor on the whole training frame, transforms and resamples both datasets in memory and saves
+        the transformed arrays. Returns the resampling report and the in-memory size of the raw data.
+        """
+        try:
+            drop_cols = self._schema_config['drop_columns']
+            resampling_config = self._transformation_config["resampling"]
+
+            # Read the validated training and testing data, rejected rows were quarantined by data validation
+            features, targets, raw_data_size = {}, {}, 0
+            for dataset, file_path in [("train", self.data_validation_artifact.valid_train_file_path),
+                                       ("test", self.data_validation_artifact.valid_test_file_path)]:
+                dataset_profile = memory_profile.setdefault(dataset, {})
+                with time_step(dataset_profile, "read_data"):
+                    dataframe = DataTransformation.read_data(file_path = file_path)
+                raw_data_size += int(dataframe.memory_usage(deep = True).sum())
+
+                features[dataset], targets[dataset] = engineer_features(dataframe, drop_cols, dataset_profile)
+                del dataframe
+                logging.info(f"Got the input features and target features of {dataset} dataset")
+
+            # Apply the preprocessor to the training and testing data, the only steps whose memory is traced
+            logging.info("Applying preprocessing object on training and testing dataframe")
+            with trace_memory(memory_profile["train"], "fit_transform"):
+                input_feature_train_arr = preprocessor.fit_transform(features.pop("train"))
+            with trace_memory(memory_profile["test"], "transform"):
+                input_feature_test_arr = preprocessor.transform(features.pop("test"))
+
+            # Data balancing with the configured resampling method
+            with time_step(memory_profile["train"], "resample"):
+                input_feature_train_final, target_feature_train_final, train_resampling_report = resample(
+                    input_feature_train_arr, targets["train"], resampler,
+                    chunk_size = resampling_config.get("chunk_size"), random_state = resampling_config.get("random_state"))
+            del input_feature_train_arr
+            resampling_report = {"method": resampling_config["method"], "train": train_resampling_report}
+
+            if resampling_config.get("resample_test", True):
+                with time_step(memory_profile["test"], "resample"):
+                    input_feature_test_final, target_feature_test_final, test_resampling_report = resample(
+                        input_feature_test_arr, targets["test"], resampler,
+                        chunk_size = resampling_config.get("chunk_size"), random_state = resampling_config.get("random_state"))
+                resampling_report["test"] = test_resampling_report
+            else:
+                input_feature_test_final, target_feature_test_final = input_feature_test_arr, targets["test"]
+            del input_feature_test_arr
+            logging.info("Applied resampling on training and testing dataset")
+
+            # Features and target are saved apart to avoid stacking copies
+            with time_step(memory_profile.setdefault("save", {}), "save_arrays"):
+                save_feature_matrix(self.data_transformation_config.transformed_train_features_file_path,
+                                    input_feature_train_final, dtype = DATA_TRANSFORMATION_FEATURES_DTYPE)
+                save_feature_matrix(self.data_transformation_config.transformed_test_features_file_path,
+                                    input_feature_test_final, dtype = DATA_TRANSFORMATION_FEATURES_DTYPE)
+                for file_path, array in [
+                    (self.data_transformation_config.transformed_train_target_file_path, target_feature_train_final),
+                    (self.data_transformation_config.transformed_test_target_file_path, target_feature_test_final)
+                ]:
+                    save_numpy_array_data(file_path, array = np.ascontiguousarray(array, dtype = DATA_TRANSFORMATION_TARGET_DTYPE))
+            return resampling_report, raw_data_size
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def fit_preprocessor_out_of_core(self, preprocessor: ColumnTransformer, file_path: str) -> None:
+        """
+        Fits the preprocessor in one pass over chunks of the training data without loading it whole.
+        The encoders get the categories declared in the schema, or those seen in the chunks, sorted like a regular
+        fit would sort them. The StandardScaler statistics are accumulated with partial_fit, and the remaining steps
+        (the Yeo-Johnson lambdas of the PowerTransformer) are fit on a uniform row sample.
+        """
+        try:
+            streaming_config = self._transformation_config["streaming"]
+            drop_cols = self._schema_config['drop_columns']
+            oh_columns = self._schema_config['oh_columns']
+            or_columns = self._schema_config['or_columns']
+            num_features = self._schema_config['num_features']
+            declared_categories = self._schema_config.get("allowed_categories") or {}
+
+            seen_categories = {column: set() for column in oh_columns + or_columns if column not in declared_categories}
+            standard_scaler = StandardScaler()
+            row_sampler = RowSampler(streaming_config["sample_size"], random_state = streaming_config.get("random_state"))
+
+            for chunk in read_chunks(file_path, streaming_config["chunk_size"]):
+                features, _ = engineer_features(chunk, drop_cols)
+                for column, categories in seen_categories.items():
+                    categories.update(features[column].dropna().unique())
+                standard_scaler.partial_fit(features[num_features])
+                row_sampler.update(features)
+
+            categories = {column: sorted(map(str, declared_categories[column])) if column in declared_categories
+                          else sorted(seen_categories[column]) for column in oh_columns + or_columns}
+            preprocessor.set_params(OneHotEncoder__categories = [categories[column] for column in oh_columns],
+                                    Ordinal_Encoder__categories = [categories[column] for column in or_columns])
+            preprocessor.fit(row_sampler.sample)
+
+            # The scaler fitted on the sample is given the statistics of the full data
+            fitted_scaler = preprocessor.named_transformers_["StandardScaler"]
+            for attribute in ("mean_", "var_", "scale_", "n_samples_seen_"):
+                setattr(fitted_scaler, attribute, getattr(standard_scaler, attribute))
+            logging.info(f"Fitted the preprocessor out of core on {standard_scaler.n_samples_seen_} rows of {file_path}")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def transform_file_out_of_core(self, preprocessor: ColumnTransformer, file_path: str, features_file_path: str,
+                                   target_file_path: str, resampler: object, memory_profile: dict) -> Tuple[dict, int]:
+        """
+        Transforms and resamples a dataset chunk by chunk, appending every chunk to the on-disk feature and target
+        arrays. The memory of the preprocessor call is traced per chunk and the chunk with the highest peak is kept
+        in `memory_profile`. Returns the merged resampling report and the in-memory size of the raw data.
+        """
+        try:
+            drop_cols = self._schema_config['drop_columns']
+            resampling_config = self._transformation_config["resampling"]
+            features_writer = NpyChunkWriter(features_file_path, DATA_TRANSFORMATION_FEATURES_DTYPE)
+            target_writer = NpyChunkWriter(target_file_path, DATA_TRANSFORMATION_TARGET_DTYPE)
+
+            chunk_reports, raw_data_size = [], 0
+            for chunk in read_chunks(file_path, self._transformation_config["streaming"]["chunk_size"]):
+                raw_data_size += int(chunk.memory_usage(deep = True).sum())
+                features, target = engineer_features(chunk, drop_cols)
+                chunk_profile = {}
+                with trace_memory(chunk_profile, "transform"):
+                    transformed = preprocessor.transform(features)
+                if chunk_profile["transform"]["peak_memory_mb"] >= memory_profile.get("transform", {}).get("peak_memory_mb", 0):
+                    memory_profile["transform"] = chunk_profile["transform"]
+                if sp.issparse(transformed):
+                    transformed = transformed.toarray()
+                transformed, target, chunk_report = resample(transformed, target, resampler,
+                                                             random_state = resampling_config.get("random_state"))
+                chunk_reports.append(chunk_report)
+                features_writer.write(transformed)
+                target_writer.write(target)
+
+            features_writer.close()
+            target_writer.close()
+            logging.info(f"Transformed {file_path} out of core into {features_writer.n_rows} rows")
+            return merge_resampling_reports(chunk_reports), raw_data_size
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def transform_out_of_core(self, preprocessor: ColumnTransformer, resampler: object, memory_profile: dict) -> Tuple[dict, int]:
+        """
+        Streaming counterpart of `transform_in_memory`: a first pass over the training chunks fits the preprocessor
+        and a second pass over each dataset transforms and resamples it into the on-disk arrays, so the data size is
+        bounded by disk rather than memory. Resampling is applied to each chunk independently.
+        """
+        try:
+            resampling_config = self._transformation_config["resampling"]
+            with time_step(memory_profile.setdefault("train", {}), "fit_pass"):
+                self.fit_preprocessor_out_of_core(preprocessor, self.data_validation_artifact.valid_train_file_path)
+
+            resampling_report, raw_data_size = {"method": resampling_config["method"]}, 0
+            for dataset, file_path, features_file_path, target_file_path, dataset_resampler in [
+                ("train", self.data_validation_artifact.valid_train_file_path,
+                 self.data_transformation_config.transformed_train_features_file_path,
+                 self.data_transformation_config.transformed_train_target_file_path, resampler),
+                ("test", self.data_validation_artifact.valid_test_file_path,
+                 self.data_transformation_config.transformed_test_features_file_path,
+                 self.data_transformation_config.transformed_test_target_file_path,
+                 resampler if resampling_config.get("resample_test", True) else None)
+            ]:
+                dataset_profile = memory_profile.setdefault(dataset, {})
+                with time_step(dataset_profile, "transform_pass"):
+                    resampling_report[dataset], dataset_size = self.transform_file_out_of_core(
+                        preprocessor, file_path, features_file_path, target_file_path, dataset_resampler, dataset_profile)
+                raw_data_size += dataset_size
+            return resampling_report, raw_data_size
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
     def initiate_data_transformation(self):
         """
         Initiates the data transformation process by applying the preprocessor to the training and testing datasets.
-        It also handles the addition of new features, such as 'company_age', and applies data balancing techniques like SMOTEENN.
-        The transformed data is saved as numpy arrays, and the preprocessor object is saved for future use.
+        Both datasets go through the same in-place feature engineering, which adds new features such as 'company_age',
+        and the classes are balanced with the resampling method configured in the transformation YAML (SMOTEENN by default).
+        With streaming enabled in the transformation YAML, the preprocessor is fit and applied out of core in chunks.
+        Features and targets are saved as separate float32 and int8 arrays, which the model trainer memory-maps
+        (a float32 CSR matrix for sparse features), and the preprocessor object is saved for future use.
+        The time of every step and the traced memory of the preprocessor calls go to the memory profile.
         """
         try:
             # Check if data validation was successful
             if self.data_validation_artifact.validation_status:
+                memory_profile = {}
                 preprocessor = self.get_data_transformer_object()
                 logging.info("Got the preprocessor object")
 
-                # Read the training and testing data
-                train_df = DataTransformation.read_data(file_path = self.data_ingestion_artifact.train_file_path)
-                test_df = DataTransformation.read_data(file_path = self.data_ingestion_artifact.test_file_path)
-
-                input_feature_train_df = train_df.drop(columns = [TARGET_COLUMN], axis = 1)
-                target_feature_train_df = train_df[TARGET_COLUMN]
-                logging.info("Got the input features and target features of training dataset")
-
-                input_feature_train_df['company_age'] = CURRENT_YEAR - input_feature_train_df['yr_of_estab']
-                logging.info("Added company_age column to the training dataset")
-                drop_cols = self._schema_config['drop_columns']
-                logging.info("Dropped the columns in drop_cols of training dataset")
-                input_feature_train_df = drop_columns(df = input_feature_train_df, cols = drop_cols)
-                
-                target_feature_train_df = target_feature_train_df.replace(
-                    TargetValueMapping()._asdict()
-                )
-
-                input_feature_test_df = test_df.drop(columns = [TARGET_COLUMN], axis = 1)
-                target_feature_test_df = test_df[TARGET_COLUMN]
-                logging.info("Got the input features and target features of testing dataset")
-
-                input_feature_test_df['company_age'] = CURRENT_YEAR - input_feature_test_df['yr_of_estab']
-                logging.info("Added company_age column to the testing dataset")
-                logging.info("Dropped the columns in drop_cols of testing dataset")
-                input_feature_test_df = drop_columns(df = input_feature_test_df, cols = drop_cols)
-                
-                target_feature_test_df = target_feature_test_df.replace(
-                    TargetValueMapping()._asdict()
-                )
-                # Apply the preprocessor to the training and testing data
-                logging.info("Applying preprocessing object on training and testing dataframe")
-                input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
-                input_feature_test_arr = preprocessor.transform(input_feature_test_df)
+                resampling_config = self._transformation_config["resampling"]
+                logging.info(f"Using {resampling_config['method']} resampling")
+                resampler = get_resampler(resampling_config)
 
-                # Data balancing using SMOTEENN
-                logging.info("Applying SMOTEENN on training dataset")
-                smoteen = SMOTEENN(sampling_strategy = "minority")
+                if self.streaming:
+                    resampling_report, raw_data_size = self.transform_out_of_core(preprocessor, resampler, memory_profile)
+                else:
+                    resampling_report, raw_data_size = self.transform_in_memory(preprocessor, resampler, memory_profile)
+                write_yaml_file(self.data_transformation_config.resampling_report_file_path, resampling_report, replace = True)
+                logging.info("Saved the transformed train and test arrays")
 
-                input_feature_train_final, target_feature_train_final = smoteen.fit_resample(input_feature_train_arr, target_feature_train_df)
-                input_feature_test_final, target_feature_test_final = smoteen.fit_resample(input_feature_test_arr, target_feature_test_df)
-                logging.info("Applied SMOTEENN on training and testing dataset")
-
-                # Save the preprocessor and transformed data
-                train_arr = np.c_[input_feature_train_final, np.array(target_feature_train_final)]
-                test_arr = np.c_[input_feature_test_final, np.array(target_feature_test_final)]
+                # Class weighting replaces resampling: balanced sample weights are stored for the model trainer
+                train_sample_weight_file_path = None
+                if resampling_config["method"] == "class_weight":
+                    train_sample_weight_file_path = self.data_transformation_config.train_sample_weight_file_path
+                    target_feature_train = load_numpy_array_data(
+                        self.data_transformation_config.transformed_train_target_file_path, mmap_mode = "r")
+                    save_numpy_array_data(train_sample_weight_file_path,
+                                          array = compute_sample_weight("balanced", target_feature_train))
 
                 save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-                save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, array = train_arr)
-                save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, array = test_arr)
                 logging.info("Saved the preprocessor object")
 
+                self.save_memory_profile(memory_profile, raw_data_size)
+
                 data_transformation_artifact = DataTransformationArtifact(
                     transformed_object_file_path = self.data_transformation_config.transformed_object_file_path,
-                    transformed_train_file_path = self.data_transformation_config.transformed_train_file_path,
-                    transformed_test_file_path = self.data_transformation_config.transformed_test_file_path
+                    transformed_train_features_file_path = self.data_transformation_config.transformed_train_features_file_path,
+                    transformed_train_target_file_path = self.data_transformation_config.transformed_train_target_file_path,
+                    transformed_test_features_file_path = self.data_transformation_config.transformed_test_features_file_path,
+                    transformed_test_target_file_path = self.data_transformation_config.transformed_test_target_file_path,
+                    resampling_report_file_path = self.data_transformation_config.resampling_report_file_path,
+                    train_sample_weight_file_path = train_sample_weight_file_path,
+                    memory_profile_file_path = self.data_transformation_config.memory_profile_file_path
                 )
                 return data_transformation_artifact
             
@@ -153,4 +355,4 @@ class DataTransformation:
                 raise Exception(self.data_validation_artifact.validation_status)
 
         except Exception as e:
-            raise UsVisaException(e, sys)
\ No newline at end of file
+            raise UsVisaException(e, sys)
@@ -1,13 +1,16 @@
 import os
 import sys
-import json
+import dataclasses
 import pandas as pd
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
+from typing import List, Optional, Tuple
 
 from usvisa.logger.logger import logging
-from usvisa.utils.main_utils import read_yaml_file, write_yaml_file
+from usvisa.utils.main_utils import read_yaml_file, write_json_file
+from usvisa.utils.validation_utils import learn_allowed_categories, get_row_validation_rules, validate_file
+from usvisa.entity.reference_profile import ReferenceProfile
+from usvisa.entity.s3_estimator import UsVisaEstimator
 from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
 from usvisa.constants import SCHEMA_FILE_PATH
 
 from usvisa.entity.config_entity import DataValidationConfig
@@ -17,8 +20,9 @@ from usvisa.entity.artifact_entity import DataIngestionArtifact, DataValidationA
 class DataValidation:
     """
     DataValidation class is responsible for validating the data ingested by the Data Ingestion component.
-    It checks for the presence of required columns, data types, and performs statistical tests to ensure
-    that the data meets the expected schema and quality standards.
+    It checks for the presence of required columns, validates every row (types, nulls, ranges and allowed categories)
+    while quarantining the rejected rows, and performs statistical tests to ensure that the data meets the expected
+    schema and quality standards.
     """
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationConfig):
         try:
@@ -30,14 +34,14 @@ class DataValidation:
             raise UsVisaException(e, sys)
         
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_header(file_path) -> pd.DataFrame:
         """
-        Reads data from the specified file path and returns it as a pandas DataFrame.
+        Reads only the header of a CSV file, as an empty DataFrame, for the column checks.
         """
         try:
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"The file {file_path} does not exist.")
-            return pd.read_csv(file_path)
+            return pd.read_csv(file_path, nrows = 0)
         
         except Exception as e:
             raise UsVisaException(e, sys)
@@ -82,46 +86,128 @@ class DataValidation:
         except Exception as e:
             raise UsVisaException(e, sys)
         
-    def detect_dataset_drift(self, base_df: pd.DataFrame, current_df: pd.DataFrame, threshold = 0.05) -> bool:
+    def get_row_validation_rules(self, train_file_path: str) -> dict:
         """
-        Detects dataset drift between a reference (base) dataset and a new (current) dataset
-        using the Evidently library's metrics API. It compares the statistical properties of the two datasets to identify significant changes.
-        If drift is detected, it generates a report and saves it in the specified file path.
+        Builds the row validation rules from the schema. Allowed values of categorical columns that are neither
+        declared in the schema nor dropped before training are learned from the training data.
         """
         try:
-            # Use Evidently's DataDrift
-            data_drift_profile = Profile(sections = [DataDriftProfileSection()])
-            data_drift_profile.calculate(base_df, current_df) 
-            
-            report = data_drift_profile.json()
-            json_report = json.loads(report)
+            declared_columns = (self._scheme_config.get("allowed_categories") or {}).keys()
+            learned_columns = [column for column in self._scheme_config["categorical_columns"]
+                               if column not in declared_columns and column not in self._scheme_config["drop_columns"]]
+            learned_categories = learn_allowed_categories(train_file_path, learned_columns,
+                                                          chunk_size = self.data_validation_config.chunk_size)
+            return get_row_validation_rules(self._scheme_config, learned_categories)
+        
+        except Exception as e:
+            raise UsVisaException(e, sys)
 
+    def validate_rows(self, file_path: str, valid_file_path: str, invalid_file_path: str, rules: dict) -> Tuple[int, int]:
+        """
+        Splits a file into valid rows and quarantined rows with their rejection reasons.
+        """
+        try:
+            return validate_file(file_path, valid_file_path, invalid_file_path, rules,
+                                 chunk_size = self.data_validation_config.chunk_size,
+                                 n_jobs = self.data_validation_config.n_jobs)
+        
+        except Exception as e:
+            raise UsVisaException(e, sys)
 
-            write_yaml_file(file_path = self.data_validation_config.drift_report_file_path, content = json_report)
+    def get_drift_columns(self) -> Tuple[List[str], List[str]]:
+        """
+        Returns the numerical and categorical schema columns that are tested for drift.
+        """
+        exclude_columns = self._scheme_config.get("drift_exclude_columns", [])
+        numerical_columns = [column for column in self._scheme_config["numerical_columns"] if column not in exclude_columns]
+        categorical_columns = [column for column in self._scheme_config["categorical_columns"] if column not in exclude_columns]
+        return numerical_columns, categorical_columns
 
-            n_features = json_report["data_drift"]["data"]["metrics"]["n_features"]
-            n_drifted_features = json_report["data_drift"]["data"]["metrics"]["n_drifted_features"]
+    def save_drift_report(self, report: dict, report_file_path: str = None) -> bool:
+        """
+        Writes the drift report as JSON, by default to the drift report file, and returns the dataset-level drift decision.
+        """
+        try:
+            report_file_path = self.data_validation_config.drift_report_file_path if report_file_path is None else report_file_path
+            write_json_file(file_path = report_file_path, content = report)
+
+            n_features = report["n_features"]
+            n_drifted_features = report["n_drifted_features"]
             logging.info(f"{n_drifted_features}/{n_features} drift detected among features.")
 
-            drift_status = json_report["data_drift"]["data"]["metrics"]["dataset_drift"]
+            drift_status = report["dataset_drift"]
             return drift_status
         
         except Exception as e:
             raise UsVisaException(e, sys)
+
+    def build_reference_profile(self, file_path: str) -> ReferenceProfile:
+        """
+        Streams the reference data into a ReferenceProfile and saves it with the validation artifacts.
+        """
+        try:
+            numerical_columns, categorical_columns = self.get_drift_columns()
+            reference_profile = ReferenceProfile.from_csv(file_path,
+                                                          numerical_columns = numerical_columns,
+                                                          categorical_columns = categorical_columns,
+                                                          n_bins = self.data_validation_config.profile_n_bins,
+                                                          chunk_size = self.data_validation_config.chunk_size)
+            reference_profile.save(self.data_validation_config.reference_profile_file_path)
+            return reference_profile
+        
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_production_reference_profile(self) -> Optional[ReferenceProfile]:
+        """
+        Loads the reference profile stored with the production model, or returns None when no model has been pushed
+        yet or the model has no profile.
+        """
+        try:
+            usvisa_estimator = UsVisaEstimator(bucket_name = self.data_validation_config.model_bucket_name,
+                                               model_path = self.data_validation_config.s3_model_key_path)
+            if not usvisa_estimator.is_model_present(model_path = self.data_validation_config.s3_model_key_path):
+                return None
+            return getattr(usvisa_estimator.load_model(), "reference_profile", None)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def detect_dataset_drift_from_profile(self, reference_profile: ReferenceProfile, current_file_path: str,
+                                          report_file_path: str = None) -> bool:
+        """
+        Detects dataset drift by streaming the current data in chunks against a reference profile, so memory and time
+        depend on the profile size rather than on the size of the reference data. Works with the profile of the
+        current training data as well as with the profile attached to the production model.
+        """
+        try:
+            current_profile = reference_profile.profile_csv(current_file_path, chunk_size = self.data_validation_config.chunk_size)
+            report = reference_profile.compare(current_profile,
+                                               threshold = self.data_validation_config.drift_threshold,
+                                               drift_share = self.data_validation_config.drift_share,
+                                               categorical_stat_test = self.data_validation_config.categorical_stat_test,
+                                               psi_threshold = self.data_validation_config.psi_threshold)
+            return self.save_drift_report(report, report_file_path)
+        
+        except Exception as e:
+            raise UsVisaException(e, sys)
         
 
+    @profile_stage
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
-        Performs initial data validation by checking the presence of required columns
-        and detecting data drift between the training and testing datasets.
+        Performs initial data validation by checking the presence of required columns and validating every row
+        (rejected rows and their reasons are written to the invalid files, the clean rows to the valid files).
+        The drift fields of the artifact are filled in by `initiate_drift_detection`, which the data transformation
+        does not have to wait for.
         """
         try:
             train_file_path = self.data_ingestion_artifact.train_file_path
             test_file_path = self.data_ingestion_artifact.test_file_path
 
-            # Reading data from the train and test file path
-            train_df = DataValidation.read_data(train_file_path)
-            test_df = DataValidation.read_data(test_file_path)
+            # Only the headers are needed for the column checks
+            train_df = DataValidation.read_header(train_file_path)
+            test_df = DataValidation.read_header(test_file_path)
 
             # Validating the number of columns
             status = self.validate_columns(dataframe = train_df)
@@ -145,30 +231,75 @@ class DataValidation:
             if not status:
                 raise Exception("Test data does not contain all valid columns.")
 
-            # Checking dataset drift
-            drift_status = self.detect_dataset_drift(base_df = train_df, current_df = test_df)
-            if drift_status:
-                logging.info("Drift detected.")
-            else:
-                logging.info("No Drift detected.")
-            
+            # Validating rows, the rejected rows are quarantined in the invalid files
+            rules = self.get_row_validation_rules(train_file_path)
+            n_valid_train, n_invalid_train = self.validate_rows(train_file_path,
+                                                                self.data_validation_config.valid_train_file_path,
+                                                                self.data_validation_config.invalid_train_file_path, rules)
+            n_valid_test, n_invalid_test = self.validate_rows(test_file_path,
+                                                              self.data_validation_config.valid_test_file_path,
+                                                              self.data_validation_config.invalid_test_file_path, rules)
+
             validation_status = True
-            
-            # If no issue, save this as a csv file
-            dir_path = os.path.dirname(self.data_validation_config.valid_train_file_path)
-            os.makedirs(dir_path, exist_ok = True)
-            train_df.to_csv(self.data_validation_config.valid_train_file_path, index = False, header = True)
-            test_df.to_csv(self.data_validation_config.valid_test_file_path, index = False, header = True)
+            for name, n_valid, n_invalid in (("train", n_valid_train, n_invalid_train), ("test", n_valid_test, n_invalid_test)):
+                invalid_row_ratio = n_invalid / max(n_valid + n_invalid, 1)
+                if invalid_row_ratio > self.data_validation_config.max_invalid_row_ratio:
+                    logging.info(f"{n_invalid} of {n_valid + n_invalid} {name} rows were rejected, "
+                                 f"more than the tolerated ratio of {self.data_validation_config.max_invalid_row_ratio}.")
+                    validation_status = False
 
             data_validation_artifact = DataValidationArtifact(
                 validation_status = validation_status,
                 valid_train_file_path = self.data_validation_config.valid_train_file_path,
                 valid_test_file_path = self.data_validation_config.valid_test_file_path,
-                invalid_train_file_path = None,
-                invalid_test_file_path = None,
-                drift_report_file_path = self.data_validation_config.drift_report_file_path
+                invalid_train_file_path = self.data_validation_config.invalid_train_file_path if n_invalid_train else None,
+                invalid_test_file_path = self.data_validation_config.invalid_test_file_path if n_invalid_test else None,
+                drift_report_file_path = None,
+                drift_status = None,
+                reference_profile_file_path = None,
+                production_drift_report_file_path = None,
+                production_drift_status = None
             )
             return data_validation_artifact
         
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
+    def initiate_drift_detection(self, data_validation_artifact: DataValidationArtifact) -> DataValidationArtifact:
+        """
+        Detects data drift between the valid training and testing datasets and completes the validation artifact
+        with the drift report, the drift decision and the reference profile of the valid training data.
+        The valid training data is also compared with the reference profile of the production model, which tells
+        whether the data drifted since the model in production was trained.
+        """
+        try:
+            # Checking dataset drift by streaming the valid test data against the profile of the valid training data
+            reference_profile = self.build_reference_profile(data_validation_artifact.valid_train_file_path)
+            drift_status = self.detect_dataset_drift_from_profile(reference_profile,
+                                                                  current_file_path = data_validation_artifact.valid_test_file_path)
+            if drift_status:
+                logging.info("Drift detected.")
+            else:
+                logging.info("No Drift detected.")
+
+            production_drift_report_file_path, production_drift_status = None, None
+            production_reference_profile = self.get_production_reference_profile()
+            if production_reference_profile is not None:
+                production_drift_report_file_path = self.data_validation_config.production_drift_report_file_path
+                production_drift_status = self.detect_dataset_drift_from_profile(
+                    production_reference_profile, current_file_path = data_validation_artifact.valid_train_file_path,
+                    report_file_path = production_drift_report_file_path)
+                logging.info(f"Drift against the production model: {production_drift_status}")
+            else:
+                logging.info("No production model reference profile to check drift against.")
+
+            return dataclasses.replace(data_validation_artifact,
+                                       drift_report_file_path = self.data_validation_config.drift_report_file_path,
+                                       drift_status = drift_status,
+                                       reference_profile_file_path = self.data_validation_config.reference_profile_file_path,
+                                       production_drift_report_file_path = production_drift_report_file_path,
+                                       production_drift_status = production_drift_status)
+        
         except Exception as e:
             raise UsVisaException(e, sys)
\ No newline at end of file
@@ -0,0 +1,281 @@
+import sys
+import copy
+import time
+import inspect
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import Callable, Optional, Tuple
+from sklearn.pipeline import Pipeline
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.ensemble import BaseEnsemble, HistGradientBoostingClassifier
+from sklearn.utils.class_weight import compute_sample_weight
+from sklearn.metrics import f1_score, precision_score, recall_score
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
+from usvisa.constants import (SCHEMA_FILE_PATH, CASE_ID_COLUMN, DATA_TRANSFORMATION_FEATURES_DTYPE,
+                              DATA_VALIDATION_DRIFT_THRESHOLD, DATA_VALIDATION_DRIFT_SHARE,
+                              DATA_VALIDATION_CATEGORICAL_STAT_TEST, DATA_VALIDATION_PSI_THRESHOLD)
+from usvisa.cloud.aws_storage import SimpleStorageService
+from usvisa.utils.main_utils import read_yaml_file, write_yaml_file, save_object, save_numpy_array_data
+from usvisa.utils.feature_utils import engineer_features
+from usvisa.utils.serving_cost_utils import measure_serving_cost
+from usvisa.entity.config_entity import IncrementalTrainerConfig
+from usvisa.entity.artifact_entity import (DataValidationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact,
+                                           ServingCostArtifact)
+from usvisa.entity.estimator import UsVisaModel
+from usvisa.entity.s3_estimator import UsVisaEstimator
+from usvisa.entity.reference_profile import ReferenceProfile
+
+class IncrementalTrainer:
+    """
+    IncrementalTrainer updates the production UsVisaModel with the validated training rows it has not seen yet,
+    instead of transforming the full history and searching models from scratch, so the cost of a retrain scales with
+    the new data. The production preprocessor is kept as it is. Forests and gradient boosting get trees fit on the
+    new rows (warm_start, or continued training for XGBoost and CatBoost), models with partial_fit are updated
+    in place and KNN, whose fit only builds its index, is refit on all validated training rows.
+    The case_ids of the rows the production model has seen are read from the file pushed next to it.
+
+    `initiate_incremental_training` returns None, asking for a full retrain, when there is no production model or
+    its training case_ids are unknown, the new rows drifted from the reference profile of the production model,
+    the new rows have categories the preprocessor has not seen, the new rows are more than `max_new_data_ratio`
+    of the rows the model has seen, or the model cannot be updated incrementally.
+    """
+    def __init__(self, data_validation_artifact: DataValidationArtifact, incremental_trainer_config: IncrementalTrainerConfig):
+        try:
+            self.data_validation_artifact = data_validation_artifact
+            self.incremental_trainer_config = incremental_trainer_config
+            self._schema_config = read_yaml_file(SCHEMA_FILE_PATH)
+            self._model_config = read_yaml_file(incremental_trainer_config.model_config_file_path)
+            self._incremental_config = self._model_config.get("incremental_training") or {}
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_production_model(self) -> Optional[UsVisaModel]:
+        """
+        Loads the model in production, or returns None when no model has been pushed yet.
+        """
+        try:
+            usvisa_estimator = UsVisaEstimator(bucket_name = self.incremental_trainer_config.bucket_name,
+                                               model_path = self.incremental_trainer_config.s3_model_key_path)
+            if not usvisa_estimator.is_model_present(model_path = self.incremental_trainer_config.s3_model_key_path):
+                return None
+            return usvisa_estimator.load_model()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_production_training_case_ids(self) -> Optional[np.ndarray]:
+        """
+        Loads the case_ids of the rows the production model was trained on, or returns None when they were not pushed.
+        """
+        try:
+            s3 = SimpleStorageService()
+            bucket_name = self.incremental_trainer_config.bucket_name
+            s3_key = self.incremental_trainer_config.s3_training_case_ids_key_path
+            if not s3.s3_key_path_available(bucket_name = bucket_name, s3_key = s3_key):
+                return None
+            return s3.load_numpy_array(s3_key, bucket_name = bucket_name)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @staticmethod
+    def is_drifted(production_model: UsVisaModel, dataframe: pd.DataFrame) -> bool:
+        """
+        Checks the new rows for drift against the reference profile stored with the production model, with the
+        thresholds of data validation. A model without a reference profile counts as drifted, so it is retrained.
+        """
+        try:
+            reference_profile = getattr(production_model, "reference_profile", None)
+            if reference_profile is None:
+                logging.info("The production model has no reference profile to check the new rows against")
+                return True
+            report = reference_profile.compare(reference_profile.profile_dataframe(dataframe),
+                                               threshold = DATA_VALIDATION_DRIFT_THRESHOLD,
+                                               drift_share = DATA_VALIDATION_DRIFT_SHARE,
+                                               categorical_stat_test = DATA_VALIDATION_CATEGORICAL_STAT_TEST,
+                                               psi_threshold = DATA_VALIDATION_PSI_THRESHOLD)
+            logging.info(f"{report['n_drifted_features']}/{report['n_features']} features of the new rows drifted "
+                         f"from the production model's reference profile")
+            return report["dataset_drift"]
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @staticmethod
+    def get_new_categories(preprocessor: object, features: pd.DataFrame) -> dict:
+        """
+        Returns the values of the encoded columns that the fitted one-hot and ordinal encoders have no category for.
+        """
+        try:
+            new_categories = {}
+            for name, encoder, columns in preprocessor.transformers_:
+                if name not in ("OneHotEncoder", "Ordinal_Encoder"):
+                    continue
+                for column, categories in zip(columns, encoder.categories_):
+                    unseen = set(features[column].dropna().unique()) - set(categories)
+                    if unseen:
+                        new_categories[column] = sorted(map(str, unseen))
+            return new_categories
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def transform(self, production_model: UsVisaModel, dataframe: pd.DataFrame) -> Tuple[object, np.ndarray]:
+        features, target = engineer_features(dataframe, self._schema_config["drop_columns"])
+        X = production_model.preprocessing_object.transform(features)
+        if getattr(production_model, "dense_input", False) and sp.issparse(X):
+            X = X.toarray()
+        X = X.astype(DATA_TRANSFORMATION_FEATURES_DTYPE) if sp.issparse(X) else np.ascontiguousarray(X, dtype = DATA_TRANSFORMATION_FEATURES_DTYPE)
+        return X, target.to_numpy()
+
+    def update_model(self, model: object, X: object, y: np.ndarray,
+                     get_training_data: Callable[[], Tuple[object, np.ndarray]]) -> Optional[str]:
+        """
+        Extends a fitted model with new rows in place and returns how it was updated, or None when the model type
+        has no incremental update. Boosting and forests get `n_estimators_step` new trees or iterations.
+        The new rows are weighted to balanced classes where the estimator's fit accepts sample weights.
+        KNN is refit on all training rows, transformed by `get_training_data` only when it is needed.
+        """
+        try:
+            # The steps before the model in a native categorical pipeline are stateless encoders
+            encoder = None
+            if isinstance(model, Pipeline):
+                encoder = model[:-1]
+                X = encoder.transform(X)
+                model = model.steps[-1][1]
+            if isinstance(model, KNeighborsClassifier):
+                X_train, y_train = get_training_data()
+                model.fit(X_train if encoder is None else encoder.transform(X_train), y_train)
+                return "refit_index"
+            if hasattr(model, "classes_") and len(np.unique(y)) < len(model.classes_):
+                logging.info("The new rows do not cover all classes, the model cannot be extended with them")
+                return None
+
+            n_estimators_step = self._incremental_config.get("n_estimators_step", 10)
+            sample_weight = compute_sample_weight("balanced", y)
+            params = model.get_params()
+            fit_parameters = inspect.signature(model.fit).parameters
+            fit_params = {"sample_weight": sample_weight} if "sample_weight" in fit_parameters else {}
+
+            if hasattr(model, "partial_fit"):
+                partial_fit_params = {"sample_weight": sample_weight} if "sample_weight" in inspect.signature(model.partial_fit).parameters else {}
+                model.partial_fit(X, y, **partial_fit_params)
+                return "partial_fit"
+            if "warm_start" in params and isinstance(model, (BaseEnsemble, HistGradientBoostingClassifier)):
+                size_param = "n_estimators" if "n_estimators" in params else "max_iter"
+                model.set_params(warm_start = True, **{size_param: params[size_param] + n_estimators_step})
+                model.fit(X, y, **fit_params)
+                return "warm_start"
+            if "xgb_model" in fit_parameters:
+                booster = model.get_booster()
+                model.set_params(n_estimators = n_estimators_step)
+                model.fit(X, y, xgb_model = booster, **fit_params)
+                return "continued_boosting"
+            if "init_model" in fit_parameters:
+                init_model = copy.deepcopy(model)
+                model.set_params(iterations = n_estimators_step)
+                model.fit(X, y, init_model = init_model, **fit_params)
+                return "continued_boosting"
+            return None
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_reference_profile(self) -> Optional[ReferenceProfile]:
+        profile_file_path = self.data_validation_artifact.reference_profile_file_path
+        return None if profile_file_path is None else ReferenceProfile.load(profile_file_path)
+
+    @profile_stage
+    def initiate_incremental_training(self) -> Optional[ModelTrainerArtifact]:
+        """
+        Updates the production model with the unseen training rows, scores it on the test rows it has not been
+        trained on and saves it, and the union of the seen case_ids next to it. Returns None when a full retrain is needed.
+        """
+        try:
+            production_model = self.get_production_model()
+            production_case_ids = None if production_model is None else self.get_production_training_case_ids()
+            if production_case_ids is None:
+                logging.info("No production model with known training rows, falling back to a full retrain")
+                return None
+
+            seen_case_ids = set(production_case_ids)
+            train_df = pd.read_csv(self.data_validation_artifact.valid_train_file_path)
+            new_train_df = train_df[~train_df[CASE_ID_COLUMN].astype(str).isin(seen_case_ids)].reset_index(drop = True)
+            new_case_ids = new_train_df[CASE_ID_COLUMN].astype(str).to_numpy()
+            new_data_ratio = len(new_train_df) / max(len(seen_case_ids), 1)
+            logging.info(f"{len(new_train_df)} new training rows, {new_data_ratio:.2%} of the {len(seen_case_ids)} seen rows")
+            if new_data_ratio > self._incremental_config.get("max_new_data_ratio", 0.5):
+                logging.info("Too much new data for an incremental update, falling back to a full retrain")
+                return None
+
+            if len(new_train_df) and self.is_drifted(production_model, new_train_df):
+                logging.info("The new rows drifted from the production model's training data, falling back to a full retrain")
+                return None
+
+            new_categories = self.get_new_categories(production_model.preprocessing_object, new_train_df)
+            if new_categories:
+                logging.info(f"New categories {new_categories}, falling back to a full retrain")
+                return None
+
+            model = production_model.trained_model_object
+            update, start_time = "none", time.perf_counter()
+            if len(new_train_df):
+                X_new, y_new = self.transform(production_model, new_train_df)
+                # Every validated training row, i.e. the rows the model has seen and the new ones, for models that are refit
+                update = self.update_model(model, X_new, y_new,
+                                           get_training_data = lambda: self.transform(production_model, train_df))
+                if update is None:
+                    logging.info(f"{type(model).__name__} cannot be updated incrementally, falling back to a full retrain")
+                    return None
+            update_seconds = round(time.perf_counter() - start_time, 3)
+            logging.info(f"Updated {type(model).__name__} with {update} in {update_seconds}s")
+
+            # The rows the production model was trained on are left out of the test rows
+            test_df = pd.read_csv(self.data_validation_artifact.valid_test_file_path)
+            unseen_test_df = test_df[~test_df[CASE_ID_COLUMN].astype(str).isin(seen_case_ids)].reset_index(drop = True)
+            test_df = unseen_test_df if len(unseen_test_df) else test_df
+            X_test, y_test = self.transform(production_model, test_df)
+            y_pred = model.predict(X_test)
+            metric_artifact = ClassificationMetricArtifact(f1_score = float(f1_score(y_test, y_pred)),
+                                                           precision_score = float(precision_score(y_test, y_pred)),
+                                                           recall_score = float(recall_score(y_test, y_pred)))
+
+            usvisamodel = UsVisaModel(preprocessing_object = production_model.preprocessing_object,
+                                      trained_model_object = model,
+                                      reference_profile = self.get_reference_profile(),
+                                      dense_input = getattr(production_model, "dense_input", False))
+            save_numpy_array_data(self.incremental_trainer_config.training_case_ids_file_path,
+                                  np.concatenate([production_case_ids.astype(str), new_case_ids]))
+            # transform engineered the features of test_df in place, so the served model is timed on its raw features
+            selection_config = self._model_config.get("finalist_selection") or {}
+            serving_cost_artifact = ServingCostArtifact(**measure_serving_cost(
+                usvisamodel, test_df, n_single_rows = selection_config.get("n_single_rows", 200),
+                batch_size = selection_config.get("batch_size", 1000)))
+            save_object(self.incremental_trainer_config.trained_model_file_path, usvisamodel)
+            write_yaml_file(self.incremental_trainer_config.report_file_path, {
+                "update": update,
+                "update_seconds": update_seconds,
+                "new_rows": len(new_train_df),
+                "seen_rows": len(seen_case_ids),
+                "test_rows": len(test_df)
+            }, replace = True)
+
+            model_trainer_artifact = ModelTrainerArtifact(
+                trained_model_file_path = self.incremental_trainer_config.trained_model_file_path,
+                metric_artifact = metric_artifact,
+                serving_cost_artifact = serving_cost_artifact,
+                search_strategy = "incremental",
+                search_seconds = update_seconds,
+                search_report_file_path = self.incremental_trainer_config.report_file_path,
+                training_case_ids_file_path = self.incremental_trainer_config.training_case_ids_file_path
+            )
+            logging.info(f"Incremental trainer artifact: {model_trainer_artifact}")
+            return model_trainer_artifact
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
@@ -1,8 +1,10 @@
+import os
 import sys
+import hashlib
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Optional, Tuple
 from dataclasses import dataclass
-from sklearn.metrics import f1_score
 
 from usvisa.entity.estimator import UsVisaModel
 from usvisa.constants import TARGET_COLUMN, CURRENT_YEAR
@@ -10,8 +12,11 @@ from usvisa.logger.logger import logging
 from usvisa.entity.estimator import TargetValueMapping
 from usvisa.entity.s3_estimator import UsVisaEstimator
 from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
+from usvisa.utils.main_utils import get_file_hash, load_object, save_numpy_array_data, load_numpy_array_data, write_yaml_file
+from usvisa.utils.bootstrap_utils import paired_bootstrap
 from usvisa.entity.config_entity import ModelEvaluationConfig
-from usvisa.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifact, ModelEvaluationArtifact
+from usvisa.entity.artifact_entity import ModelTrainerArtifact, DataValidationArtifact, ModelEvaluationArtifact
 
 @dataclass
 class EvaluateModelResponse:
@@ -19,13 +24,23 @@ class EvaluateModelResponse:
     best_model_f1_score: float
     is_model_accepted: bool
     difference: float
+    difference_ci_low: float
+    difference_ci_high: float
+    p_value: float
 
 class ModelEvaluation:
-
-    def __init__(self, model_evaluation_config: ModelEvaluationConfig, data_ingestion_artifact: DataIngestionArtifact,
-                 model_trainer_artifact: ModelTrainerArtifact):
+    """
+    ModelEvaluation compares the trained model with the production model on the same test rows.
+    F1, precision and recall of both models and of their difference get paired bootstrap confidence intervals, and the
+    trained model is only accepted when the lower bound of its F1 gain exceeds `threshold_score_change`.
+    The test predictions of the production model are cached against the model's S3 ETag/version and the hash of the
+    test data, so the production model is only downloaded and scored again when one of them changes. The pipeline
+    fills that cache concurrently with training, so evaluation usually only reads it.
+    """
+    def __init__(self, model_evaluation_config: ModelEvaluationConfig, data_validation_artifact: DataValidationArtifact,
+                 model_trainer_artifact: ModelTrainerArtifact = None):
         try:
-            self.data_ingestion_artifact = data_ingestion_artifact
+            self.data_validation_artifact = data_validation_artifact
             self.model_trainer_artifact = model_trainer_artifact
             self.model_evaluation_config = model_evaluation_config
         
@@ -48,32 +63,71 @@ class ModelEvaluation:
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    def read_test_data(self) -> Tuple[pd.DataFrame, np.ndarray]:
+        # The validated test rows, without the rows quarantined by data validation
+        test_df = pd.read_csv(self.data_validation_artifact.valid_test_file_path)
+        test_df['company_age'] = CURRENT_YEAR - test_df['yr_of_estab']
+
+        X, Y = test_df.drop(TARGET_COLUMN, axis = 1), test_df[TARGET_COLUMN]
+        Y = Y.replace(TargetValueMapping()._asdict())
+        return X, Y.to_numpy()
+
+    def get_best_model_predictions(self) -> Optional[np.ndarray]:
+        """
+        This function returns the predictions of the production model on the test data, or None if there is no
+        production model. They are read from the cache when the model version and the test data are unchanged.
+        """
+        try:
+            best_model = self.get_best_model()
+            if best_model is None:
+                return None
+
+            model_version = best_model.get_model_version()
+            test_data_hash = get_file_hash(self.data_validation_artifact.valid_test_file_path)
+            cache_file_path = os.path.join(self.model_evaluation_config.prediction_cache_dir,
+                                           hashlib.sha256(f"{model_version}:{test_data_hash}".encode()).hexdigest() + ".npy")
+            if model_version is not None and os.path.exists(cache_file_path):
+                logging.info(f"Using the cached production model predictions for model version {model_version}")
+                return load_numpy_array_data(cache_file_path)
+
+            X, _ = self.read_test_data()
+            best_model_predictions = np.asarray(best_model.predict(X))
+            if model_version is not None:
+                save_numpy_array_data(cache_file_path, best_model_predictions)
+            return best_model_predictions
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
     def evaluate_model(self) -> EvaluateModelResponse:
         """
         This function is used to evaluate trained model with production model and choose best model. 
+        The bootstrap comparison of both models is written to the evaluation report.
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-            test_df['company_age'] = CURRENT_YEAR - test_df['yr_of_estab']
+            X, Y = self.read_test_data()
+            trained_model: UsVisaModel = load_object(self.model_trainer_artifact.trained_model_file_path)
+            trained_model_predictions = np.asarray(trained_model.predict(X))
 
-            X, Y = test_df.drop(TARGET_COLUMN, axis = 1), test_df[TARGET_COLUMN]
-            Y = Y.replace(TargetValueMapping()._asdict())
+            best_model_predictions = self.get_best_model_predictions()
 
-            
-            trained_model_f1_score = self.model_trainer_artifact.metric_artifact.f1_score
-
-            best_model_f1_score = None
-            best_model = self.get_best_model()
-            if best_model is not None:
-                Y_hat_best_model = best_model.predict(X)
-                best_model_f1_score = f1_score(Y, Y_hat_best_model)
-            
-            tmp_best_model_score = 0 if best_model_f1_score is None else best_model_f1_score
+            # Without a production model, the trained model is compared with one that never predicts the positive class
+            baseline_predictions = np.zeros_like(Y) if best_model_predictions is None else best_model_predictions
+            report = paired_bootstrap(Y, trained_model_predictions, baseline_predictions,
+                                      n_replicates = self.model_evaluation_config.n_bootstrap_replicates,
+                                      confidence_level = self.model_evaluation_config.confidence_level,
+                                      random_state = self.model_evaluation_config.random_state)
+            report["has_production_model"] = best_model_predictions is not None
+            write_yaml_file(self.model_evaluation_config.evaluation_report_file_path, report, replace = True)
 
-            result = EvaluateModelResponse(trained_model_f1_score = trained_model_f1_score,
-                                           best_model_f1_score = best_model_f1_score,
-                                           is_model_accepted = trained_model_f1_score > tmp_best_model_score,
-                                           difference = trained_model_f1_score - tmp_best_model_score
+            f1_report = report["f1_score"]
+            result = EvaluateModelResponse(trained_model_f1_score = f1_report["model_a"]["value"],
+                                           best_model_f1_score = None if best_model_predictions is None else f1_report["model_b"]["value"],
+                                           is_model_accepted = f1_report["difference"]["ci_low"] > self.model_evaluation_config.threshold_score_change,
+                                           difference = f1_report["difference"]["value"],
+                                           difference_ci_low = f1_report["difference"]["ci_low"],
+                                           difference_ci_high = f1_report["difference"]["ci_high"],
+                                           p_value = f1_report["difference"]["p_value"]
                                            )
             logging.info(f"Result: {result}")
             return result
@@ -82,6 +136,7 @@ class ModelEvaluation:
             raise UsVisaException(e, sys)
 
 
+    @profile_stage
     def initiate_model_evaluation(self) -> ModelEvaluationArtifact:
         try:
             evaluate_model_response = self.evaluate_model()
@@ -90,7 +145,11 @@ class ModelEvaluation:
                 is_model_accepted = evaluate_model_response.is_model_accepted,
                 s3_model_path = s3_model_path,
                 trained_model_path = self.model_trainer_artifact.trained_model_file_path,
-                changed_accuracy = evaluate_model_response.difference)
+                changed_accuracy = evaluate_model_response.difference,
+                changed_accuracy_ci_low = evaluate_model_response.difference_ci_low,
+                changed_accuracy_ci_high = evaluate_model_response.difference_ci_high,
+                evaluation_report_file_path = self.model_evaluation_config.evaluation_report_file_path,
+                training_case_ids_file_path = self.model_trainer_artifact.training_case_ids_file_path)
             
             logging.info(f"Model evaluation artifact: {model_evaluation_artifact}")
             return model_evaluation_artifact
@@ -2,6 +2,7 @@ import sys
 
 from usvisa.logger.logger import logging
 from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
 from usvisa.entity.s3_estimator import UsVisaEstimator
 from usvisa.cloud.aws_storage import SimpleStorageService
 from usvisa.entity.artifact_entity import ModelEvaluationArtifact, ModelPusherArtifact
@@ -16,9 +17,16 @@ class ModelPusher:
         self.usvisa_estimator = UsVisaEstimator(bucket_name = self.model_pusher_config.bucket_name,
                                                 model_path = self.model_pusher_config.s3_model_key_path)
         
+    @profile_stage
     def initiate_model_pusher(self) -> ModelPusherArtifact:
         try:
             self.usvisa_estimator.save_model(from_file = self.model_evaluation_artifact.trained_model_path)
+            # The case_ids of the training rows are pushed next to the model for incremental retraining
+            if self.model_evaluation_artifact.training_case_ids_file_path is not None:
+                self.s3.upload_file(self.model_evaluation_artifact.training_case_ids_file_path,
+                                    to_filename = self.model_pusher_config.s3_training_case_ids_key_path,
+                                    bucket_name = self.model_pusher_config.bucket_name,
+                                    remove = False)
             model_pusher_artifact = ModelPusherArtifact(bucket_name = self.model_pusher_config.bucket_name,
                                                         s3_model_path = self.model_pusher_config.s3_model_key_path)
             logging.info("Uploaded artifacts folder to s3 bucket")
@@ -1,79 +1,288 @@
+import os
 import sys
+import hashlib
+import dataclasses
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from typing import Tuple
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
-from neuro_mf  import ModelFactory
 
 from usvisa.logger.logger import logging
+from usvisa.constants import CASE_ID_COLUMN, SCHEMA_FILE_PATH
 from usvisa.exception.exception import UsVisaException
-from usvisa.utils.main_utils import load_numpy_array_data, read_yaml_file, load_object, save_object
+from usvisa.utils.profiling_utils import profile_stage
+from usvisa.utils.feature_utils import engineer_features
+from usvisa.utils.main_utils import (load_numpy_array_data, save_numpy_array_data, load_feature_matrix, read_yaml_file,
+                                     write_yaml_file, load_object, save_object, get_file_hash)
 from usvisa.entity.config_entity import ModelTrainerConfig
-from usvisa.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from usvisa.entity.artifact_entity import (DataTransformationArtifact, DataValidationArtifact, ModelTrainerArtifact,
+                                           ClassificationMetricArtifact, ServingCostArtifact)
 from usvisa.entity.estimator import UsVisaModel
+from usvisa.entity.reference_profile import ReferenceProfile
+from usvisa.entity.model_search import ModelSearch
+from usvisa.entity.cv_result_store import CVResultStore
+from usvisa.entity.native_categorical import get_feature_layout
+from usvisa.utils.serving_cost_utils import measure_serving_cost
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig, data_validation_artifact: DataValidationArtifact = None):
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.data_validation_artifact = data_validation_artifact
 
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def get_reference_profile(self):
         """
-        This function uses neuro_mf to get the best model object and report of the best model.
+        Loads the reference profile of the training data, if data validation produced one, so it can be
+        stored with the model.
         """
         try:
-            logging.info("Using neuromf library to get best model object and report")
-            model_factory = ModelFactory(model_config_path = self.model_trainer_config.model_config_file_path)
+            if self.data_validation_artifact is None:
+                return None
+            profile_file_path = self.data_validation_artifact.reference_profile_file_path
+            if profile_file_path is None or not os.path.exists(profile_file_path):
+                return None
+            return ReferenceProfile.load(profile_file_path)
 
-            X_train, Y_train, X_test, Y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
+        except Exception as e:
+            raise UsVisaException(e, sys)
 
-            # Get the best model detail using the model factory
-            best_model_detail = model_factory.get_best_model(
-                X = X_train, y = Y_train, base_accuracy = self.model_trainer_config.expected_accuracy 
+    def load_transformed_data(self) -> Tuple[object, np.memmap, object, np.memmap]:
+        """
+        Memory-maps the transformed train and test features and targets read-only. The float32 features are passed
+        to the estimators as they are, so no copy of the data is materialized when loading. Sparse features are
+        loaded as CSR matrices.
+        """
+        try:
+            return tuple(
+                load_feature_matrix(file_path = file_path, mmap_mode = "r") for file_path in [
+                    self.data_transformation_artifact.transformed_train_features_file_path,
+                    self.data_transformation_artifact.transformed_train_target_file_path,
+                    self.data_transformation_artifact.transformed_test_features_file_path,
+                    self.data_transformation_artifact.transformed_test_target_file_path
+                ]
             )
-            # Save the best model object
-            model_obj = best_model_detail.best_model
-            Y_pred = model_obj.predict(X_test)
-
-            accuracy = accuracy_score(Y_test, Y_pred) 
-            f1 = f1_score(Y_test, Y_pred) 
-            precision = precision_score(Y_test, Y_pred) 
-            recall = recall_score(Y_test, Y_pred) 
-            logging.info(f"Model accuracy: {accuracy}, F1 score: {f1}, Precision: {precision}, Recall: {recall}")
-            metric_artifact = ClassificationMetricArtifact(f1_score = f1, precision_score = precision, recall_score = recall)
-            
-            return best_model_detail, metric_artifact
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def requires_dense_input(self) -> bool:
+        """
+        Checks whether a model in the model config is marked with `dense_input: true`. The models are all searched
+        on the same matrix, so sparse features are densified as soon as one of them needs it.
+        """
+        try:
+            model_config = read_yaml_file(self.model_trainer_config.model_config_file_path)
+            return any(module.get("dense_input", False) for module in model_config["model_selection"].values())
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def save_training_case_ids(self) -> str:
+        """
+        Saves the case_ids of the validated training rows next to the model, for incremental retraining, and returns
+        the file path. They are kept out of the pickled model, whose size would otherwise grow with the training data.
+        """
+        try:
+            if self.data_validation_artifact is None:
+                return None
+            training_case_ids = pd.read_csv(self.data_validation_artifact.valid_train_file_path,
+                                            usecols = [CASE_ID_COLUMN])[CASE_ID_COLUMN].astype(str).to_numpy()
+            save_numpy_array_data(self.model_trainer_config.training_case_ids_file_path, training_case_ids)
+            return self.model_trainer_config.training_case_ids_file_path
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_serving_features(self, n_rows: int) -> pd.DataFrame:
+        """
+        Reads the first `n_rows` validated test rows as the raw input features a served UsVisaModel receives, on which
+        the serving cost of the finalists is measured.
+        """
+        try:
+            if self.data_validation_artifact is None:
+                return None
+            schema_config = read_yaml_file(file_path = SCHEMA_FILE_PATH)
+            test_df = pd.read_csv(self.data_validation_artifact.valid_test_file_path, nrows = n_rows)
+            features, _ = engineer_features(test_df, schema_config["drop_columns"])
+            return features
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_cv_result_store(self) -> CVResultStore:
+        """
+        Opens the CV result store shared by training runs, unless `cache_cv_results` is disabled in the model config.
+        """
+        try:
+            model_config = read_yaml_file(self.model_trainer_config.model_config_file_path)
+            if not model_config["grid_search"].get("params", {}).get("cache_cv_results", False):
+                return None
+            return CVResultStore(self.model_trainer_config.cv_result_store_file_path)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_feature_layout(self) -> dict:
+        """
+        Reads the layout of the transformed features (one-hot groups and ordinal columns) from the saved preprocessor,
+        which native categorical models need to recover the category codes.
+        """
+        try:
+            preprocessing_obj = load_object(file_path = self.data_transformation_artifact.transformed_object_file_path)
+            return get_feature_layout(preprocessing_obj)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_train_data_hash(self) -> str:
+        """
+        Hashes the content of the transformed training features, target and sample weights, which identifies the
+        training data in the CV result store.
+        """
+        try:
+            file_paths = [self.data_transformation_artifact.transformed_train_features_file_path,
+                          self.data_transformation_artifact.transformed_train_target_file_path,
+                          self.data_transformation_artifact.train_sample_weight_file_path]
+            file_hashes = [get_file_hash(file_path) for file_path in file_paths if file_path is not None]
+            return hashlib.sha256("".join(file_hashes).encode()).hexdigest()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_model_object_and_report(self, X_train: np.array, Y_train: np.array, X_test: np.array,
+                                    Y_test: np.array, preprocessing_obj: object,
+                                    dense_input: bool = False) -> Tuple[object, object, object, dict]:
+        """
+        This function uses ModelSearch to cross-validate the configured model families in parallel with the configured
+        strategy and get the finalist models. The serving cost (size, load time, single-row and batch latency) of every
+        finalist is measured on the UsVisaModel that would be served, preprocessor included, and the finalist with the
+        best cross-validation score among those within the serving constraints of the model config is selected.
+        The test data is only scored for the report, as model evaluation gates the promotion on it.
+        The search report, including the finalists, is saved.
+        """
+        try:
+            logging.info("Using ModelSearch to get best model object and report")
+            model_search = ModelSearch(model_config_path = self.model_trainer_config.model_config_file_path,
+                                       cv_result_store = self.get_cv_result_store(),
+                                       feature_layout = self.get_feature_layout())
+            selection_config = read_yaml_file(self.model_trainer_config.model_config_file_path).get("finalist_selection") or {}
+            constraints = {name: limit for name, limit in (selection_config.get("constraints") or {}).items() if limit is not None}
+            n_single_rows = selection_config.get("n_single_rows", 200)
+            batch_size = selection_config.get("batch_size", 1000)
+
+            # With class weighting instead of resampling, the models are fit with the balanced sample weights
+            sample_weight = None
+            if self.data_transformation_artifact.train_sample_weight_file_path is not None:
+                sample_weight = load_numpy_array_data(self.data_transformation_artifact.train_sample_weight_file_path,
+                                                      mmap_mode = "r")
+
+            # Get the finalists using the model search
+            finalists = model_search.get_finalists(X = X_train, y = Y_train, sample_weight = sample_weight,
+                                                   dataset_hash = self.get_train_data_hash(),
+                                                   n_finalists = selection_config.get("n_finalists", 1))
+
+            serving_features = self.get_serving_features(n_rows = max(n_single_rows, batch_size))
+            if serving_features is None:
+                logging.warning("No validated test rows to time the served model on, timing the bare finalists instead")
+
+            finalist_reports = []
+            for finalist in finalists:
+                Y_pred = finalist.best_model.predict(X_test)
+                if serving_features is None:
+                    serving_cost = measure_serving_cost(finalist.best_model, X_test, n_single_rows = n_single_rows,
+                                                        batch_size = batch_size)
+                else:
+                    serving_model = UsVisaModel(preprocessing_object = preprocessing_obj,
+                                                trained_model_object = finalist.best_model,
+                                                dense_input = dense_input)
+                    serving_cost = measure_serving_cost(serving_model, serving_features, n_single_rows = n_single_rows,
+                                                        batch_size = batch_size)
+                finalist_report = {
+                    "module": finalist.model_name,
+                    "estimator": type(finalist.best_model.steps[-1][1] if isinstance(finalist.best_model, Pipeline)
+                                      else finalist.best_model).__name__,
+                    "cv_score": finalist.best_score,
+                    "accuracy_score": float(accuracy_score(Y_test, Y_pred)),
+                    "f1_score": float(f1_score(Y_test, Y_pred)),
+                    "precision_score": float(precision_score(Y_test, Y_pred)),
+                    "recall_score": float(recall_score(Y_test, Y_pred)),
+                    **serving_cost
+                }
+                # Constraints are named max_<measurement>, e.g. max_p99_latency_ms
+                finalist_report["violated_constraints"] = [name for name, limit in constraints.items()
+                                                           if finalist_report[name[len("max_"):]] > limit]
+                finalist_reports.append(finalist_report)
+                logging.info(f"Finalist report: {finalist_report}")
+
+            eligible = [index for index, report in enumerate(finalist_reports) if not report["violated_constraints"]]
+            if not eligible:
+                raise Exception(f"No finalist model meets the serving constraints {constraints}")
+            # Ranking by the test scores would bias the promotion gate of model evaluation, which uses the same test data
+            best_index = max(eligible, key = lambda index: finalist_reports[index]["cv_score"])
+            best_model_detail, best_report = finalists[best_index], finalist_reports[best_index]
+
+            logging.info(f"Selected {best_report['estimator']} by cv_score {best_report['cv_score']}: accuracy {best_report['accuracy_score']}, "
+                         f"F1 score {best_report['f1_score']}, p99 latency {best_report['p99_latency_ms']}ms")
+            metric_artifact = ClassificationMetricArtifact(f1_score = best_report["f1_score"],
+                                                           precision_score = best_report["precision_score"],
+                                                           recall_score = best_report["recall_score"])
+            serving_cost_artifact = ServingCostArtifact(**{field.name: best_report[field.name]
+                                                           for field in dataclasses.fields(ServingCostArtifact)})
+
+            # The strategy, the score and time of every candidate and the finalists are kept in the search report
+            search_report = model_search.get_search_report()
+            search_report.update({"objective": "cv_score", "constraints": constraints, "finalists": finalist_reports,
+                                  "selected": best_report["module"]})
+            write_yaml_file(self.model_trainer_config.search_report_file_path, search_report, replace = True)
+
+            return best_model_detail, metric_artifact, serving_cost_artifact, search_report
         
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    @profile_stage
     def initiate_model_trainer(self, ) -> ModelTrainerArtifact:
         """
-        This function initiates the model training process by loading the transformed data.
-        It then trains the model using the best model from the neuro_mf library and saves the trained model.
+        This function initiates the model training process by memory-mapping the transformed data.
+        It then trains the model using the best model found by ModelSearch and saves the trained model.
         """
         try:
-            train_arr = load_numpy_array_data(file_path = self.data_transformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path = self.data_transformation_artifact.transformed_test_file_path)
+            X_train, Y_train, X_test, Y_test = self.load_transformed_data()
 
-            best_model_detail ,metric_artifact = self.get_model_object_and_report(train = train_arr, test = test_arr)
+            # Sparse features are only densified when a configured model cannot take sparse input
+            dense_input = sp.issparse(X_train) and self.requires_dense_input()
+            if dense_input:
+                logging.info("Densifying the sparse features for models that require dense input")
+                X_train, X_test = X_train.toarray(), X_test.toarray()
 
             preprocessing_obj = load_object(file_path = self.data_transformation_artifact.transformed_object_file_path)
 
+            best_model_detail, metric_artifact, serving_cost_artifact, search_report = self.get_model_object_and_report(
+                X_train = X_train, Y_train = Y_train, X_test = X_test, Y_test = Y_test,
+                preprocessing_obj = preprocessing_obj, dense_input = dense_input)
+
             if best_model_detail.best_score < self.model_trainer_config.expected_accuracy:
                 logging.info("No model found with score more than expected accuracy score")
                 raise Exception("No best model found with score more than base score")
             
             usvisamodel = UsVisaModel(preprocessing_object = preprocessing_obj, 
-                                      trained_model_object = best_model_detail.best_model)
+                                      trained_model_object = best_model_detail.best_model,
+                                      reference_profile = self.get_reference_profile(),
+                                      dense_input = dense_input)
             logging.info("Created UsVisaModel object with preprocessor and model")
             save_object(self.model_trainer_config.trained_model_file_path, usvisamodel)
 
             model_trainer_artifact = ModelTrainerArtifact(
                 trained_model_file_path = self.model_trainer_config.trained_model_file_path,
-                metric_artifact = metric_artifact
+                metric_artifact = metric_artifact,
+                serving_cost_artifact = serving_cost_artifact,
+                search_strategy = search_report["strategy"],
+                search_seconds = search_report["search_seconds"],
+                search_report_file_path = self.model_trainer_config.search_report_file_path,
+                training_case_ids_file_path = self.save_training_case_ids()
             )
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
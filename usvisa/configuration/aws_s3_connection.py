@@ -1,36 +1,68 @@
 import os
+import threading
+from typing import Dict
+
 import boto3
+from botocore.config import Config
 
-from usvisa.constants import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION
+from usvisa.constants import (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, S3_CLIENT_MAX_POOL_CONNECTIONS,
+                              S3_CLIENT_RETRY_MODE, S3_CLIENT_MAX_ATTEMPTS, S3_CLIENT_CONNECT_TIMEOUT,
+                              S3_CLIENT_READ_TIMEOUT, S3_CLIENT_ENDPOINT_URL)
 
 class S3Client:
-    s3_client = None
-    s3_resource = None
+    """
+    S3Client gives thread-safe access to S3. boto3 clients are thread-safe, so one client per region, with a
+    connection pool of S3_CLIENT_MAX_POOL_CONNECTIONS, is shared by all threads. boto3 sessions and resources are
+    not, so every thread gets its own session and resource per region on first use. Retries, timeouts and an
+    optional endpoint override, e.g. a local S3 stand-in, come from the S3_CLIENT constants.
+    """
+    s3_clients: Dict[str, object] = {}
+    _lock = threading.Lock()
+    _local = threading.local()
 
     def __init__(self, region_name = AWS_REGION):
         """
-        Initialize the S3 client and resource with the provided AWS credentials and region.
+        Initialize the S3 client shared by all instances for the region, with the provided AWS credentials.
+        """
+        self.region_name = region_name
+        if region_name not in S3Client.s3_clients:
+            with S3Client._lock:
+                if region_name not in S3Client.s3_clients:
+                    # S3 client is used for operations like uploading files
+                    S3Client.s3_clients[region_name] = self.get_session().client('s3', config = self.get_config(),
+                                                                                 endpoint_url = S3_CLIENT_ENDPOINT_URL)
+        self.s3_client = S3Client.s3_clients[region_name]
+
+    def get_session(self) -> boto3.session.Session:
+        __access_key_id = AWS_ACCESS_KEY_ID
+        __secret_access_key = AWS_SECRET_ACCESS_KEY
+
+        if __access_key_id is None:
+            raise Exception("Environment variable AWS_ACCESS_KEY_ID is not set.")
+        if __secret_access_key is None:
+            raise Exception("Environment variable AWS_SECRET_ACCESS_KEY is not set.")
+
+        return boto3.session.Session(aws_access_key_id = __access_key_id,
+                                     aws_secret_access_key = __secret_access_key,
+                                     region_name = self.region_name)
+
+    @staticmethod
+    def get_config() -> Config:
+        return Config(max_pool_connections = S3_CLIENT_MAX_POOL_CONNECTIONS,
+                      retries = {"mode": S3_CLIENT_RETRY_MODE, "max_attempts": S3_CLIENT_MAX_ATTEMPTS},
+                      connect_timeout = S3_CLIENT_CONNECT_TIMEOUT,
+                      read_timeout = S3_CLIENT_READ_TIMEOUT)
+
+    @property
+    def s3_resource(self):
+        """
+        S3 resource of the calling thread for the region, used for operations like listing buckets.
         """
-        if S3Client.s3_resource == None or S3Client.s3_client == None:
-            __access_key_id = AWS_ACCESS_KEY_ID
-            __secret_access_key = AWS_SECRET_ACCESS_KEY
-
-            if __access_key_id is None:
-                raise Exception(f"Environment variable: {AWS_ACCESS_KEY_ID} is not not set.")
-            if __secret_access_key is None:
-                raise Exception(f"Environment variable: {AWS_SECRET_ACCESS_KEY} is not set.")
-            
-            # Initialize the S3 client and resource with the provided credentials
-            # S3 client is used for operations like uploading files
-            S3Client.s3_resource = boto3.resource('s3',
-                                                  aws_access_key_id = __access_key_id,
-                                                  aws_secret_access_key = __secret_access_key, 
-                                                  region_name = region_name)
-            # S3 resource is used for operations like listing buckets
-            S3Client.s3_client = boto3.client('s3',
-                                              aws_access_key_id = __access_key_id,
-                                              aws_secret_access_key = __secret_access_key, 
-                                              region_name = region_name)
-            
-        self.s3_resource = S3Client.s3_resource
-        self.s3_client = S3Client.s3_client
+        if not hasattr(S3Client._local, "s3_resources"):
+            S3Client._local.s3_resources = {}
+        s3_resource = S3Client._local.s3_resources.get(self.region_name)
+        if s3_resource is None:
+            s3_resource = self.get_session().resource('s3', config = self.get_config(),
+                                                      endpoint_url = S3_CLIENT_ENDPOINT_URL)
+            S3Client._local.s3_resources[self.region_name] = s3_resource
+        return s3_resource
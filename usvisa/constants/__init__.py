@@ -14,7 +14,9 @@ FILE_NAME: str = "usvisa.csv"
 TRAIN_FILE_NAME: str = "train.csv"
 TEST_FILE_NAME: str = "test.csv"
 MODEL_FILE_NAME: str = "model.pkl"
+TRAINING_CASE_IDS_FILE_NAME: str = "training_case_ids.npy"
 TARGET_COLUMN = "case_status"
+CASE_ID_COLUMN = "case_id"
 CURRENT_YEAR = date.today().year
 SCHEMA_FILE_PATH = os.path.join('config', 'schema.yaml')
 PREPROCSSING_OBJECT_FILE_NAME = "preprocessing.pkl"
@@ -24,6 +26,53 @@ AWS_REGION = "ap-south-1"
 APP_HOST = "0.0.0.0"
 APP_PORT = 8080
 
+"""
+Logging related constants starts with LOG variable name
+"""
+LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+# Comma separated module=LEVEL pairs, e.g. "usvisa.entity.model_search=DEBUG,usvisa.cloud=WARNING"
+LOG_MODULE_LEVELS: str = os.getenv("LOG_MODULE_LEVELS", "")
+# Comma separated module=N pairs keeping one in every N records below WARNING from each call site
+LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "usvisa.entity.estimator=100,usvisa.configuration.mongo_db_connection=100")
+LOG_JSON: bool = os.getenv("LOG_JSON", "false").lower() == "true"
+LOG_REQUEST_ID_HEADER: str = "X-Request-ID"
+
+"""
+Inference pool related constants starts with INFERENCE_POOL variable name
+"""
+# "thread" shares one loaded model between threads, "process" preloads a model in every worker process
+INFERENCE_POOL_MODE: str = os.getenv("INFERENCE_POOL_MODE", "thread")
+INFERENCE_POOL_MAX_WORKERS: int = int(os.getenv("INFERENCE_POOL_MAX_WORKERS", "4"))
+INFERENCE_POOL_MAX_QUEUE_SIZE: int = int(os.getenv("INFERENCE_POOL_MAX_QUEUE_SIZE", "16"))
+
+"""
+Admission control related constants starts with ADMISSION_CONTROL variable name
+"""
+ADMISSION_CONTROL_CONFIG_FILE_PATH: str = os.path.join("config", "admission_control.yaml")
+# Time the caller is still waiting for the response, in milliseconds from when the request arrives
+ADMISSION_CONTROL_DEADLINE_HEADER: str = "X-Request-Deadline-Ms"
+
+"""
+Model warm-up related constants starts with MODEL_WARMUP variable name
+"""
+MODEL_WARMUP_N_PREDICTIONS: int = int(os.getenv("MODEL_WARMUP_N_PREDICTIONS", "20"))
+MODEL_WARMUP_RANDOM_STATE: int = 42
+# Seconds between checks of the model version in S3, a new version is loaded and warmed up; 0 disables the checks
+MODEL_WARMUP_REFRESH_INTERVAL_SECONDS: float = float(os.getenv("MODEL_WARMUP_REFRESH_INTERVAL_SECONDS", "60"))
+
+"""
+S3 client related constants starts with S3_CLIENT variable name
+"""
+# Connections shared by the threads using the S3 client; keep it at least the number of concurrent transfers
+S3_CLIENT_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_CLIENT_MAX_POOL_CONNECTIONS", "50"))
+# One of legacy, standard, adaptive
+S3_CLIENT_RETRY_MODE: str = os.getenv("S3_CLIENT_RETRY_MODE", "standard")
+S3_CLIENT_MAX_ATTEMPTS: int = int(os.getenv("S3_CLIENT_MAX_ATTEMPTS", "5"))
+S3_CLIENT_CONNECT_TIMEOUT: float = float(os.getenv("S3_CLIENT_CONNECT_TIMEOUT", "5"))
+S3_CLIENT_READ_TIMEOUT: float = float(os.getenv("S3_CLIENT_READ_TIMEOUT", "60"))
+# Endpoint of a local S3 stand-in such as MinIO or LocalStack, e.g. http://localhost:9000; unset for AWS
+S3_CLIENT_ENDPOINT_URL: str = os.getenv("S3_CLIENT_ENDPOINT_URL") or None
+
 """
 Data Ingestion related constants starts with DATA_INGESTION variable name
 """
@@ -33,6 +82,7 @@ DATA_INGESTION_DIR_NAME: str = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR: str = "feature_store"
 DATA_INGESTION_INGESTED_DIR: str = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO: float = 0.2
+DATA_INGESTION_RANDOM_STATE: int = 42
 
 """
 Data Validation related constants starts with DATA_VALIDATION varible name
@@ -41,7 +91,18 @@ DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_VALID_DIR: str = "validated"
 DATA_VALIDATION_INVALID_DIR: str = "invalid"
 DATA_VALIDATION_DRIFT_REPORT_DIR: str = "drfit_report"
-DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_DRIFT_REPORT_FILE_NAME: str = "report.json"
+DATA_VALIDATION_PRODUCTION_DRIFT_REPORT_FILE_NAME: str = "production_report.json"
+DATA_VALIDATION_DRIFT_THRESHOLD: float = 0.05
+DATA_VALIDATION_DRIFT_SHARE: float = 0.5
+DATA_VALIDATION_CATEGORICAL_STAT_TEST: str = "chisquare"
+DATA_VALIDATION_PSI_THRESHOLD: float = 0.1
+DATA_VALIDATION_REFERENCE_PROFILE_DIR: str = "reference_profile"
+DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME: str = "profile.json"
+DATA_VALIDATION_PROFILE_N_BINS: int = 20
+DATA_VALIDATION_CHUNK_SIZE: int = 100000
+DATA_VALIDATION_N_JOBS: int = int(os.getenv("DATA_VALIDATION_N_JOBS", 1))
+DATA_VALIDATION_MAX_INVALID_ROW_RATIO: float = 0.1
 
 """
 Data Transformation related constants starts with DATA_TRANSFORMATION variable name
@@ -49,6 +110,15 @@ Data Transformation related constants starts with DATA_TRANSFORMATION variable n
 DATA_TRANSFORAMTION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR : str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+DATA_TRANSFORMATION_CONFIG_FILE_PATH: str = os.path.join("config", "transformation.yaml")
+DATA_TRANSFORMATION_SAMPLE_WEIGHT_FILE_NAME: str = "train_sample_weight.npy"
+DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME: str = "resampling_report.yaml"
+DATA_TRANSFORMATION_FEATURES_FILE_NAME: str = "features.npy"
+DATA_TRANSFORMATION_TARGET_FILE_NAME: str = "target.npy"
+DATA_TRANSFORMATION_FEATURES_DTYPE: str = "float32"
+DATA_TRANSFORMATION_TARGET_DTYPE: str = "int8"
+DATA_TRANSFORMATION_MEMORY_PROFILE_FILE_NAME: str = "memory_profile.yaml"
+DATA_TRANSFORMATION_MAX_PEAK_MEMORY_RATIO: float = 4.0
 
 """
 Model Trainer related constants starts with MODEL_TRAINER variable name
@@ -58,10 +128,54 @@ MODEL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
 MODEL_TRAINER_TRAINED_MODEL_NAME: str = "model.pkl"
 MODEL_TRAINER_EXPECTED_SCORE: float = 0.6
 MODEL_TRAINER_MODEL_CONFIG_FILE_PATH: str = os.path.join("config", "model.yaml")
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME: str = "search_report.yaml"
+MODEL_TRAINER_CV_RESULT_STORE_FILE_PATH: str = os.path.join(ARTIFACT_DIR, "cv_results.sqlite")
 
 """
 Model Evaluation related constants starts with MODEL_EVALUATION variable name
 """
-MODEL_EVALUATION_THRESHOLD_SCORE_CHANGE: float = 0.05   
+MODEL_EVALUATION_DIR_NAME: str = "model_evaluation"
+# Margin the lower confidence bound of the F1 gain over the production model must exceed for the model to be accepted
+MODEL_EVALUATION_THRESHOLD_SCORE_CHANGE: float = 0.0
+MODEL_EVALUATION_PREDICTION_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "production_model_predictions")
+MODEL_EVALUATION_REPORT_FILE_NAME: str = "evaluation_report.yaml"
+MODEL_EVALUATION_BOOTSTRAP_REPLICATES: int = 10000
+MODEL_EVALUATION_CONFIDENCE_LEVEL: float = 0.95
+MODEL_EVALUATION_RANDOM_STATE: int = 42
 MODEL_BUCKET_NAME = "usvisa-proj-v1"
-MODEL_PUSHER_S3_KEY = "model-registry"
\ No newline at end of file
+MODEL_PUSHER_DIR_NAME: str = "model_pusher"
+MODEL_PUSHER_S3_KEY = "model-registry"
+
+"""
+Incremental Trainer related constants starts with INCREMENTAL_TRAINER variable name
+"""
+INCREMENTAL_TRAINER_DIR_NAME: str = "incremental_trainer"
+INCREMENTAL_TRAINER_TRAINED_MODEL_DIR: str = "trained_model"
+INCREMENTAL_TRAINER_REPORT_FILE_NAME: str = "incremental_report.yaml"
+
+"""
+Stage cache related constants starts with STAGE_CACHE variable name
+"""
+STAGE_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "stage_cache")
+STAGE_CACHE_ARTIFACT_FILE_NAME: str = "artifact.pkl"
+STAGE_CACHE_FORCE_RECOMPUTE: bool = os.getenv("STAGE_CACHE_FORCE_RECOMPUTE", "false").lower() == "true"
+
+"""
+Run manifest related constants starts with RUN_MANIFEST variable name
+"""
+RUN_MANIFEST_FILE_NAME: str = "run_manifest.yaml"
+
+"""
+Pipeline DAG related constants starts with PIPELINE_DAG variable name
+"""
+PIPELINE_DAG_MAX_WORKERS: int = 4
+PIPELINE_DAG_REPORT_FILE_NAME: str = "pipeline_dag_report.yaml"
+PIPELINE_DAG_DATA_DRIFT_STAGE_NAME: str = "data_drift"
+PIPELINE_DAG_PRODUCTION_MODEL_PREFETCH_STAGE_NAME: str = "production_model_prefetch"
+
+"""
+Run profile related constants starts with RUN_PROFILE variable name
+"""
+RUN_PROFILE_FILE_NAME: str = "run_profile.json"
+RUN_PROFILE_CPROFILE_DIR_NAME: str = "cprofile"
+RUN_PROFILE_CPROFILE: bool = os.getenv("RUN_PROFILE_CPROFILE", "false").lower() == "true"
@@ -20,7 +20,9 @@ class DataValidationArtifact:
     """
     Data class for storing paths related to data validation artifacts.
     This class holds the file paths for valid and invalid training and testing datasets,
-    as well as the path for the drift report file.
+    as well as the path for the drift report file, the dataset-level drift decision and
+    the reference profile built from the training data. The production drift fields compare the training data
+    with the reference profile of the production model, and are None when there is no production model.
     """
     validation_status: bool
     valid_train_file_path: str
@@ -28,16 +30,27 @@ class DataValidationArtifact:
     invalid_train_file_path: str
     invalid_test_file_path: str
     drift_report_file_path: str
+    drift_status: bool
+    reference_profile_file_path: str
+    production_drift_report_file_path: str
+    production_drift_status: bool
 
 @dataclass
 class DataTransformationArtifact:
     """
     Data class for storing paths related to data transformation artifacts.
-    This class holds the file paths for transformed object files and transformed training and testing datasets.
+    This class holds the file paths for transformed object files, the feature (float32) and target (int8) arrays of
+    the transformed training and testing datasets, the resampling report, the training sample weights when class
+    weighting replaces resampling, and the per-step memory profile of the transformation.
     """
     transformed_object_file_path: str   
-    transformed_train_file_path: str
-    transformed_test_file_path: str
+    transformed_train_features_file_path: str
+    transformed_train_target_file_path: str
+    transformed_test_features_file_path: str
+    transformed_test_target_file_path: str
+    resampling_report_file_path: str
+    train_sample_weight_file_path: str
+    memory_profile_file_path: str
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -49,26 +62,52 @@ class ClassificationMetricArtifact:
     precision_score: float
     recall_score: float
 
+@dataclass
+class ServingCostArtifact:
+    """
+    Data class for storing the serving cost of a trained model measured on held-out data.
+    This class holds the serialized size, the load time, the single-row latency percentiles and the batch latency
+    and throughput of the model.
+    """
+    model_size_mb: float
+    load_seconds: float
+    p50_latency_ms: float
+    p99_latency_ms: float
+    batch_latency_ms: float
+    batch_rows_per_second: float
+
 @dataclass
 class ModelTrainerArtifact:
     """
     Data class for storing model training artifacts.
-    This class holds the path to the trained model file and the metric artifacts for both training and testing datasets.
+    This class holds the path to the trained model file and the metric artifacts for both training and testing datasets,
+    the serving cost of the selected model, the model search strategy with its total time, and the search report holding the score and time of every candidate.
+    The case_ids of the training rows are kept in a file next to the model, or None when they are unknown.
     """
     trained_model_file_path: str
     metric_artifact: ClassificationMetricArtifact
+    serving_cost_artifact: ServingCostArtifact
+    search_strategy: str
+    search_seconds: float
+    search_report_file_path: str
+    training_case_ids_file_path: str
     
 @dataclass
 class ModelEvaluationArtifact:
     """
     Data class for storing model evaluation artifacts.
     This class holds the evaluation status, accuracy score, and paths for the model registry and trained model.
-    It also includes a flag indicating whether the model is accepted based on the evaluation.
+    It also includes a flag indicating whether the model is accepted based on the evaluation, the confidence
+    interval of the F1 gain, the path of the bootstrap evaluation report and the case_ids file of the trained model.
     """
     is_model_accepted: bool
     changed_accuracy: float
     s3_model_path: str 
     trained_model_path: str
+    changed_accuracy_ci_low: float
+    changed_accuracy_ci_high: float
+    evaluation_report_file_path: str
+    training_case_ids_file_path: str
 
 
 @dataclass
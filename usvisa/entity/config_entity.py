@@ -46,6 +46,8 @@ class DataIngestionConfig:
     training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    # Fixed seed so that identical source data always produces identical splits (and stage cache hits)
+    random_state: int = DATA_INGESTION_RANDOM_STATE
     # MongoDB configurations
     collection_name:str = DATA_INGESTION_COLLECTION_NAME
 
@@ -56,7 +58,12 @@ class DataValidationConfig:
     This includes:
     - Directories for valid and invalid data.
     - File paths for valid and invalid training/testing data.
-    - Path for the drift report file.
+    - Path for the drift report file, and for the report of the training data against the production model.
+    - Drift thresholds: p-value threshold per column, share of drifted columns for dataset drift,
+      and the statistical test used for categorical columns ("chisquare" or "psi").
+    - Path and bin count of the reference profile, and the chunk size used to stream data against it.
+    - Number of worker processes for row validation, and the largest share of rejected rows that is tolerated.
+    - S3 bucket name and key path of the production model, whose reference profile the training data is compared to.
     """
 
     data_validation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
@@ -73,6 +80,22 @@ class DataValidationConfig:
     drift_report_file_path: str = os.path.join(data_validation_dir, 
                                                DATA_VALIDATION_DRIFT_REPORT_DIR, 
                                                DATA_VALIDATION_DRIFT_REPORT_FILE_NAME)
+    drift_threshold: float = DATA_VALIDATION_DRIFT_THRESHOLD
+    drift_share: float = DATA_VALIDATION_DRIFT_SHARE
+    categorical_stat_test: str = DATA_VALIDATION_CATEGORICAL_STAT_TEST
+    psi_threshold: float = DATA_VALIDATION_PSI_THRESHOLD
+    reference_profile_file_path: str = os.path.join(data_validation_dir,
+                                                    DATA_VALIDATION_REFERENCE_PROFILE_DIR,
+                                                    DATA_VALIDATION_REFERENCE_PROFILE_FILE_NAME)
+    profile_n_bins: int = DATA_VALIDATION_PROFILE_N_BINS
+    chunk_size: int = DATA_VALIDATION_CHUNK_SIZE
+    n_jobs: int = DATA_VALIDATION_N_JOBS
+    max_invalid_row_ratio: float = DATA_VALIDATION_MAX_INVALID_ROW_RATIO
+    production_drift_report_file_path: str = os.path.join(data_validation_dir,
+                                                          DATA_VALIDATION_DRIFT_REPORT_DIR,
+                                                          DATA_VALIDATION_PRODUCTION_DRIFT_REPORT_FILE_NAME)
+    model_bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_FILE_NAME
 
 @dataclass
 class DataTransformationConfig:
@@ -80,18 +103,30 @@ class DataTransformationConfig:
     Configuration class for the data transformation component of the pipeline.
     This includes:
     - Directory for data transformation artifacts.
-    - Paths for transformed training and testing data.
+    - Paths for transformed training and testing data, with features and target stored in separate arrays.
     - Path for the preprocessing object file.
+    - Path of the transformation YAML (resampling settings), the resampling report and the sample weights.
+    - Path of the per-step memory profile, and the peak memory tolerated as a multiple of the raw data size.
     """
 
     data_transformation_dir: str = os.path.join(training_pipeline_config.artifact_dir, DATA_TRANSFORAMTION_DIR_NAME)
 
-    transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                    TRAIN_FILE_NAME.replace("csv", "npy"))
-    transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
-                                                    TEST_FILE_NAME.replace("csv", "npy"))
+    transformed_train_features_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                             "train", DATA_TRANSFORMATION_FEATURES_FILE_NAME)
+    transformed_train_target_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                           "train", DATA_TRANSFORMATION_TARGET_FILE_NAME)
+    transformed_test_features_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                            "test", DATA_TRANSFORMATION_FEATURES_FILE_NAME)
+    transformed_test_target_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                          "test", DATA_TRANSFORMATION_TARGET_FILE_NAME)
     transformed_object_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR, 
                                                      PREPROCSSING_OBJECT_FILE_NAME)
+    train_sample_weight_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR,
+                                                      DATA_TRANSFORMATION_SAMPLE_WEIGHT_FILE_NAME)
+    resampling_report_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME)
+    transformation_config_file_path: str = DATA_TRANSFORMATION_CONFIG_FILE_PATH
+    memory_profile_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_MEMORY_PROFILE_FILE_NAME)
+    max_peak_memory_ratio: float = DATA_TRANSFORMATION_MAX_PEAK_MEMORY_RATIO
 
 @dataclass
 class ModelTrainerConfig:
@@ -101,12 +136,39 @@ class ModelTrainerConfig:
     - Directory for model training artifacts.
     - Path for the trained model file.
     - Expected accuracy for the model.
+    - Path for the model search report.
+    - Path of the cross-validation result store shared by all training runs.
+    - Path of the case_ids of the training rows, kept next to the model for incremental retraining.
     """
     
     model_trainer_dir: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_TRAINER_DIR_NAME)
     trained_model_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
     expected_accuracy: float = MODEL_TRAINER_EXPECTED_SCORE
     model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    search_report_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_SEARCH_REPORT_FILE_NAME)
+    cv_result_store_file_path: str = MODEL_TRAINER_CV_RESULT_STORE_FILE_PATH
+    training_case_ids_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINED_MODEL_DIR, TRAINING_CASE_IDS_FILE_NAME)
+
+
+@dataclass
+class IncrementalTrainerConfig:
+    """
+    Configuration class for the incremental trainer component of the pipeline.
+    This includes:
+    - Directory for incremental training artifacts.
+    - Path for the incrementally updated model file and for the report of the update.
+    - Path of the model config, whose incremental_training block sets the update options.
+    - S3 bucket name and key paths of the production model and of the case_ids of its training rows.
+    """
+    incremental_trainer_dir: str = os.path.join(training_pipeline_config.artifact_dir, INCREMENTAL_TRAINER_DIR_NAME)
+    trained_model_file_path: str = os.path.join(incremental_trainer_dir, INCREMENTAL_TRAINER_TRAINED_MODEL_DIR, MODEL_FILE_NAME)
+    training_case_ids_file_path: str = os.path.join(incremental_trainer_dir, INCREMENTAL_TRAINER_TRAINED_MODEL_DIR,
+                                                    TRAINING_CASE_IDS_FILE_NAME)
+    report_file_path: str = os.path.join(incremental_trainer_dir, INCREMENTAL_TRAINER_REPORT_FILE_NAME)
+    model_config_file_path: str = MODEL_TRAINER_MODEL_CONFIG_FILE_PATH
+    bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_FILE_NAME
+    s3_training_case_ids_key_path: str = TRAINING_CASE_IDS_FILE_NAME
 
 
 @dataclass
@@ -114,13 +176,21 @@ class ModelEvaluationConfig:
     """
     Configuration class for the model evaluation component of the pipeline.
     This includes:
-    - Threshold score change for model evaluation.
+    - Threshold score change for model evaluation, the margin the lower confidence bound of the F1 gain must exceed.
     - S3 bucket name for model storage.
     - S3 key path for the model file.
+    - Directory of the production model prediction cache shared by all pipeline runs.
+    - Path for the evaluation report, and the bootstrap replicates, confidence level and seed of the comparison.
     """
     threshold_score_change: float = MODEL_EVALUATION_THRESHOLD_SCORE_CHANGE
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    prediction_cache_dir: str = MODEL_EVALUATION_PREDICTION_CACHE_DIR
+    evaluation_report_file_path: str = os.path.join(training_pipeline_config.artifact_dir, MODEL_EVALUATION_DIR_NAME,
+                                                    MODEL_EVALUATION_REPORT_FILE_NAME)
+    n_bootstrap_replicates: int = MODEL_EVALUATION_BOOTSTRAP_REPLICATES
+    confidence_level: float = MODEL_EVALUATION_CONFIDENCE_LEVEL
+    random_state: int = MODEL_EVALUATION_RANDOM_STATE
 
 
 
@@ -130,12 +200,63 @@ class ModelPusherConfig:
     Configuration class for the model pusher component of the pipeline.
     This includes:
     - S3 bucket name for model storage.
-    - S3 key path for the model file.
+    - S3 key path for the model file, and for the case_ids of its training rows.
     """
     bucket_name: str = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    s3_training_case_ids_key_path: str = TRAINING_CASE_IDS_FILE_NAME
+
+@dataclass
+class StageCacheConfig:
+    """
+    Configuration class for the content-addressed stage cache shared by all pipeline runs.
+    This includes:
+    - Directory where cached stage outputs are stored.
+    - Flag to ignore cached outputs and recompute every stage.
+    """
+    cache_dir: str = STAGE_CACHE_DIR
+    force_recompute: bool = STAGE_CACHE_FORCE_RECOMPUTE
 
 @dataclass
 class UsVisaPredictorConfig:
     model_file_path: str = MODEL_FILE_NAME
-    model_bucket_name: str = MODEL_BUCKET_NAME
\ No newline at end of file
+    model_bucket_name: str = MODEL_BUCKET_NAME
+
+@dataclass
+class InferencePoolConfig:
+    """
+    Configuration class for the worker pool running predictions off the event loop.
+    This includes:
+    - Pool mode, "thread" or "process".
+    - Number of workers.
+    - Number of predictions allowed to wait for a worker before new ones are rejected.
+    """
+    mode: str = INFERENCE_POOL_MODE
+    max_workers: int = INFERENCE_POOL_MAX_WORKERS
+    max_queue_size: int = INFERENCE_POOL_MAX_QUEUE_SIZE
+
+@dataclass
+class AdmissionControlConfig:
+    """
+    Configuration class for the admission control of the prediction routes.
+    This includes:
+    - Path to the YAML file with the in-flight and queue limits of every route.
+    - Header carrying the deadline of a request.
+    """
+    config_file_path: str = ADMISSION_CONTROL_CONFIG_FILE_PATH
+    deadline_header: str = ADMISSION_CONTROL_DEADLINE_HEADER
+
+@dataclass
+class ModelWarmupConfig:
+    """
+    Configuration class for the warm-up of the served model at startup.
+    This includes:
+    - Number of synthetic predictions run before the app reports ready.
+    - Seed of the synthetic inputs.
+    - Path to the schema providing the categories of the synthetic inputs.
+    - Seconds between checks for a new model version, which is then loaded and warmed up.
+    """
+    n_predictions: int = MODEL_WARMUP_N_PREDICTIONS
+    random_state: int = MODEL_WARMUP_RANDOM_STATE
+    schema_file_path: str = SCHEMA_FILE_PATH
+    refresh_interval_seconds: float = MODEL_WARMUP_REFRESH_INTERVAL_SECONDS
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import importlib
+from datetime import datetime
+from typing import List, Optional
+
+import sklearn
+from sklearn.pipeline import Pipeline
+
+from usvisa.exception.exception import UsVisaException
+
+
+class CVResultStore:
+    """
+    CVResultStore persists cross-validation results of model search candidates in a SQLite database shared by all
+    training runs. Every result is keyed by the hash of the training data, the estimator class, its full parameters,
+    the cross-validation config and the versions of scikit-learn and of the estimator's library, so a candidate is
+    only cross-validated again when one of these changes.
+    """
+    def __init__(self, db_file_path: str):
+        try:
+            self.db_file_path = db_file_path
+            os.makedirs(os.path.dirname(db_file_path) or ".", exist_ok = True)
+            with self.connect() as connection:
+                connection.execute("""
+                    CREATE TABLE IF NOT EXISTS cv_results (
+                        key TEXT PRIMARY KEY,
+                        dataset_hash TEXT NOT NULL,
+                        estimator TEXT NOT NULL,
+                        params TEXT NOT NULL,
+                        cv_config TEXT NOT NULL,
+                        library_version TEXT NOT NULL,
+                        mean_score REAL NOT NULL,
+                        std_score REAL NOT NULL,
+                        fit_seconds REAL NOT NULL,
+                        score_seconds REAL NOT NULL,
+                        created_at TEXT NOT NULL
+                    )""")
+                connection.execute("CREATE INDEX IF NOT EXISTS cv_results_dataset ON cv_results (dataset_hash, mean_score)")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def connect(self) -> sqlite3.Connection:
+        # Concurrent training runs may share the store; WAL lets readers proceed while a run writes
+        connection = sqlite3.connect(self.db_file_path, timeout = 30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    @staticmethod
+    def get_entry(dataset_hash: str, estimator: object, cv_config: dict) -> dict:
+        """
+        Describes a candidate evaluation by its key fields: the estimator's class path, its parameters and the
+        library versions, together with the key hashed from all of them. For a pipeline, e.g. a native categorical
+        candidate, the class path and library are those of its final step, with the parameters of the whole pipeline.
+        """
+        estimator_class = type(estimator.steps[-1][1] if isinstance(estimator, Pipeline) else estimator)
+        library = importlib.import_module(estimator_class.__module__.split(".")[0])
+        entry = {
+            "dataset_hash": dataset_hash,
+            "estimator": f"{estimator_class.__module__}.{estimator_class.__name__}",
+            "params": json.dumps(estimator.get_params(), sort_keys = True, default = str),
+            "cv_config": json.dumps(cv_config, sort_keys = True, default = str),
+            "library_version": f"scikit-learn={sklearn.__version__};{library.__name__}={getattr(library, '__version__', '')}"
+        }
+        entry["key"] = hashlib.sha256(json.dumps(entry, sort_keys = True).encode()).hexdigest()
+        return entry
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the stored result of a candidate, or None when it was never evaluated.
+        """
+        try:
+            with self.connect() as connection:
+                row = connection.execute(
+                    "SELECT mean_score, std_score, fit_seconds, score_seconds FROM cv_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            return dict(zip(("mean_score", "std_score", "fit_seconds", "score_seconds"), row))
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def put(self, entry: dict, result: dict) -> None:
+        try:
+            with self.connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO cv_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry["key"], entry["dataset_hash"], entry["estimator"], entry["params"], entry["cv_config"],
+                     entry["library_version"], result["mean_score"], result["std_score"], result["fit_seconds"],
+                     result["score_seconds"], datetime.now().isoformat()))
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_best(self, dataset_hash: str = None, limit: int = 1) -> List[dict]:
+        """
+        Returns the best results stored so far, for one training dataset or across all of them.
+        """
+        try:
+            query = "SELECT dataset_hash, estimator, params, cv_config, mean_score, std_score, created_at FROM cv_results"
+            arguments = ()
+            if dataset_hash is not None:
+                query += " WHERE dataset_hash = ?"
+                arguments = (dataset_hash,)
+            with self.connect() as connection:
+                rows = connection.execute(query + " ORDER BY mean_score DESC LIMIT ?", arguments + (limit,)).fetchall()
+            columns = ("dataset_hash", "estimator", "params", "cv_config", "mean_score", "std_score", "created_at")
+            return [dict(zip(columns, row), params = json.loads(row[2]), cv_config = json.loads(row[3])) for row in rows]
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
@@ -1,5 +1,6 @@
 import sys
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.pipeline import Pipeline
 from usvisa.logger.logger import logging
 from usvisa.exception.exception import UsVisaException
@@ -26,9 +27,14 @@ class TargetValueMapping:
     
     
 class UsVisaModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object, reference_profile: object = None,
+                 dense_input: bool = False):
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        # ReferenceProfile of the training data, versioned together with the model for drift checks
+        self.reference_profile = reference_profile
+        # Whether sparse preprocessor output has to be densified for the trained model
+        self.dense_input = dense_input
 
     def predict(self, dataframe: pd.DataFrame) -> pd.DataFrame:
         """
@@ -40,6 +46,8 @@ class UsVisaModel:
         try:
             logging.info("Using the trained model to get predictions")
             transformed_feature = self.preprocessing_object.transform(dataframe)
+            if getattr(self, "dense_input", False) and sp.issparse(transformed_feature):
+                transformed_feature = transformed_feature.toarray()
             return self.trained_model_object.predict(transformed_feature)
         
         except Exception as e:
@@ -0,0 +1,350 @@
+import sys
+import time
+import hashlib
+import importlib
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs, parallel_config
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.utils.validation import has_fit_parameter
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.utils.main_utils import read_yaml_file
+from usvisa.entity.cv_result_store import CVResultStore
+from usvisa.entity.native_categorical import NativeCategoricalEncoder, set_native_categorical_params
+
+SEARCH_STRATEGIES = ("grid", "random", "halving")
+
+
+@dataclass
+class BestModelDetail:
+    """
+    Data class for the outcome of a model search: the best model refit on the full training data,
+    its mean cross-validation score and the parameters it was searched with.
+    """
+    best_model: object
+    best_score: float
+    best_parameters: dict
+    model_name: str
+
+
+def _get_model(estimator: object) -> object:
+    """
+    Returns the model of a candidate, which is the last step of a native categorical pipeline.
+    """
+    return estimator.steps[-1][1] if isinstance(estimator, Pipeline) else estimator
+
+
+def _get_fit_params(estimator: object, sample_weight: Optional[np.ndarray]) -> dict:
+    if sample_weight is None:
+        return {}
+    return {f"{estimator.steps[-1][0]}__sample_weight" if isinstance(estimator, Pipeline) else "sample_weight": sample_weight}
+
+
+def _fit_and_score(estimator: object, X: object, y: np.ndarray, train_index: np.ndarray, test_index: np.ndarray,
+                   scoring: Optional[str], sample_weight: Optional[np.ndarray]) -> Tuple[float, float, float]:
+    """
+    Fits an estimator on one cross-validation fold and scores it on the held-out rows.
+    Returns the score, the fit time and the score time.
+    """
+    fit_params = _get_fit_params(estimator, None if sample_weight is None else sample_weight[train_index])
+    start_time = time.perf_counter()
+    estimator.fit(X[train_index], y[train_index], **fit_params)
+    fit_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    score = check_scoring(estimator, scoring = scoring)(estimator, X[test_index], y[test_index])
+    return float(score), fit_seconds, time.perf_counter() - start_time
+
+
+
+class ModelSearch:
+    """
+    ModelSearch cross-validates the grid points of every model family in the model config and returns the best model.
+    All (candidate, fold) fits are spread over one joblib worker pool instead of searching family after family.
+    Memory-mapped training arrays are passed to the workers by reference to their file, and other large arrays are
+    memory-mapped by joblib, so the training data is not pickled for every task.
+
+    The `grid_search.params` block of the model config sets `cv`, `scoring` (the estimator's default score when
+    unset), `n_jobs`, the joblib `backend`, `verbose` and the search strategy:
+    - "grid" evaluates every grid point.
+    - "random" evaluates `n_iter` grid points drawn at random across all model families.
+    - "halving" runs successive halving: all grid points start with a small `resource` budget, either "n_samples"
+      (rows of the training data) or an estimator parameter such as "n_estimators", and after every round only the
+      best 1/`factor` of the candidates continue with `factor` times more resource.
+    `time_budget_seconds` bounds the wall-clock time of any strategy: once spent, no further batch of candidates
+    is started and the best candidate evaluated so far is kept.
+    With a CVResultStore and the hash of the training data, candidates evaluated by earlier runs on the same data are
+    read from the store instead of being cross-validated again.
+    `threads_per_worker` caps the OpenMP/BLAS threads of the estimators in every loky worker, so multi-threaded
+    models (e.g. histogram gradient boosting) do not oversubscribe the cores taken by `n_jobs` workers.
+
+    Modules with `native_categorical: true` are searched on the feature layout of the preprocessor (see
+    `get_feature_layout`): their one-hot columns are collapsed back into category codes by a NativeCategoricalEncoder
+    step and the model is told which columns are categorical.
+    """
+    def __init__(self, model_config_path: str, cv_result_store: CVResultStore = None, feature_layout: dict = None):
+        try:
+            self.model_config = read_yaml_file(model_config_path)
+            self.cv_result_store = cv_result_store
+            self.feature_layout = feature_layout
+            self.dataset_hash = None
+            self.search_params = self.model_config["grid_search"].get("params") or {}
+            self.strategy = self.search_params.get("strategy", "grid")
+            if self.strategy not in SEARCH_STRATEGIES:
+                raise ValueError(f"Unknown search strategy {self.strategy}, expected one of {SEARCH_STRATEGIES}")
+            resource_name = self.search_params.get("resource", "n_samples")
+            if self.strategy == "halving" and resource_name != "n_samples" and self.search_params.get("max_resources") is None:
+                raise ValueError(f"Halving on the estimator parameter {resource_name} needs max_resources in the grid_search params")
+            self.candidate_results: List[dict] = []
+            self.start_time = None
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_candidates(self) -> List[Tuple[str, object, dict]]:
+        """
+        Expands the `model_selection` modules into (module name, unfitted estimator, searched parameters) candidates,
+        one per point of each module's `search_param_grid` on top of its base `params`. Candidates of native
+        categorical modules are pipelines of a NativeCategoricalEncoder and the model.
+        """
+        try:
+            candidates = []
+            for module_name, module_config in self.model_config["model_selection"].items():
+                estimator_class = getattr(importlib.import_module(module_config["module"]), module_config["class"])
+                base_params = module_config.get("params") or {}
+                native_categorical = module_config.get("native_categorical", False)
+                if native_categorical and self.feature_layout is None:
+                    raise ValueError(f"{module_name} uses native categorical features, which need the feature layout")
+                for grid_params in ParameterGrid(module_config.get("search_param_grid") or {}):
+                    estimator = estimator_class(**{**base_params, **grid_params})
+                    if native_categorical:
+                        encoder = NativeCategoricalEncoder(onehot_group_sizes = self.feature_layout["onehot_group_sizes"],
+                                                           n_ordinal_columns = self.feature_layout["n_ordinal_columns"])
+                        n_features = self.feature_layout["n_features"] - sum(encoder.onehot_group_sizes) + len(encoder.onehot_group_sizes)
+                        if not set_native_categorical_params(estimator, encoder.n_categorical_features, n_features):
+                            logging.info(f"{module_config['class']} has no categorical feature parameter, "
+                                         f"category codes are used as numerical features")
+                        estimator = Pipeline([("native_categorical", encoder), ("model", estimator)])
+                    candidates.append((module_name, estimator, grid_params))
+            return candidates
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def is_budget_spent(self) -> bool:
+        time_budget = self.search_params.get("time_budget_seconds")
+        return time_budget is not None and time.perf_counter() - self.start_time >= time_budget
+
+    def get_result(self, candidates: List[Tuple[str, object, dict]], index: int, search_round: int,
+                   resource: Optional[Tuple[str, int]], scores: dict, cached: bool) -> dict:
+        module_name, estimator, grid_params = candidates[index]
+        result = {
+            "candidate": index,
+            "module": module_name,
+            "estimator": type(_get_model(estimator)).__name__,
+            "params": grid_params,
+            "round": search_round,
+            "resource": None if resource is None else {resource[0]: int(resource[1])},
+            "cached": cached,
+            **scores
+        }
+        logging.info(f"{result['estimator']} {grid_params} {result['resource'] or ''}: "
+                     f"score {result['mean_score']:.4f} (+/- {result['std_score']:.4f}), "
+                     f"fit {result['fit_seconds']}s, score {result['score_seconds']}s{' (cached)' if cached else ''}")
+        return result
+
+    def evaluate(self, parallel: Parallel, candidates: List[Tuple[str, object, dict]], candidate_indices: List[int],
+                 X: object, y: np.ndarray, candidate_weights: List[Optional[np.ndarray]], rows: np.ndarray = None,
+                 resource: Tuple[str, int] = None, search_round: int = 0) -> List[dict]:
+        """
+        Cross-validates the given candidates in batches of one candidate per worker, optionally on a subset of `rows`
+        or with an estimator parameter set to a `resource` value, and logs the score and timings of each.
+        Candidates found in the CV result store are not fit again, and new results are added to it.
+        Stops starting new batches once the time budget is spent; returns the results of the evaluated candidates.
+        """
+        try:
+            subset = rows is not None
+            rows = np.arange(len(y)) if rows is None else rows
+            folds = [(rows[train_index], rows[test_index]) for train_index, test_index in
+                     StratifiedKFold(n_splits = self.search_params.get("cv", 3)).split(np.zeros(len(rows)), y[rows])]
+            scoring = self.search_params.get("scoring")
+            batch_size = effective_n_jobs(self.search_params.get("n_jobs", 1))
+            cv_config = {"cv": len(folds), "scoring": scoring, "n_rows": len(rows),
+                         "rows_hash": hashlib.sha256(rows.tobytes()).hexdigest() if subset else None}
+
+            results, pending, store_entries = [], [], {}
+            for index in candidate_indices:
+                estimator = clone(candidates[index][1])
+                # Families without the resource parameter (e.g. n_estimators of KNeighborsClassifier) run unchanged
+                if resource is not None and resource[0] != "n_samples" and resource[0] in _get_model(estimator).get_params():
+                    _get_model(estimator).set_params(**{resource[0]: resource[1]})
+
+                if self.cv_result_store is not None and self.dataset_hash is not None:
+                    entry = CVResultStore.get_entry(self.dataset_hash, estimator,
+                                                    {**cv_config, "sample_weight": candidate_weights[index] is not None})
+                    stored_scores = self.cv_result_store.get(entry["key"])
+                    if stored_scores is not None:
+                        results.append(self.get_result(candidates, index, search_round, resource, stored_scores, cached = True))
+                        continue
+                    store_entries[index] = entry
+                pending.append((index, estimator))
+
+            for batch_start in range(0, len(pending), batch_size):
+                if results and self.is_budget_spent():
+                    logging.info(f"Search time budget spent, skipped {len(pending) - batch_start} candidates")
+                    break
+                batch = pending[batch_start:batch_start + batch_size]
+                fold_results = parallel(
+                    delayed(_fit_and_score)(estimator, X, y, train_index, test_index, scoring, candidate_weights[index])
+                    for index, estimator in batch for train_index, test_index in folds
+                )
+                for position, (index, _) in enumerate(batch):
+                    scores, fit_seconds, score_seconds = zip(*fold_results[position * len(folds):(position + 1) * len(folds)])
+                    summary = {
+                        "mean_score": float(np.mean(scores)),
+                        "std_score": float(np.std(scores)),
+                        "fit_seconds": round(float(np.sum(fit_seconds)), 3),
+                        "score_seconds": round(float(np.sum(score_seconds)), 3)
+                    }
+                    if index in store_entries:
+                        self.cv_result_store.put(store_entries[index], summary)
+                    results.append(self.get_result(candidates, index, search_round, resource, summary, cached = False))
+            return results
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def search_halving(self, parallel: Parallel, candidates: List[Tuple[str, object, dict]], X: object, y: np.ndarray,
+                       candidate_weights: List[Optional[np.ndarray]]) -> List[dict]:
+        """
+        Successive halving over all candidates. The first round's resource is `min_resources`, or by default the
+        amount that reaches `max_resources` (all rows for "n_samples") in the last round. Returns the results of
+        the last round that was evaluated.
+        """
+        try:
+            resource_name = self.search_params.get("resource", "n_samples")
+            factor = self.search_params.get("factor", 3)
+            n_rounds = 1 + int(np.floor(np.log(len(candidates)) / np.log(factor)))
+            max_resources = len(y) if resource_name == "n_samples" else self.search_params["max_resources"]
+            resources = self.search_params.get("min_resources") or max(max_resources // factor ** (n_rounds - 1), 1)
+            random_generator = np.random.default_rng(self.search_params.get("random_state"))
+
+            candidate_indices, results = list(range(len(candidates))), []
+            for search_round in range(n_rounds):
+                resources = min(resources, max_resources)
+                rows = None
+                if resource_name == "n_samples" and resources < len(y):
+                    rows = np.sort(random_generator.choice(len(y), size = resources, replace = False))
+                logging.info(f"Halving round {search_round}: {len(candidate_indices)} candidates with {resource_name}={resources}")
+
+                round_results = self.evaluate(parallel, candidates, candidate_indices, X, y, candidate_weights,
+                                              rows = rows, resource = (resource_name, resources), search_round = search_round)
+                self.candidate_results.extend(round_results)
+                results = round_results
+                if len(round_results) < len(candidate_indices) or self.is_budget_spent():
+                    break
+
+                n_kept = int(np.ceil(len(candidate_indices) / factor))
+                if n_kept < 1 or len(candidate_indices) == 1:
+                    break
+                ranked = sorted(round_results, key = lambda result: result["mean_score"], reverse = True)
+                candidate_indices = [result["candidate"] for result in ranked[:n_kept]]
+                resources *= factor
+            return results
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_finalists(self, X: object, y: np.ndarray, sample_weight: Optional[np.ndarray] = None,
+                      dataset_hash: str = None, n_finalists: int = 1) -> List[BestModelDetail]:
+        """
+        Searches the candidates with the configured strategy and refits the best candidate of each model family, for
+        the `n_finalists` families with the best mean scores, on the full data. Finalists are ordered by score.
+        Sample weights are used by the estimators whose fit accepts them. `dataset_hash` identifies the training data
+        (features, target and sample weights) in the CV result store.
+        """
+        try:
+            self.start_time = time.perf_counter()
+            self.dataset_hash = dataset_hash
+            if self.cv_result_store is not None and dataset_hash is not None:
+                for best_so_far in self.cv_result_store.get_best(dataset_hash):
+                    logging.info(f"Best stored result for this data so far: {best_so_far['estimator']} "
+                                 f"with score {best_so_far['mean_score']:.4f}")
+            self.candidate_results = []
+            candidates = self.get_candidates()
+            candidate_weights = [sample_weight if sample_weight is not None and has_fit_parameter(_get_model(estimator), "sample_weight")
+                                 else None for _, estimator, _ in candidates]
+
+            candidate_indices = list(range(len(candidates)))
+            if self.strategy == "random":
+                n_iter = min(self.search_params.get("n_iter", 10), len(candidates))
+                random_generator = np.random.default_rng(self.search_params.get("random_state"))
+                candidate_indices = sorted(random_generator.choice(len(candidates), size = n_iter, replace = False).tolist())
+            logging.info(f"Searching {len(candidate_indices)} of {len(candidates)} candidates with the {self.strategy} "
+                         f"strategy on n_jobs={self.search_params.get('n_jobs', 1)}")
+
+            with parallel_config(backend = self.search_params.get("backend", "loky"),
+                                 inner_max_num_threads = self.search_params.get("threads_per_worker")), \
+                    Parallel(n_jobs = self.search_params.get("n_jobs", 1),
+                             verbose = self.search_params.get("verbose", 0),
+                             max_nbytes = "1M", mmap_mode = "r") as parallel:
+                if self.strategy == "halving":
+                    final_results = self.search_halving(parallel, candidates, X, y, candidate_weights)
+                else:
+                    final_results = self.evaluate(parallel, candidates, candidate_indices, X, y, candidate_weights)
+                    self.candidate_results.extend(final_results)
+
+            # Best candidate of every model family, best families first
+            family_results = {}
+            for result in sorted(final_results, key = lambda result: result["mean_score"], reverse = True):
+                family_results.setdefault(result["module"], result)
+
+            finalists = []
+            for result in list(family_results.values())[:n_finalists]:
+                module_name, estimator, grid_params = candidates[result["candidate"]]
+                model = clone(estimator)
+                # A halving estimator parameter (e.g. n_estimators) is refit with the value the candidate was scored with;
+                # "n_samples" needs nothing, the finalists are refit on all rows
+                for resource_name, resource_value in (result["resource"] or {}).items():
+                    if resource_name != "n_samples" and resource_name in _get_model(model).get_params():
+                        _get_model(model).set_params(**{resource_name: resource_value})
+                model.fit(X, y, **_get_fit_params(model, candidate_weights[result["candidate"]]))
+                logging.info(f"Finalist: {type(_get_model(model)).__name__} {grid_params} {result['resource'] or ''} "
+                             f"with score {result['mean_score']:.4f}")
+                finalists.append(BestModelDetail(best_model = model,
+                                                 best_score = result["mean_score"],
+                                                 best_parameters = _get_model(model).get_params(),
+                                                 model_name = module_name))
+            logging.info(f"Search took {self.get_search_seconds()}s")
+            return finalists
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_best_model(self, X: object, y: np.ndarray, sample_weight: Optional[np.ndarray] = None,
+                       dataset_hash: str = None) -> BestModelDetail:
+        """
+        Searches the candidates and returns the candidate with the best mean score, refit on the full data.
+        """
+        return self.get_finalists(X, y, sample_weight = sample_weight, dataset_hash = dataset_hash, n_finalists = 1)[0]
+
+    def get_search_seconds(self) -> float:
+        return round(time.perf_counter() - self.start_time, 3) if self.start_time is not None else 0.0
+
+    def get_search_report(self) -> dict:
+        """
+        Returns the strategy, the total search time and the score and time spent on every evaluated candidate.
+        """
+        return {
+            "strategy": self.strategy,
+            "search_seconds": self.get_search_seconds(),
+            "cached_candidates": sum(result["cached"] for result in self.candidate_results),
+            "candidates": self.candidate_results
+        }
@@ -0,0 +1,79 @@
+import sys
+from typing import List, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+
+from usvisa.exception.exception import UsVisaException
+
+
+def get_feature_layout(preprocessor: ColumnTransformer) -> dict:
+    """
+    Describes the output of the fitted DataTransformation preprocessor: the width of every one-hot column group,
+    the number of ordinal-encoded columns that follow them, and the total number of output columns.
+    """
+    try:
+        transformer_names = [name for name, _, _ in preprocessor.transformers_]
+        if transformer_names[:2] != ["OneHotEncoder", "Ordinal_Encoder"]:
+            raise ValueError(f"Expected the one-hot and ordinal encoders first in the preprocessor, got {transformer_names}")
+        return {
+            "onehot_group_sizes": [len(categories) for categories in preprocessor.named_transformers_["OneHotEncoder"].categories_],
+            "n_ordinal_columns": len(preprocessor.transformers_[1][2]),
+            "n_features": len(preprocessor.get_feature_names_out())
+        }
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+class NativeCategoricalEncoder(BaseEstimator, TransformerMixin):
+    """
+    NativeCategoricalEncoder turns the preprocessor output into a feature set for models that split on categories
+    natively: every one-hot column group is collapsed back into one category code and the ordinal codes that follow
+    are rounded, so resampled (SMOTE) rows lying between categories get their dominant category. The category codes
+    come first, followed by the remaining numerical columns.
+    """
+    def __init__(self, onehot_group_sizes: Sequence[int] = (), n_ordinal_columns: int = 0):
+        self.onehot_group_sizes = onehot_group_sizes
+        self.n_ordinal_columns = n_ordinal_columns
+
+    @property
+    def n_categorical_features(self) -> int:
+        return len(self.onehot_group_sizes) + self.n_ordinal_columns
+
+    def fit(self, X, y = None):
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        n_onehot_columns = int(sum(self.onehot_group_sizes))
+        categorical = X[:, :n_onehot_columns + self.n_ordinal_columns]
+        categorical = categorical.toarray() if sp.issparse(categorical) else np.asarray(categorical)
+        remaining = X[:, n_onehot_columns + self.n_ordinal_columns:]
+        remaining = remaining.toarray() if sp.issparse(remaining) else np.asarray(remaining)
+
+        group_starts = np.cumsum([0] + list(self.onehot_group_sizes))[:-1]
+        codes = [categorical[:, start:start + size].argmax(axis = 1) for start, size in zip(group_starts, self.onehot_group_sizes)]
+        ordinal_codes = np.rint(categorical[:, n_onehot_columns:])
+        return np.column_stack(codes + [ordinal_codes, remaining]).astype(np.float32)
+
+
+
+def set_native_categorical_params(estimator: object, n_categorical_features: int, n_features: int) -> List[str]:
+    """
+    Marks the leading `n_categorical_features` columns as categorical on the estimators that support it through
+    their parameters: `categorical_features` (HistGradientBoostingClassifier) or `feature_types` with
+    `enable_categorical` (XGBClassifier). Returns the names of the parameters that were set.
+    """
+    params = estimator.get_params()
+    is_categorical = [index < n_categorical_features for index in range(n_features)]
+    if "categorical_features" in params:
+        estimator.set_params(categorical_features = is_categorical)
+        return ["categorical_features"]
+    if "feature_types" in params and "enable_categorical" in params:
+        estimator.set_params(feature_types = ["c" if categorical else "q" for categorical in is_categorical],
+                             enable_categorical = True)
+        return ["feature_types", "enable_categorical"]
+    return []
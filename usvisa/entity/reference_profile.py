@@ -0,0 +1,189 @@
+import sys
+import json
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.utils.main_utils import write_json_file
+from usvisa.utils.drift_utils import get_binned_drift_report
+
+
+class ReferenceProfile:
+    """
+    ReferenceProfile is a compact sketch of a reference dataset used for drift checks: a histogram over quantile
+    bins for every numerical column and a frequency table for every categorical column. Its size depends on the
+    number of bins and categories, not on the number of rows, so batches can be streamed against it chunk by chunk.
+    The profile is saved with the validation artifacts and attached to the trained UsVisaModel, which versions it
+    with the model for serving and later retraining.
+    """
+    def __init__(self, numerical_columns: List[str], categorical_columns: List[str], n_bins: int = 20):
+        self.numerical_columns = list(numerical_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.n_bins = n_bins
+        self.n_rows = 0
+        # Inner bin edges per numerical column; the outer bins are open-ended so values outside the reference range still count
+        self.bin_edges: Dict[str, np.ndarray] = {}
+        self.bin_counts: Dict[str, np.ndarray] = {}
+        self.category_counts: Dict[str, Dict[str, int]] = {column: {} for column in self.categorical_columns}
+
+    def fit_bin_edges(self, dataframe: pd.DataFrame) -> None:
+        """
+        Sets the bin edges of every numerical column from the quantiles of a sample of the reference data.
+        """
+        try:
+            quantiles = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+            for column in self.numerical_columns:
+                values = dataframe[column].to_numpy(dtype = np.float64)
+                values = values[~np.isnan(values)]
+                edges = np.unique(np.quantile(values, quantiles)) if len(values) else np.empty(0)
+                self.bin_edges[column] = edges
+                self.bin_counts[column] = np.zeros(len(edges) + 1, dtype = np.int64)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def update(self, dataframe: pd.DataFrame) -> None:
+        """
+        Adds the rows of a chunk to the histograms and frequency tables. Columns missing from the chunk are skipped.
+        """
+        try:
+            self.n_rows += len(dataframe)
+            for column in self.numerical_columns:
+                if column not in dataframe.columns:
+                    continue
+                values = dataframe[column].to_numpy(dtype = np.float64)
+                values = values[~np.isnan(values)]
+                bins = np.searchsorted(self.bin_edges[column], values, side = "right")
+                self.bin_counts[column] += np.bincount(bins, minlength = len(self.bin_counts[column]))
+
+            for column in self.categorical_columns:
+                if column not in dataframe.columns:
+                    continue
+                counts = self.category_counts[column]
+                for category, count in dataframe[column].dropna().astype(str).value_counts().items():
+                    counts[category] = counts.get(category, 0) + int(count)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def empty_like(self) -> "ReferenceProfile":
+        """
+        Returns an empty profile sharing this profile's bin edges, to count a batch that is compared against it.
+        """
+        profile = ReferenceProfile(self.numerical_columns, self.categorical_columns, self.n_bins)
+        profile.bin_edges = self.bin_edges
+        profile.bin_counts = {column: np.zeros_like(counts) for column, counts in self.bin_counts.items()}
+        return profile
+
+    @classmethod
+    def from_csv(cls, file_path: str, numerical_columns: List[str], categorical_columns: List[str],
+                 n_bins: int = 20, chunk_size: int = 100000) -> "ReferenceProfile":
+        """
+        Builds a profile by streaming a CSV file in chunks. Bin edges are taken from the first chunk.
+        """
+        try:
+            profile = cls(numerical_columns, categorical_columns, n_bins)
+            for chunk in pd.read_csv(file_path, chunksize = chunk_size):
+                if not profile.bin_edges:
+                    profile.fit_bin_edges(chunk)
+                profile.update(chunk)
+            logging.info(f"Built reference profile of {profile.n_rows} rows from {file_path}")
+            return profile
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def profile_csv(self, file_path: str, chunk_size: int = 100000) -> "ReferenceProfile":
+        """
+        Streams a CSV batch into a profile using this profile's bins.
+        """
+        try:
+            profile = self.empty_like()
+            for chunk in pd.read_csv(file_path, chunksize = chunk_size):
+                profile.update(chunk)
+            return profile
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def profile_dataframe(self, dataframe: pd.DataFrame) -> "ReferenceProfile":
+        """
+        Counts an in-memory batch (e.g. a serving request batch) using this profile's bins.
+        """
+        profile = self.empty_like()
+        profile.update(dataframe)
+        return profile
+
+    def compare(self, current: "ReferenceProfile", threshold: float = 0.05, drift_share: float = 0.5,
+                categorical_stat_test: str = "chisquare", psi_threshold: float = 0.1) -> dict:
+        """
+        Compares the profile of a current batch against this reference profile and returns a drift report.
+        Only columns observed in the current batch are tested.
+        """
+        try:
+            numerical_columns = [column for column in self.numerical_columns if current.bin_counts[column].sum() > 0]
+            reference_bin_counts = [self.bin_counts[column] for column in numerical_columns]
+            current_bin_counts = [current.bin_counts[column] for column in numerical_columns]
+
+            categorical_columns = [column for column in self.categorical_columns if current.category_counts[column]]
+            reference_category_counts, current_category_counts = [], []
+            for column in categorical_columns:
+                categories = sorted(set(self.category_counts[column]) | set(current.category_counts[column]))
+                reference_category_counts.append([self.category_counts[column].get(c, 0) for c in categories])
+                current_category_counts.append([current.category_counts[column].get(c, 0) for c in categories])
+
+            def flatten(counts: list) -> np.ndarray:
+                return np.concatenate(counts).astype(np.float64) if counts else np.empty(0)
+
+            def column_ids(counts: list) -> np.ndarray:
+                return np.repeat(np.arange(len(counts)), [len(c) for c in counts]).astype(np.int64)
+
+            return get_binned_drift_report(
+                numerical_columns = numerical_columns,
+                reference_bin_counts = flatten(reference_bin_counts),
+                current_bin_counts = flatten(current_bin_counts),
+                bin_column_ids = column_ids(reference_bin_counts),
+                categorical_columns = categorical_columns,
+                reference_category_counts = flatten(reference_category_counts),
+                current_category_counts = flatten(current_category_counts),
+                category_column_ids = column_ids(reference_category_counts),
+                threshold = threshold, drift_share = drift_share,
+                categorical_stat_test = categorical_stat_test, psi_threshold = psi_threshold)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def to_dict(self) -> dict:
+        return {
+            "numerical_columns": self.numerical_columns,
+            "categorical_columns": self.categorical_columns,
+            "n_bins": self.n_bins,
+            "n_rows": self.n_rows,
+            "bin_edges": {column: edges.tolist() for column, edges in self.bin_edges.items()},
+            "bin_counts": {column: counts.tolist() for column, counts in self.bin_counts.items()},
+            "category_counts": self.category_counts
+        }
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "ReferenceProfile":
+        profile = cls(content["numerical_columns"], content["categorical_columns"], content["n_bins"])
+        profile.n_rows = content["n_rows"]
+        profile.bin_edges = {column: np.asarray(edges, dtype = np.float64) for column, edges in content["bin_edges"].items()}
+        profile.bin_counts = {column: np.asarray(counts, dtype = np.int64) for column, counts in content["bin_counts"].items()}
+        profile.category_counts = content["category_counts"]
+        return profile
+
+    def save(self, file_path: str) -> None:
+        write_json_file(file_path, self.to_dict())
+
+    @classmethod
+    def load(cls, file_path: str) -> "ReferenceProfile":
+        try:
+            with open(file_path, "r") as file:
+                return cls.from_dict(json.load(file))
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
@@ -31,6 +31,17 @@ class UsVisaEstimator:
             print(e)
             return False
         
+    def get_model_version(self) -> str:
+        """
+        This method returns the ETag and version id of the model in the S3 bucket, which change whenever
+        a new model is pushed. It returns None if the model is not present.
+        """
+        try:
+            return self.s3.get_object_version(bucket_name = self.bucket_name, s3_key = self.model_path)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
     def load_model(self) -> UsVisaModel:
         """
         This method loads the model from the S3 bucket.
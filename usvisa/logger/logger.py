@@ -1,9 +1,20 @@
 # Logging is essential for monitoring, debugging, and tracking the execution of code.
+# Records are put on a queue by the calling thread and written to the log file by a background listener thread,
+# so logging from the serving hot path never blocks on file I/O.
 
 import logging
 import os
-import sys
+import json
+import queue
+import atexit
+import threading
 from datetime import datetime
+from functools import lru_cache
+from contextvars import ContextVar
+from typing import Dict, Optional
+from logging.handlers import QueueHandler, QueueListener
+
+from usvisa.constants import LOG_LEVEL, LOG_MODULE_LEVELS, LOG_SAMPLING, LOG_JSON
 
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
@@ -12,11 +23,135 @@ os.makedirs(logs_path, exist_ok = True)
 
 LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-logging.basicConfig(
-    filename = LOG_FILE_PATH,
-    format = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s", 
-    level = logging.INFO
-)
+LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Id of the request being served, set by the app for every request and added to its log records
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default = None)
+
+
+def parse_module_settings(settings: str) -> Dict[str, str]:
+    """
+    Parses comma separated `module=value` pairs, e.g. "usvisa.entity.estimator=100,usvisa.components=DEBUG".
+    """
+    return dict(item.strip().split("=", 1) for item in settings.split(",") if "=" in item)
+
+
+@lru_cache(maxsize = None)
+def get_module_name(pathname: str) -> str:
+    """
+    Dotted module name of a source file of the project, e.g. usvisa.entity.estimator, as all modules log
+    through the root logger. Files outside the project are named by their file name.
+    """
+    relative_path = os.path.relpath(os.path.splitext(pathname)[0], PROJECT_ROOT)
+    if relative_path.startswith(os.pardir):
+        return os.path.basename(relative_path)
+    return relative_path.replace(os.sep, ".")
+
+
+def get_module_setting(module_settings: Dict[str, object], module_name: str) -> Optional[object]:
+    # The setting of the longest matching module prefix applies
+    for prefix in sorted(module_settings, key = len, reverse = True):
+        if module_name == prefix or module_name.startswith(prefix + "."):
+            return module_settings[prefix]
+    return None
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Applies the log level of the module a record comes from, falling back to the default level.
+    """
+    def __init__(self, default_level: int, module_levels: Dict[str, int]):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = get_module_setting(self.module_levels, get_module_name(record.pathname))
+        return record.levelno >= (self.default_level if level is None else level)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every N records below WARNING from each call site of the sampled hot-path modules.
+    Warnings and errors are never sampled out.
+    """
+    def __init__(self, sample_every: Dict[str, int]):
+        super().__init__()
+        self.sample_every = sample_every
+        self.counts: Dict[tuple, int] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        sample_every = get_module_setting(self.sample_every, get_module_name(record.pathname))
+        if sample_every is None or sample_every <= 1:
+            return True
+        with self.lock:
+            count = self.counts.get((record.pathname, record.lineno), 0)
+            self.counts[(record.pathname, record.lineno)] = count + 1
+        return count % sample_every == 0
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the id of the request being served to the record, in the thread that logs it.
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "module": get_module_name(record.pathname),
+            "lineno": record.lineno,
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage()
+        }
+        return json.dumps(log_entry)
+
+
+def configure_logging() -> QueueListener:
+    """
+    Routes the root logger through a QueueHandler to a file handler run by a QueueListener thread.
+    The module level and sampling filters run on the QueueHandler, so dropped records never reach the queue.
+    """
+    default_level = logging.getLevelName(LOG_LEVEL.upper())
+    module_levels = {module: logging.getLevelName(level.upper()) for module, level in parse_module_settings(LOG_MODULE_LEVELS).items()}
+    sample_every = {module: int(value) for module, value in parse_module_settings(LOG_SAMPLING).items()}
+
+    file_handler = logging.FileHandler(LOG_FILE_PATH)
+    file_handler.setFormatter(JsonFormatter() if LOG_JSON else logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(ModuleLevelFilter(default_level, module_levels))
+    queue_handler.addFilter(SamplingFilter(sample_every))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(queue_handler)
+    # The root level lets through the lowest configured level, the module level filter does the rest
+    root_logger.setLevel(min([default_level, *module_levels.values()]))
+
+    queue_listener = QueueListener(log_queue, file_handler, respect_handler_level = True)
+    queue_listener.start()
+    # Flushes the queued records to the file when the process exits
+    atexit.register(queue_listener.stop)
+    return queue_listener
+
+
+queue_listener = configure_logging()
 
 if __name__ == "__main__":
-    logging.info("Logger initialized successfully.")
\ No newline at end of file
+    logging.info("Logger initialized successfully.")
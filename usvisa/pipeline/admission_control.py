@@ -0,0 +1,133 @@
+import sys
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Optional
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.entity.config_entity import AdmissionControlConfig
+from usvisa.utils.main_utils import read_yaml_file
+
+
+class AdmissionRejectedError(Exception):
+    """ Raised when a request is shed by admission control, with the reason and the Retry-After for the caller """
+
+    def __init__(self, reason: str, retry_after_seconds: Optional[int] = None):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class RouteLimiter:
+    """
+    RouteLimiter bounds the requests of a route: at most `max_in_flight` are served at the same time and at most
+    `max_queue_size` wait for a slot, in arrival order. A request is shed when the queue is full, when it waited
+    `queue_timeout_seconds`, or when its deadline passed before it got a slot. It runs on the event loop thread,
+    so the counters need no lock.
+    """
+    def __init__(self, route: str, max_in_flight: int, max_queue_size: int, queue_timeout_seconds: float,
+                 retry_after_seconds: int):
+        self.route = route
+        self.max_in_flight = max_in_flight
+        self.max_queue_size = max_queue_size
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.admitted = 0
+        self.completed = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "deadline_exceeded": 0}
+
+    def reject(self, reason: str) -> AdmissionRejectedError:
+        self.shed[reason] += 1
+        logging.warning(f"Shedding a {self.route} request: {reason}, {self.in_flight} in flight, {len(self.waiters)} queued")
+        return AdmissionRejectedError(reason, None if reason == "deadline_exceeded" else self.retry_after_seconds)
+
+    async def acquire(self, deadline: Optional[float] = None) -> None:
+        """
+        Waits for a slot of the route, raising AdmissionRejectedError when the request is shed.
+        `deadline` is a time.monotonic() time after which the caller no longer waits for the response.
+        """
+        now = time.monotonic()
+        if deadline is not None and deadline <= now:
+            raise self.reject("deadline_exceeded")
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self.waiters) >= self.max_queue_size:
+            raise self.reject("queue_full")
+
+        # release() hands its slot over to the first waiter by setting its result
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        timeout = self.queue_timeout_seconds if deadline is None else min(self.queue_timeout_seconds, deadline - now)
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout = timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            raise
+        if not done:
+            waiter.cancel()
+            self.waiters.remove(waiter)
+            raise self.reject("deadline_exceeded" if deadline is not None and time.monotonic() >= deadline else "queue_timeout")
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.completed += 1
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def get_metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue_size": self.max_queue_size,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "shed": dict(self.shed)
+        }
+
+
+
+class AdmissionController:
+    """
+    AdmissionController holds a RouteLimiter for every route listed in the admission control config and reads the
+    deadline of a request from its deadline header, given as the milliseconds the caller is still waiting.
+    Routes that are not listed are not limited.
+    """
+    def __init__(self, admission_control_config: AdmissionControlConfig = AdmissionControlConfig()):
+        try:
+            self.admission_control_config = admission_control_config
+            routes = read_yaml_file(admission_control_config.config_file_path).get("routes") or {}
+            self.limiters: Dict[str, RouteLimiter] = {route: RouteLimiter(route = route, **limits)
+                                                      for route, limits in routes.items()}
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_limiter(self, route: str) -> Optional[RouteLimiter]:
+        return self.limiters.get(route)
+
+    def get_deadline(self, headers: dict) -> Optional[float]:
+        """
+        Converts the deadline header of a request to a time.monotonic() time, or None without a valid header.
+        """
+        try:
+            deadline_ms = float(headers.get(self.admission_control_config.deadline_header))
+        except (TypeError, ValueError):
+            return None
+        return time.monotonic() + deadline_ms / 1000
+
+    def get_metrics(self) -> dict:
+        return {route: limiter.get_metrics() for route, limiter in self.limiters.items()}
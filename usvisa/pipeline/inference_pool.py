@@ -0,0 +1,135 @@
+import sys
+import asyncio
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.entity.config_entity import InferencePoolConfig, UsVisaPredictorConfig
+from usvisa.pipeline.prediction_pipeline import UsVisaClassifier
+
+# Classifier of a process pool worker, loaded once by the worker initializer
+_worker_classifier: UsVisaClassifier = None
+
+
+def _init_worker(prediction_pipeline_config: UsVisaPredictorConfig) -> None:
+    global _worker_classifier
+    _worker_classifier = UsVisaClassifier(prediction_pipeline_config = prediction_pipeline_config)
+    _worker_classifier.get_estimator()
+
+
+def _predict_in_worker(input_data: dict) -> np.ndarray:
+    try:
+        return np.asarray(_worker_classifier.predict(dataframe = pd.DataFrame(input_data)))
+    except Exception as e:
+        # UsVisaException keeps the sys module in its args and cannot be pickled back to the parent process
+        raise RuntimeError(str(e)) from None
+
+
+class InferencePoolSaturatedError(Exception):
+    """ Raised when every worker of the inference pool is busy and its queue is full """
+
+
+class InferencePool:
+    """
+    InferencePool runs predictions on a worker pool so that building the input DataFrame, loading the model and
+    sklearn inference do not block the asyncio event loop, and a slow prediction does not delay the other requests.
+    In "thread" mode the workers share one UsVisaClassifier (sklearn releases the GIL in many kernels), with the
+    context of the calling request, so its request id stays on the log records. In "process" mode every worker
+    process preloads its own model.
+    At most `max_workers + max_queue_size` predictions are in flight; beyond that `predict` raises
+    InferencePoolSaturatedError straight away instead of queueing without bound. Predictions made with
+    `bounded=False`, such as the model warm-up, are counted but never rejected, so live load cannot fail them.
+    `reload` picks up a new model version pushed to S3.
+    """
+    def __init__(self, inference_pool_config: InferencePoolConfig = InferencePoolConfig(),
+                 prediction_pipeline_config: UsVisaPredictorConfig = UsVisaPredictorConfig()):
+        try:
+            self.inference_pool_config = inference_pool_config
+            self.prediction_pipeline_config = prediction_pipeline_config
+            self.max_in_flight = inference_pool_config.max_workers + inference_pool_config.max_queue_size
+            self.in_flight = 0
+            self.rejected = 0
+            self._lock = threading.Lock()
+            self.classifier: UsVisaClassifier = None
+            self.executor: Executor = self.get_executor()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_executor(self) -> Executor:
+        mode, max_workers = self.inference_pool_config.mode, self.inference_pool_config.max_workers
+        logging.info(f"Starting a {mode} inference pool with {max_workers} workers")
+        if mode == "thread":
+            self.classifier = UsVisaClassifier(prediction_pipeline_config = self.prediction_pipeline_config)
+            return ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = "inference")
+        if mode == "process":
+            # Forking a process running the logging listener and pool threads can deadlock, so workers are spawned
+            return ProcessPoolExecutor(max_workers = max_workers, mp_context = multiprocessing.get_context("spawn"),
+                                       initializer = _init_worker, initargs = (self.prediction_pipeline_config,))
+        raise ValueError(f"Unknown inference pool mode: {mode}, expected 'thread' or 'process'")
+
+    def predict_in_thread(self, input_data: dict) -> np.ndarray:
+        return np.asarray(self.classifier.predict(dataframe = pd.DataFrame(input_data)))
+
+    def get_queue_depth(self) -> int:
+        return max(self.in_flight - self.inference_pool_config.max_workers, 0)
+
+    def get_metrics(self) -> dict:
+        return {
+            "mode": self.inference_pool_config.mode,
+            "in_flight": self.in_flight,
+            "queue_depth": self.get_queue_depth(),
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected
+        }
+
+    def release(self, _) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    async def predict(self, input_data: dict, bounded: bool = True) -> np.ndarray:
+        """
+        Predicts the rows of `input_data`, a dict of column lists, on the pool without blocking the event loop.
+        """
+        with self._lock:
+            if bounded and self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                raise InferencePoolSaturatedError(f"{self.in_flight} predictions in flight, the inference pool is saturated")
+            self.in_flight += 1
+        try:
+            if self.inference_pool_config.mode == "thread":
+                context = contextvars.copy_context()
+                future = self.executor.submit(context.run, self.predict_in_thread, input_data)
+            else:
+                future = self.executor.submit(_predict_in_worker, input_data)
+        except Exception as e:
+            self.release(None)
+            raise UsVisaException(e, sys)
+        # The slot is freed when the prediction ends, even when the awaiting request has been cancelled
+        future.add_done_callback(self.release)
+        return await asyncio.wrap_future(future)
+
+    async def reload(self) -> None:
+        """
+        Loads the model again if its version in S3 changed. In "thread" mode the shared classifier swaps the new model
+        in once it is loaded. Worker processes load their model once, so in "process" mode a new pool is started,
+        whose workers load the current model, and the old pool is shut down once its predictions finished.
+        """
+        try:
+            if self.inference_pool_config.mode == "thread":
+                await asyncio.to_thread(self.classifier.refresh)
+                return
+            executor, self.executor = self.executor, self.get_executor()
+            executor.shutdown(wait = False)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait = True, cancel_futures = True)
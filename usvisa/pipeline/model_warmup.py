@@ -0,0 +1,136 @@
+import sys
+import time
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.constants import CURRENT_YEAR
+from usvisa.entity.config_entity import ModelWarmupConfig
+from usvisa.entity.s3_estimator import UsVisaEstimator
+from usvisa.pipeline.inference_pool import InferencePool
+from usvisa.utils.main_utils import read_yaml_file
+
+
+def get_warmup_rows(schema_config: dict, n_rows: int, random_state: int = None) -> List[dict]:
+    """
+    Builds synthetic single-row inputs in the format of UsVisaData.get_usvisa_data_as_dict. The categorical columns
+    cycle through the allowed categories of the schema, so every encoder column is exercised, and the numerical
+    columns are drawn within the schema ranges.
+    """
+    try:
+        rng = np.random.default_rng(random_state)
+        allowed_categories = schema_config["allowed_categories"]
+        numerical_ranges = schema_config.get("numerical_ranges") or {}
+        categorical_columns = schema_config["or_columns"] + schema_config["oh_columns"]
+        rows = []
+        for i in range(n_rows):
+            row = {column: [allowed_categories[column][i % len(allowed_categories[column])]] for column in categorical_columns}
+            for column in ("no_of_employees", "prevailing_wage"):
+                low = numerical_ranges.get(column, {}).get("min", 0)
+                row[column] = [int(low + rng.lognormal(mean = 7, sigma = 2))]
+            # company_age is derived from yr_of_estab, as in engineer_features
+            row["company_age"] = [CURRENT_YEAR - int(rng.integers(numerical_ranges.get("yr_of_estab", {}).get("min", 1800), CURRENT_YEAR))]
+            rows.append(row)
+        return rows
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+class ModelWarmup:
+    """
+    ModelWarmup gets the served model ready before the app reports ready: it runs synthetic predictions on the
+    inference pool, which downloads and unpickles the production model and pays sklearn's first-call overheads.
+    Predictions run in rounds of `max_workers`, so every worker of the pool loads the model, and bypass the pool's
+    admission bound. `ready` turns True and `model_version` is recorded once every warm-up prediction succeeded;
+    a failed warm-up records the error and leaves `ready` as it was, so a model already serving stays ready.
+    `watch` checks the model version in S3 every `refresh_interval_seconds` and, when a new model was pushed or the
+    app is not ready yet, has the inference pool reload the model and warms it up again. A failed check is logged
+    and retried at the next interval.
+    """
+    def __init__(self, inference_pool: InferencePool, model_warmup_config: ModelWarmupConfig = ModelWarmupConfig()):
+        self.inference_pool = inference_pool
+        self.model_warmup_config = model_warmup_config
+        self.ready = False
+        self.model_version: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+        self.first_prediction_seconds: Optional[float] = None
+        self.median_prediction_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    async def timed_predict(self, row: dict) -> float:
+        start_time = time.perf_counter()
+        await self.inference_pool.predict(row, bounded = False)
+        return time.perf_counter() - start_time
+
+    def get_model_version(self) -> Optional[str]:
+        prediction_pipeline_config = self.inference_pool.prediction_pipeline_config
+        usvisa_estimator = UsVisaEstimator(bucket_name = prediction_pipeline_config.model_bucket_name,
+                                           model_path = prediction_pipeline_config.model_file_path)
+        return usvisa_estimator.get_model_version()
+
+    async def run(self) -> None:
+        start_time = time.perf_counter()
+        try:
+            prediction_pipeline_config = self.inference_pool.prediction_pipeline_config
+            self.error = None
+            model_version = await asyncio.to_thread(self.get_model_version)
+            if model_version is None:
+                raise Exception(f"No model found at {prediction_pipeline_config.model_file_path} in {prediction_pipeline_config.model_bucket_name}")
+
+            rows = get_warmup_rows(read_yaml_file(self.model_warmup_config.schema_file_path),
+                                   n_rows = max(self.model_warmup_config.n_predictions, 1),
+                                   random_state = self.model_warmup_config.random_state)
+            round_size = self.inference_pool.inference_pool_config.max_workers
+            latencies = []
+            for round_start in range(0, len(rows), round_size):
+                latencies += await asyncio.gather(*[self.timed_predict(row) for row in rows[round_start:round_start + round_size]])
+
+            self.first_prediction_seconds = round(latencies[0], 4)
+            self.median_prediction_seconds = round(float(np.median(latencies[round_size:] or latencies)), 4)
+            self.warmup_seconds = round(time.perf_counter() - start_time, 3)
+            self.model_version = model_version
+            self.ready = True
+            logging.info(f"Model {self.model_version} warmed up with {len(rows)} predictions in {self.warmup_seconds}s, "
+                         f"first {self.first_prediction_seconds}s, then median {self.median_prediction_seconds}s")
+
+        except Exception as e:
+            self.error = str(e)
+            if self.ready:
+                logging.error(f"Model warm-up failed, model {self.model_version} keeps serving: {e}")
+            else:
+                logging.error(f"Model warm-up failed, the app is not ready: {e}")
+
+    async def watch(self) -> None:
+        """
+        Reloads and warms up the model whenever its version in S3 changed or the app is not ready, until cancelled.
+        """
+        while True:
+            await asyncio.sleep(self.model_warmup_config.refresh_interval_seconds)
+            try:
+                model_version = await asyncio.to_thread(self.get_model_version)
+                if model_version is None or (self.ready and model_version == self.model_version):
+                    continue
+                if self.ready:
+                    logging.info(f"Model version changed from {self.model_version} to {model_version}, reloading the model")
+                else:
+                    logging.info(f"App is not ready, reloading model {model_version} and warming it up again")
+                await self.inference_pool.reload()
+                await self.run()
+
+            except Exception as e:
+                logging.error(f"Model refresh failed, will retry in {self.model_warmup_config.refresh_interval_seconds}s: {e}")
+
+    def get_status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "model_version": self.model_version,
+            "warmup_seconds": self.warmup_seconds,
+            "first_prediction_seconds": self.first_prediction_seconds,
+            "median_prediction_seconds": self.median_prediction_seconds,
+            "error": self.error
+        }
@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 import numpy as np
 import pandas as pd
 from usvisa.logger.logger import logging
@@ -73,12 +74,62 @@ class UsVisaClassifier:
     """
     A class for making predictions using the trained US Visa model.
     This class initializes the model configuration and provides a method to predict the visa status
-    based on the input data.
+    based on the input data. The model is loaded from S3 on the first prediction and reused by later ones,
+    so one instance can be shared by the threads of an inference pool. `refresh` loads the model again when its
+    version (ETag and version id) in S3 changed, while the current model keeps serving.
     """
     def __init__(self, prediction_pipeline_config: UsVisaPredictorConfig = UsVisaPredictorConfig(),) -> None:
         try:
             # Initialize the configuration for the prediction pipeline
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.usvisa_estimator: UsVisaEstimator = None
+            self.model_version: str = None
+            self._load_lock = threading.Lock()
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def load_estimator(self) -> None:
+        """
+        Loads the current model version from S3 and swaps it in once it is loaded, unless it is already loaded.
+        Must be called with the load lock held.
+        """
+        usvisa_estimator = UsVisaEstimator(
+            bucket_name = self.prediction_pipeline_config.model_bucket_name,
+            model_path = self.prediction_pipeline_config.model_file_path,
+        )
+        # The version is read before the model, so a model pushed in between is loaded by the next refresh
+        model_version = usvisa_estimator.get_model_version()
+        if self.usvisa_estimator is not None and model_version == self.model_version:
+            return
+        usvisa_estimator.loaded_model = usvisa_estimator.load_model()
+        if self.usvisa_estimator is not None:
+            logging.info(f"Reloaded the model, version {self.model_version} replaced by {model_version}")
+        self.usvisa_estimator, self.model_version = usvisa_estimator, model_version
+
+    def get_estimator(self) -> UsVisaEstimator:
+        """
+        Returns the estimator with the model loaded, loading it once even when called from several threads.
+        """
+        try:
+            if self.usvisa_estimator is None:
+                with self._load_lock:
+                    if self.usvisa_estimator is None:
+                        self.load_estimator()
+            return self.usvisa_estimator
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def refresh(self) -> str:
+        """
+        Loads the model again if its version in S3 changed and returns the version being served. Predictions keep
+        using the current model until the new one is loaded.
+        """
+        try:
+            with self._load_lock:
+                self.load_estimator()
+            return self.model_version
+
         except Exception as e:
             raise UsVisaException(e, sys)
 
@@ -89,10 +140,7 @@ class UsVisaClassifier:
         This method uses the trained model to make predictions on the provided DataFrame.
         """
         try:
-            model = UsVisaEstimator(
-                bucket_name = self.prediction_pipeline_config.model_bucket_name,
-                model_path = self.prediction_pipeline_config.model_file_path,
-            )
+            model = self.get_estimator()
             result =  model.predict(dataframe)
             return result
         
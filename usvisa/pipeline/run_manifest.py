@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import threading
+import dataclasses
+from typing import Optional
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.entity import artifact_entity
+from usvisa.constants import RUN_MANIFEST_FILE_NAME
+from usvisa.utils.main_utils import read_yaml_file, write_yaml_file
+
+
+class RunManifest:
+    """
+    RunManifest records the artifact of every completed stage of a training run in the run's artifact directory.
+    It is rewritten after each stage, so a failed run can be resumed from the first stage that is not recorded.
+    Stages running concurrently record their artifacts one at a time.
+    The stages recorded in an existing manifest are only loaded when `resume` is True.
+    """
+    def __init__(self, artifact_dir: str, resume: bool = False):
+        try:
+            self.manifest_file_path = os.path.join(artifact_dir, RUN_MANIFEST_FILE_NAME)
+            self.lock = threading.Lock()
+            self.stages = {}
+            if resume and os.path.exists(self.manifest_file_path):
+                self.stages = read_yaml_file(self.manifest_file_path)["stages"] or {}
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @staticmethod
+    def _artifact_from_dict(artifact_class: type, content: dict) -> object:
+        """Rebuilds an artifact dataclass, including nested artifact dataclasses, from its dictionary form."""
+        kwargs = {}
+        for field in dataclasses.fields(artifact_class):
+            value = content.get(field.name)
+            if dataclasses.is_dataclass(field.type) and isinstance(value, dict):
+                value = RunManifest._artifact_from_dict(field.type, value)
+            kwargs[field.name] = value
+        return artifact_class(**kwargs)
+
+    def get_artifact(self, stage_name: str) -> Optional[object]:
+        """
+        Returns the recorded artifact of a completed stage, or None if the stage has not completed.
+        """
+        try:
+            if stage_name not in self.stages:
+                return None
+            stage = self.stages[stage_name]
+            artifact_class = getattr(artifact_entity, stage["artifact_type"])
+            return self._artifact_from_dict(artifact_class, stage["artifact"])
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def record_stage(self, stage_name: str, artifact: object) -> None:
+        """
+        Records a completed stage's artifact and persists the manifest.
+        """
+        try:
+            # The JSON round trip turns numpy scalars (e.g. sklearn metric values) into plain YAML-safe numbers
+            content = json.loads(json.dumps(dataclasses.asdict(artifact),
+                                            default = lambda value: value.item() if hasattr(value, "item") else str(value)))
+            with self.lock:
+                self.stages[stage_name] = {"artifact_type": type(artifact).__name__, "artifact": content}
+                write_yaml_file(self.manifest_file_path, {"stages": self.stages}, replace = True)
+            logging.info(f"Recorded completed stage {stage_name} in {self.manifest_file_path}")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
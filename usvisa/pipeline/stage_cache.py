@@ -0,0 +1,211 @@
+import os
+import ast
+import sys
+import json
+import shutil
+import hashlib
+import inspect
+import dataclasses
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.entity import artifact_entity
+from usvisa.constants import STAGE_CACHE_ARTIFACT_FILE_NAME
+from usvisa.entity.config_entity import StageCacheConfig
+from usvisa.utils.main_utils import get_file_hash, rebase_artifact_paths, load_object, save_object
+
+# Stands in for the timestamped artifact directory inside cached artifacts, so they can be restored into any run
+ARTIFACT_DIR_PLACEHOLDER: str = "<artifact_dir>"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_module_file_path(module_name: str) -> Optional[str]:
+    """
+    Returns the source file of a usvisa module or package, or None when the name is not a module, e.g. a class
+    imported from a module.
+    """
+    module_path = os.path.join(PROJECT_ROOT, *module_name.split("."))
+    for file_path in (module_path + ".py", os.path.join(module_path, "__init__.py")):
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+
+@lru_cache(maxsize = None)
+def get_imported_source_files(source_file_path: str) -> Tuple[str, ...]:
+    """
+    Returns a source file with the source files of all usvisa modules it imports, directly or transitively, found by
+    parsing the import statements. A stage's output depends on the helpers it calls (e.g. drift_utils or model_search)
+    as much as on the component module itself.
+    """
+    source_file_paths, pending = set(), [os.path.abspath(source_file_path)]
+    while pending:
+        file_path = pending.pop()
+        if file_path in source_file_paths:
+            continue
+        source_file_paths.add(file_path)
+        with open(file_path, "r") as file:
+            tree = ast.parse(file.read(), filename = file_path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                module_names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+                # The imported names may be submodules, e.g. from usvisa.utils import main_utils
+                module_names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            for module_name in module_names:
+                if module_name.split(".")[0] != "usvisa":
+                    continue
+                module_file_path = get_module_file_path(module_name)
+                if module_file_path is not None:
+                    pending.append(os.path.abspath(module_file_path))
+    return tuple(sorted(source_file_paths))
+
+
+class StageCache:
+    """
+    StageCache stores the outputs of pipeline stages in a directory shared by all runs. Every entry is keyed by
+    a fingerprint of what the stage depends on: the content of its input artifacts, its config dataclass, the
+    YAML files it reads, the versions of external inputs such as the production model and the source code of the stage,
+    including every usvisa module it imports. When a stage runs again with the same fingerprint, the
+    cached output files are copied into the current artifact directory and the stage itself is skipped.
+    """
+    def __init__(self, artifact_dir: str, stage_cache_config: StageCacheConfig = StageCacheConfig()):
+        self.artifact_dir = artifact_dir
+        self.stage_cache_config = stage_cache_config
+
+    @staticmethod
+    def get_artifact_file_paths(artifact: object, prefix: str = "") -> List[str]:
+        """
+        Returns the string fields of a (possibly nested) artifact dataclass that start with `prefix`.
+        """
+        file_paths = []
+        for field in dataclasses.fields(artifact):
+            value = getattr(artifact, field.name)
+            if dataclasses.is_dataclass(value):
+                file_paths.extend(StageCache.get_artifact_file_paths(value, prefix))
+            elif isinstance(value, str) and value.startswith(prefix):
+                file_paths.append(value)
+        return file_paths
+
+    def get_fingerprint(self, stage_name: str, input_artifacts: Iterable[object], config: object,
+                        yaml_file_paths: Iterable[str] = (), source_file_paths: Iterable[str] = (),
+                        external_versions: dict = None) -> str:
+        """
+        Computes the fingerprint of a stage from its input artifacts, its config, the YAML files it depends on,
+        the versions of its external inputs and the source files implementing it.
+        Paths under the timestamped artifact directory change on every run, so they are made run-independent
+        and the content of the files they point to is hashed instead.
+        """
+        try:
+            content = {
+                "stage_name": stage_name,
+                "config": dataclasses.asdict(rebase_artifact_paths(config, self.artifact_dir, ARTIFACT_DIR_PLACEHOLDER)),
+                "yaml_files": {file_path: get_file_hash(file_path) for file_path in yaml_file_paths},
+                "source_files": {os.path.relpath(file_path, PROJECT_ROOT): get_file_hash(file_path) for file_path in source_file_paths},
+                "external_versions": external_versions or {},
+                "inputs": []
+            }
+            for artifact in input_artifacts:
+                file_paths = [file_path for file_path in self.get_artifact_file_paths(artifact) if os.path.isfile(file_path)]
+                content["inputs"].append({
+                    "artifact": dataclasses.asdict(rebase_artifact_paths(artifact, self.artifact_dir, ARTIFACT_DIR_PLACEHOLDER)),
+                    "file_hashes": [get_file_hash(file_path) for file_path in file_paths]
+                })
+            serialized = json.dumps(content, sort_keys = True, default = str)
+            return hashlib.sha256(serialized.encode()).hexdigest()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_entry_dir(self, stage_name: str, fingerprint: str) -> str:
+        return os.path.join(self.stage_cache_config.cache_dir, stage_name, fingerprint)
+
+    def load(self, stage_name: str, fingerprint: str) -> Optional[object]:
+        """
+        Restores a cached stage output into the current artifact directory and returns its artifact.
+        Returns None on a cache miss or when recomputation is forced.
+        """
+        try:
+            entry_dir = self.get_entry_dir(stage_name, fingerprint)
+            artifact_file_path = os.path.join(entry_dir, STAGE_CACHE_ARTIFACT_FILE_NAME)
+            if self.stage_cache_config.force_recompute or not os.path.exists(artifact_file_path):
+                return None
+
+            cached_artifact = load_object(artifact_file_path)
+            for cached_path in self.get_artifact_file_paths(cached_artifact, ARTIFACT_DIR_PLACEHOLDER):
+                relative_path = cached_path[len(ARTIFACT_DIR_PLACEHOLDER):].lstrip("/\\")
+                source_path = os.path.join(entry_dir, relative_path)
+                if not os.path.isfile(source_path):
+                    continue
+                target_path = os.path.join(self.artifact_dir, relative_path)
+                os.makedirs(os.path.dirname(target_path), exist_ok = True)
+                shutil.copyfile(source_path, target_path)
+
+            logging.info(f"Stage cache hit for {stage_name}: {fingerprint}")
+            return rebase_artifact_paths(cached_artifact, ARTIFACT_DIR_PLACEHOLDER, self.artifact_dir)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def save(self, stage_name: str, fingerprint: str, artifact: object) -> None:
+        """
+        Copies the files produced by a stage into the cache together with its artifact.
+        The entry is written into a temporary directory first so a crashed run never leaves a partial entry behind.
+        """
+        try:
+            entry_dir = self.get_entry_dir(stage_name, fingerprint)
+            if os.path.exists(entry_dir):
+                return
+            tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors = True)
+
+            for file_path in self.get_artifact_file_paths(artifact, self.artifact_dir):
+                if not os.path.isfile(file_path):
+                    continue
+                relative_path = file_path[len(self.artifact_dir):].lstrip("/\\")
+                target_path = os.path.join(tmp_dir, relative_path)
+                os.makedirs(os.path.dirname(target_path), exist_ok = True)
+                shutil.copyfile(file_path, target_path)
+
+            cached_artifact = rebase_artifact_paths(artifact, self.artifact_dir, ARTIFACT_DIR_PLACEHOLDER)
+            save_object(os.path.join(tmp_dir, STAGE_CACHE_ARTIFACT_FILE_NAME), cached_artifact)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                # Another run stored the same entry concurrently
+                shutil.rmtree(tmp_dir, ignore_errors = True)
+            logging.info(f"Stored {stage_name} output in stage cache: {fingerprint}")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def run(self, stage_name: str, stage_func: Callable[..., object], input_artifacts: Iterable[object],
+            config: object, yaml_file_paths: Iterable[str] = (), stage_kwargs: dict = None,
+            external_versions: dict = None) -> object:
+        """
+        Returns the cached output of a stage when its fingerprint matches, otherwise runs the stage with
+        `stage_kwargs` and caches it. `external_versions` names the versions of inputs outside the artifact
+        directory, e.g. the ETag of the production model, so the stage reruns when they change.
+        """
+        try:
+            input_artifacts = [artifact for artifact in input_artifacts if artifact is not None]
+            # Changing the stage code, a module it imports or the artifact definitions invalidates its cached outputs
+            source_file_paths = sorted(set(get_imported_source_files(inspect.getsourcefile(inspect.unwrap(stage_func))))
+                                       | {os.path.abspath(artifact_entity.__file__)})
+            fingerprint = self.get_fingerprint(stage_name, input_artifacts, config, yaml_file_paths, source_file_paths,
+                                               external_versions)
+            artifact = self.load(stage_name, fingerprint)
+            if artifact is not None:
+                return artifact
+
+            artifact = stage_func(**(stage_kwargs or {}))
+            self.save(stage_name, fingerprint, artifact)
+            return artifact
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
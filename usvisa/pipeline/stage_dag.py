@@ -0,0 +1,128 @@
+import sys
+import time
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+
+
+@dataclass
+class StageNode:
+    """
+    Data class for a stage of a StageDAG: the function running it, the stages whose results it takes as keyword
+    arguments (`inputs` maps argument names to stage names), the stages it has to wait for without taking their
+    results (`after`) and an optional condition on the results so far, which skips the stage when false.
+    """
+    name: str
+    func: Callable[..., object]
+    inputs: Dict[str, str] = field(default_factory = dict)
+    after: List[str] = field(default_factory = list)
+    condition: Optional[Callable[[Dict[str, object]], bool]] = None
+
+    @property
+    def dependencies(self) -> List[str]:
+        return list(dict.fromkeys(list(self.inputs.values()) + self.after))
+
+
+
+class StageDAG:
+    """
+    StageDAG runs pipeline stages as a directed acyclic graph: every stage starts on a thread pool as soon as the
+    stages it depends on have finished, so independent stages overlap. Stages are added after their dependencies,
+    which keeps the graph acyclic. The start, end and duration of every stage are recorded, and the report gives
+    the critical path: the chain of dependent stages that determined the wall-clock time of the run.
+    """
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.nodes: Dict[str, StageNode] = {}
+        self.timings: Dict[str, dict] = {}
+        self.start_time = None
+        self.wall_seconds = None
+
+    def add_stage(self, name: str, func: Callable[..., object], inputs: Dict[str, str] = None, after: List[str] = None,
+                  condition: Callable[[Dict[str, object]], bool] = None) -> None:
+        try:
+            node = StageNode(name = name, func = func, inputs = inputs or {}, after = after or [], condition = condition)
+            unknown_stages = [dependency for dependency in node.dependencies if dependency not in self.nodes]
+            if name in self.nodes or unknown_stages:
+                raise ValueError(f"Stage {name} must be new and added after its dependencies, unknown: {unknown_stages}")
+            self.nodes[name] = node
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def run_node(self, node: StageNode, kwargs: dict) -> object:
+        start_time = time.perf_counter()
+        result = node.func(**kwargs)
+        end_time = time.perf_counter()
+        self.timings[node.name] = {"start": round(start_time - self.start_time, 3), "end": round(end_time - self.start_time, 3),
+                                   "seconds": round(end_time - start_time, 3)}
+        return result
+
+    def run(self) -> Dict[str, object]:
+        """
+        Runs every stage and returns the results by stage name; skipped stages have a None result.
+        A failing stage cancels the stages that have not started and its exception is raised.
+        """
+        try:
+            self.start_time, self.timings = time.perf_counter(), {}
+            results: Dict[str, object] = {}
+            running: Dict[Future, str] = {}
+            pending = dict(self.nodes)
+            executor = ThreadPoolExecutor(max_workers = self.max_workers, thread_name_prefix = "pipeline-stage")
+            try:
+                while pending or running:
+                    for name, node in list(pending.items()):
+                        if not all(dependency in results for dependency in node.dependencies):
+                            continue
+                        del pending[name]
+                        if node.condition is not None and not node.condition(results):
+                            logging.info(f"Skipping stage {name}")
+                            results[name] = None
+                            self.timings[name] = {"skipped": True}
+                            continue
+                        kwargs = {argument: results[stage_name] for argument, stage_name in node.inputs.items()}
+                        running[executor.submit(self.run_node, node, kwargs)] = name
+                    # A skipped stage may have made others ready without anything running
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when = FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+            finally:
+                executor.shutdown(wait = True, cancel_futures = True)
+                self.wall_seconds = round(time.perf_counter() - self.start_time, 3)
+            return results
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def get_critical_path(self) -> List[str]:
+        """
+        Walks back from the stage that finished last through the dependency that finished last at every step.
+        """
+        finished = {name: timing for name, timing in self.timings.items() if not timing.get("skipped")}
+        if not finished:
+            return []
+        name = max(finished, key = lambda stage_name: finished[stage_name]["end"])
+        critical_path = [name]
+        while True:
+            dependencies = [dependency for dependency in self.nodes[name].dependencies if dependency in finished]
+            if not dependencies:
+                break
+            name = max(dependencies, key = lambda stage_name: finished[stage_name]["end"])
+            critical_path.append(name)
+        return critical_path[::-1]
+
+    def get_report(self) -> dict:
+        critical_path = self.get_critical_path()
+        return {
+            "wall_seconds": self.wall_seconds,
+            "stage_seconds": round(sum(timing.get("seconds", 0.0) for timing in self.timings.values()), 3),
+            "critical_path": critical_path,
+            "critical_path_seconds": round(sum(self.timings[name]["seconds"] for name in critical_path), 3),
+            "stages": {name: {**self.timings.get(name, {"skipped": True}), "dependencies": node.dependencies}
+                       for name, node in self.nodes.items()}
+        }
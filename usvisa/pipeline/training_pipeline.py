@@ -1,19 +1,35 @@
 import os
 import sys
+from datetime import datetime
+from functools import partial
 from usvisa.logger.logger import logging
 from usvisa.exception.exception import UsVisaException
+from usvisa.utils.profiling_utils import profile_stage
 
 from usvisa.components.data_ingestion import DataIngestion
 from usvisa.components.data_validation import DataValidation
 from usvisa.components.data_transformation import DataTransformation
 from usvisa.components.model_trainer import ModelTrainer
+from usvisa.components.incremental_trainer import IncrementalTrainer
 from usvisa.components.model_evaluation import ModelEvaluation
 from usvisa.components.model_pusher import ModelPusher
+from usvisa.pipeline.stage_cache import StageCache
+from usvisa.pipeline.run_manifest import RunManifest
+from usvisa.pipeline.stage_dag import StageDAG
+from usvisa.entity.s3_estimator import UsVisaEstimator
+from usvisa.utils.main_utils import rebase_artifact_paths, write_yaml_file
+from usvisa.utils.profiling_utils import RunProfiler
+from usvisa.constants import (ARTIFACT_DIR, SCHEMA_FILE_PATH, RUN_MANIFEST_FILE_NAME, DATA_INGESTION_DIR_NAME, DATA_VALIDATION_DIR_NAME,
+                              DATA_TRANSFORAMTION_DIR_NAME, MODEL_TRAINER_DIR_NAME, MODEL_EVALUATION_DIR_NAME,
+                              MODEL_PUSHER_DIR_NAME, INCREMENTAL_TRAINER_DIR_NAME, PIPELINE_DAG_MAX_WORKERS,
+                              PIPELINE_DAG_REPORT_FILE_NAME, PIPELINE_DAG_DATA_DRIFT_STAGE_NAME,
+                              PIPELINE_DAG_PRODUCTION_MODEL_PREFETCH_STAGE_NAME, RUN_PROFILE_FILE_NAME,
+                              RUN_PROFILE_CPROFILE_DIR_NAME, RUN_PROFILE_CPROFILE)
 
 from usvisa.entity.config_entity import (
     TrainingPipelineConfig, DataIngestionConfig, 
-    DataValidationConfig, DataTransformationConfig, ModelTrainerConfig,
-    ModelEvaluationConfig, ModelPusherConfig)
+    DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, IncrementalTrainerConfig,
+    ModelEvaluationConfig, ModelPusherConfig, StageCacheConfig, training_pipeline_config)
 
 from usvisa.entity.artifact_entity import (
     DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact,
@@ -25,16 +41,121 @@ class TrainingPipeline:
     The TrainingPipeline class orchestrates the entire machine learning pipeline,
     from data ingestion to model training. It initializes the pipeline configuration,
     manages the sequence of operations, and handles exceptions that may arise during the process.
+    Validation, transformation and training are served from the shared stage cache when their inputs and
+    configuration are unchanged; pass `force_recompute = True` to run every stage regardless.
+    Every completed stage is recorded in the run manifest, and passing `resume_run_dir` continues a failed
+    run from the first stage that did not complete.
+    The stages run as a StageDAG, so independent stages overlap: drift detection runs next to the data
+    transformation, and the production model is fetched and scored while the model trains. The timing of every
+    stage and the critical path of the run are written to the pipeline DAG report.
+    With `incremental = True`, the production model is updated with the new training rows instead of transforming
+    the data and training from scratch, unless drift or new categories call for a full retrain.
+    The wall time, CPU time, peak memory, rows and bytes of every stage and component are written to the run
+    profile; with `cprofile = True` (or RUN_PROFILE_CPROFILE=true) the cProfile stats of the stages are saved
+    next to it; a stage overlapping one that is already being cProfiled is only timed.
     """
 
-    def __init__(self):
+    def __init__(self, force_recompute: bool = False, resume_run_dir: str = None, incremental: bool = False,
+                 cprofile: bool = False):
+        self.training_pipeline_config: TrainingPipelineConfig = training_pipeline_config
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
         self.data_transformation_config = DataTransformationConfig()   
         self.model_trainer_config = ModelTrainerConfig()
+        self.incremental_trainer_config = IncrementalTrainerConfig()
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig() 
+        self.incremental = incremental
 
+        # The configs default to the directory timestamped at import time, which every pipeline created by a
+        # long-lived process would share, so each new run gets its own directory
+        if resume_run_dir is not None:
+            self.resume_from(resume_run_dir)
+        else:
+            self.set_run_dir(self.get_new_run_dir())
+        self.run_manifest = RunManifest(artifact_dir = self.training_pipeline_config.artifact_dir,
+                                        resume = resume_run_dir is not None)
+
+        self.stage_cache_config = StageCacheConfig()
+        if force_recompute:
+            self.stage_cache_config.force_recompute = True
+        self.stage_cache = StageCache(artifact_dir = self.training_pipeline_config.artifact_dir,
+                                      stage_cache_config = self.stage_cache_config)
+
+        cprofile_dir = os.path.join(self.training_pipeline_config.artifact_dir, RUN_PROFILE_CPROFILE_DIR_NAME)
+        if not (cprofile or RUN_PROFILE_CPROFILE):
+            cprofile_dir = None
+        self.run_profiler = RunProfiler(cprofile_dir = cprofile_dir)
+
+    @staticmethod
+    def get_new_run_dir() -> str:
+        """
+        Creates and returns an artifact directory timestamped now that no other run uses, even when runs start
+        within the same second.
+        """
+        timestamp = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
+        run_dir, suffix = os.path.join(ARTIFACT_DIR, timestamp), 1
+        while True:
+            try:
+                os.makedirs(run_dir)
+                return run_dir
+            except FileExistsError:
+                run_dir, suffix = os.path.join(ARTIFACT_DIR, f"{timestamp}_{suffix}"), suffix + 1
+
+    def resume_from(self, run_dir: str) -> None:
+        """
+        Points every stage config at the artifact directory of an earlier run, so the stages that still have to
+        run write into that run.
+        """
+        try:
+            run_dir = os.path.normpath(run_dir)
+            if not os.path.exists(os.path.join(run_dir, RUN_MANIFEST_FILE_NAME)):
+                raise Exception(f"No run manifest found in {run_dir}, it cannot be resumed.")
+            self.set_run_dir(run_dir)
+            logging.info(f"Resuming training run from {run_dir}")
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def set_run_dir(self, run_dir: str) -> None:
+        """
+        Moves the pipeline config and every stage config from the current artifact directory to `run_dir`.
+        """
+        try:
+            old_artifact_dir = self.training_pipeline_config.artifact_dir
+            self.training_pipeline_config = TrainingPipelineConfig(pipeline_name = self.training_pipeline_config.pipeline_name,
+                                                                   artifact_dir = run_dir,
+                                                                   timestamp = os.path.basename(run_dir))
+            self.data_ingestion_config = rebase_artifact_paths(self.data_ingestion_config, old_artifact_dir, run_dir)
+            self.data_validation_config = rebase_artifact_paths(self.data_validation_config, old_artifact_dir, run_dir)
+            self.data_transformation_config = rebase_artifact_paths(self.data_transformation_config, old_artifact_dir, run_dir)
+            self.model_trainer_config = rebase_artifact_paths(self.model_trainer_config, old_artifact_dir, run_dir)
+            self.incremental_trainer_config = rebase_artifact_paths(self.incremental_trainer_config, old_artifact_dir, run_dir)
+            self.model_evaluation_config = rebase_artifact_paths(self.model_evaluation_config, old_artifact_dir, run_dir)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def run_stage(self, stage_name: str, stage_func, **kwargs) -> object:
+        """
+        Runs a stage unless the run manifest already records it as completed, and records it once it completes.
+        Stages that return no artifact are not recorded.
+        """
+        try:
+            artifact = self.run_manifest.get_artifact(stage_name)
+            if artifact is not None:
+                logging.info(f"Skipping {stage_name}, already completed in this run: {artifact}")
+                return artifact
+
+            artifact = stage_func(**kwargs)
+            if artifact is not None:
+                self.run_manifest.record_stage(stage_name, artifact)
+            return artifact
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
     def start_data_ingestion(self) -> DataIngestionArtifact:
         """
         This method of TrainPipeline class is responsible for starting the Data Ingestion component.
@@ -48,6 +169,7 @@ class TrainingPipeline:
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    @profile_stage
     def start_data_validation(self, data_ingestion_artifact: DataIngestionArtifact) -> DataValidationArtifact:
         """
         This method of TrainPipeline class is responsible for starting the Data Valdiation component.
@@ -56,12 +178,45 @@ class TrainingPipeline:
             logging.info("Entered the data validation initiation method of the TrainPipeline class.")
             data_validation = DataValidation(data_ingestion_artifact = data_ingestion_artifact, 
                                              data_validation_config = self.data_validation_config)
-            data_validation_artifact = data_validation.initiate_data_validation()
+            data_validation_artifact = self.stage_cache.run(
+                stage_name = DATA_VALIDATION_DIR_NAME,
+                stage_func = data_validation.initiate_data_validation,
+                input_artifacts = [data_ingestion_artifact],
+                config = self.data_validation_config,
+                yaml_file_paths = [SCHEMA_FILE_PATH]
+            )
+            return data_validation_artifact
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
+    def start_data_drift_detection(self, data_validation_artifact: DataValidationArtifact) -> DataValidationArtifact:
+        """
+        This method of TrainPipeline class is responsible for detecting data drift on the validated data.
+        """
+        try:
+            logging.info("Entered the data drift detection method of the TrainPipeline class.")
+            data_validation = DataValidation(data_ingestion_artifact = None,
+                                             data_validation_config = self.data_validation_config)
+            # The training data is also checked against the production model, so a newly pushed model reruns the stage
+            production_model_version = UsVisaEstimator(bucket_name = self.data_validation_config.model_bucket_name,
+                                                       model_path = self.data_validation_config.s3_model_key_path).get_model_version()
+            data_validation_artifact = self.stage_cache.run(
+                stage_name = PIPELINE_DAG_DATA_DRIFT_STAGE_NAME,
+                stage_func = data_validation.initiate_drift_detection,
+                input_artifacts = [data_validation_artifact],
+                config = self.data_validation_config,
+                yaml_file_paths = [SCHEMA_FILE_PATH],
+                stage_kwargs = {"data_validation_artifact": data_validation_artifact},
+                external_versions = {"production_model": production_model_version}
+            )
             return data_validation_artifact
 
         except Exception as e:
             raise UsVisaException(e, sys)
         
+    @profile_stage
     def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
         """
         This method of TrainPipeline class is responsible for starting the Data Transformation component.
@@ -71,41 +226,90 @@ class TrainingPipeline:
             data_transformation = DataTransformation(data_ingestion_artifact = data_ingestion_artifact, 
                                                      data_validation_artifact = data_validation_artifact,
                                                      data_transformation_config = self.data_transformation_config)
-            data_transformation_artifact = data_transformation.initiate_data_transformation()
+            data_transformation_artifact = self.stage_cache.run(
+                stage_name = DATA_TRANSFORAMTION_DIR_NAME,
+                stage_func = data_transformation.initiate_data_transformation,
+                input_artifacts = [data_ingestion_artifact, data_validation_artifact],
+                config = self.data_transformation_config,
+                yaml_file_paths = [SCHEMA_FILE_PATH, self.data_transformation_config.transformation_config_file_path]
+            )
             return data_transformation_artifact
         
         except Exception as e:
             raise UsVisaException(e, sys)
         
-    def start_model_training(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+    @profile_stage
+    def start_model_training(self, data_transformation_artifact: DataTransformationArtifact,
+                             data_validation_artifact: DataValidationArtifact = None) -> ModelTrainerArtifact:
         """
         This method of TrainPipeline class is responsible for starting the Model Training component.
         """
         try:
             logging.info("Started the model training method of the TrainPipeline class.")
             model_training = ModelTrainer(data_transformation_artifact = data_transformation_artifact,
-                                          model_trainer_config = self.model_trainer_config)
-            model_trainer_artifact = model_training.initiate_model_trainer()
+                                          model_trainer_config = self.model_trainer_config,
+                                          data_validation_artifact = data_validation_artifact)
+            model_trainer_artifact = self.stage_cache.run(
+                stage_name = MODEL_TRAINER_DIR_NAME,
+                stage_func = model_training.initiate_model_trainer,
+                input_artifacts = [data_transformation_artifact, data_validation_artifact],
+                config = self.model_trainer_config,
+                yaml_file_paths = [self.model_trainer_config.model_config_file_path]
+            )
             return model_trainer_artifact
 
         except Exception as e:
             raise UsVisaException(e, sys)
         
-    def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact, model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
+    @profile_stage
+    def start_incremental_training(self, data_validation_artifact: DataValidationArtifact) -> ModelTrainerArtifact:
+        """
+        This method of TrainPipeline class is responsible for starting the Incremental Trainer component.
+        It returns None when a full retrain is needed.
+        """
+        try:
+            logging.info("Started the incremental training method of the TrainPipeline class.")
+            incremental_trainer = IncrementalTrainer(data_validation_artifact = data_validation_artifact,
+                                                     incremental_trainer_config = self.incremental_trainer_config)
+            return incremental_trainer.initiate_incremental_training()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
+    def start_production_model_prefetch(self, data_validation_artifact: DataValidationArtifact) -> None:
+        """
+        This method of TrainPipeline class downloads the production model and caches its test predictions,
+        so the model evaluation finds them in the prediction cache.
+        """
+        try:
+            logging.info("Started prefetching the production model predictions.")
+            model_evaluation = ModelEvaluation(model_evaluation_config = self.model_evaluation_config,
+                                               data_validation_artifact = data_validation_artifact)
+            model_evaluation.get_best_model_predictions()
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    @profile_stage
+    def start_model_evaluation(self, data_validation_artifact: DataValidationArtifact, model_trainer_artifact: ModelTrainerArtifact,
+                               incremental_trainer_artifact: ModelTrainerArtifact = None) -> ModelEvaluationArtifact:
         """
         This method of TrainPipeline class is responsible for starting the Model Evaluation component.
+        The incrementally updated model is evaluated when the incremental trainer produced one.
         """
         try:
             logging.info("Started the model evaluation method of the TrainPipeline class.")
             model_evaluation = ModelEvaluation(model_evaluation_config = self.model_evaluation_config,
-                                               data_ingestion_artifact = data_ingestion_artifact,
-                                               model_trainer_artifact = model_trainer_artifact)
+                                               data_validation_artifact = data_validation_artifact,
+                                               model_trainer_artifact = incremental_trainer_artifact or model_trainer_artifact)
             model_evaluation_artifact = model_evaluation.initiate_model_evaluation()
             return model_evaluation_artifact
         
         except Exception as e:
             raise UsVisaException(e, sys)   
         
+    @profile_stage
     def start_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact) -> ModelPusherArtifact:
         """
          This method of TrainPipeline class is responsible for starting the Model Pusher component.
@@ -123,38 +327,62 @@ class TrainingPipeline:
     def run_pipeline(self, ) -> None:
         """
         This method of TrainPipeline class is responsible for running the complete ML pipeline.
+        Every stage starts as soon as the stages it depends on are done.
         """
+        dag = StageDAG(max_workers = PIPELINE_DAG_MAX_WORKERS)
+        self.run_profiler.activate()
         try:
             logging.info("Starting the ETL Pipeline")
-            logging.info("Initiating Data ingestion..")
-            data_ingestion_artifact = self.start_data_ingestion()
-            logging.info("Data ingestion successfully completed.")
-
-            logging.info("Initiating Data validation..")
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact = data_ingestion_artifact)
-            logging.info("Data validation successfully completed.")
+            dag.add_stage(DATA_INGESTION_DIR_NAME, partial(self.run_stage, DATA_INGESTION_DIR_NAME, self.start_data_ingestion))
+            dag.add_stage(DATA_VALIDATION_DIR_NAME, partial(self.run_stage, DATA_VALIDATION_DIR_NAME, self.start_data_validation),
+                          inputs = {"data_ingestion_artifact": DATA_INGESTION_DIR_NAME})
+            dag.add_stage(PIPELINE_DAG_DATA_DRIFT_STAGE_NAME,
+                          partial(self.run_stage, PIPELINE_DAG_DATA_DRIFT_STAGE_NAME, self.start_data_drift_detection),
+                          inputs = {"data_validation_artifact": DATA_VALIDATION_DIR_NAME})
+            dag.add_stage(PIPELINE_DAG_PRODUCTION_MODEL_PREFETCH_STAGE_NAME, self.start_production_model_prefetch,
+                          inputs = {"data_validation_artifact": DATA_VALIDATION_DIR_NAME},
+                          condition = lambda results: self.run_manifest.get_artifact(MODEL_EVALUATION_DIR_NAME) is None)
 
-            logging.info("Initiating Data transformation..")
-            data_transformation_artifact = self.start_data_transformation(
-                data_ingestion_artifact = data_ingestion_artifact, data_validation_artifact = data_validation_artifact)
-            logging.info("Data transformation successfully completed.")
+            # The data is only transformed and the model trained from scratch when no incremental update was made
+            full_training_condition, incremental_stages, evaluation_inputs = None, [], {}
+            if self.incremental:
+                dag.add_stage(INCREMENTAL_TRAINER_DIR_NAME,
+                              partial(self.run_stage, INCREMENTAL_TRAINER_DIR_NAME, self.start_incremental_training),
+                              inputs = {"data_validation_artifact": PIPELINE_DAG_DATA_DRIFT_STAGE_NAME})
+                full_training_condition = lambda results: results[INCREMENTAL_TRAINER_DIR_NAME] is None
+                incremental_stages = [INCREMENTAL_TRAINER_DIR_NAME]
+                evaluation_inputs = {"incremental_trainer_artifact": INCREMENTAL_TRAINER_DIR_NAME}
 
-            logging.info("Initiating Model training..")
-            model_trainer_artifact = self.start_model_training(data_transformation_artifact = data_transformation_artifact)
-            logging.info("Model training successfully completed.")
+            dag.add_stage(DATA_TRANSFORAMTION_DIR_NAME, partial(self.run_stage, DATA_TRANSFORAMTION_DIR_NAME, self.start_data_transformation),
+                          inputs = {"data_ingestion_artifact": DATA_INGESTION_DIR_NAME,
+                                    "data_validation_artifact": DATA_VALIDATION_DIR_NAME},
+                          after = incremental_stages, condition = full_training_condition)
+            dag.add_stage(MODEL_TRAINER_DIR_NAME, partial(self.run_stage, MODEL_TRAINER_DIR_NAME, self.start_model_training),
+                          inputs = {"data_transformation_artifact": DATA_TRANSFORAMTION_DIR_NAME,
+                                    "data_validation_artifact": PIPELINE_DAG_DATA_DRIFT_STAGE_NAME},
+                          condition = full_training_condition)
+            dag.add_stage(MODEL_EVALUATION_DIR_NAME, partial(self.run_stage, MODEL_EVALUATION_DIR_NAME, self.start_model_evaluation),
+                          inputs = {"data_validation_artifact": DATA_VALIDATION_DIR_NAME,
+                                    "model_trainer_artifact": MODEL_TRAINER_DIR_NAME, **evaluation_inputs},
+                          after = [PIPELINE_DAG_PRODUCTION_MODEL_PREFETCH_STAGE_NAME])
+            dag.add_stage(MODEL_PUSHER_DIR_NAME, partial(self.run_stage, MODEL_PUSHER_DIR_NAME, self.start_model_pusher),
+                          inputs = {"model_evaluation_artifact": MODEL_EVALUATION_DIR_NAME},
+                          condition = lambda results: results[MODEL_EVALUATION_DIR_NAME].is_model_accepted)
 
-            logging.info("Initiating Model evaluation..")
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact = data_ingestion_artifact,
-                                                                    model_trainer_artifact = model_trainer_artifact)
-            logging.info("Model evaluation successfully completed.")
-
-            if not model_evaluation_artifact.is_model_accepted:
+            results = dag.run()
+            if not results[MODEL_EVALUATION_DIR_NAME].is_model_accepted:
                 logging.info("Model not accepted!")
-                return None
-            
-            logging.info("Initiating Model pusher..")
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact = model_evaluation_artifact)
-            logging.info("Model successfully pushed.")
+            else:
+                logging.info("Model successfully pushed.")
         
         except Exception as e:
-            raise UsVisaException(e, sys)
\ No newline at end of file
+            raise UsVisaException(e, sys)
+
+        finally:
+            self.run_profiler.deactivate()
+            self.run_profiler.write(os.path.join(self.training_pipeline_config.artifact_dir, RUN_PROFILE_FILE_NAME))
+            dag_report = dag.get_report()
+            write_yaml_file(os.path.join(self.training_pipeline_config.artifact_dir, PIPELINE_DAG_REPORT_FILE_NAME),
+                            dag_report, replace = True)
+            logging.info(f"Pipeline took {dag_report['wall_seconds']}s for {dag_report['stage_seconds']}s of stages, "
+                         f"critical path {' -> '.join(dag_report['critical_path'])} ({dag_report['critical_path_seconds']}s)")
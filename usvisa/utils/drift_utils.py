@@ -0,0 +1,147 @@
+import sys
+from typing import List, Tuple
+
+import numpy as np
+from scipy.special import chdtrc
+from scipy.stats import kstwo
+
+from usvisa.exception.exception import UsVisaException
+
+
+def chisquare_columns(reference_counts: np.ndarray, current_counts: np.ndarray, column_ids: np.ndarray,
+                      n_columns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Chi-square goodness-of-fit test of the current category counts against the reference category frequencies,
+    for all columns at once. Categories that never occur in the reference data yield an infinite statistic.
+    """
+    try:
+        reference_totals = np.bincount(column_ids, weights = reference_counts, minlength = n_columns)
+        current_totals = np.bincount(column_ids, weights = current_counts, minlength = n_columns)
+        expected = reference_counts * (current_totals / np.maximum(reference_totals, 1))[column_ids]
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            terms = (current_counts - expected) ** 2 / expected
+        terms = np.where(expected == 0, np.where(current_counts > 0, np.inf, 0.0), terms)
+
+        statistics = np.bincount(column_ids, weights = terms, minlength = n_columns)
+        degrees_of_freedom = np.bincount(column_ids, minlength = n_columns) - 1
+        p_values = np.where(degrees_of_freedom > 0, chdtrc(np.maximum(degrees_of_freedom, 1), statistics), 1.0)
+        return statistics, p_values
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def psi_columns(reference_counts: np.ndarray, current_counts: np.ndarray, column_ids: np.ndarray,
+                n_columns: int, eps: float = 1e-4) -> np.ndarray:
+    """
+    Population Stability Index of every column, computed from flattened category (or bin) counts.
+    """
+    try:
+        reference_totals = np.bincount(column_ids, weights = reference_counts, minlength = n_columns)
+        current_totals = np.bincount(column_ids, weights = current_counts, minlength = n_columns)
+        reference_share = np.clip(reference_counts / np.maximum(reference_totals, 1)[column_ids], eps, None)
+        current_share = np.clip(current_counts / np.maximum(current_totals, 1)[column_ids], eps, None)
+        terms = (current_share - reference_share) * np.log(current_share / reference_share)
+        return np.bincount(column_ids, weights = terms, minlength = n_columns)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def ks_from_binned_counts(reference_counts: np.ndarray, current_counts: np.ndarray, column_ids: np.ndarray,
+                          n_columns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kolmogorov-Smirnov test computed from histogram counts over shared bins, for all columns at once.
+    The statistic is the largest gap between the two cumulative bin shares, which never exceeds the exact
+    statistic; p-values use the asymptotic distribution with the row counts of both samples.
+    """
+    try:
+        reference_totals = np.bincount(column_ids, weights = reference_counts, minlength = n_columns)
+        current_totals = np.bincount(column_ids, weights = current_counts, minlength = n_columns)
+        share_gap = (reference_counts / np.maximum(reference_totals, 1)[column_ids]
+                     - current_counts / np.maximum(current_totals, 1)[column_ids])
+
+        # Cumulative sums restarted at the first bin of every column
+        cumulative_gap = np.cumsum(share_gap)
+        column_starts = np.searchsorted(column_ids, np.arange(n_columns))
+        column_offsets = np.concatenate([[0.0], cumulative_gap])[column_starts]
+        cumulative_gap = cumulative_gap - column_offsets[column_ids]
+        statistics = np.zeros(n_columns)
+        np.maximum.at(statistics, column_ids, np.abs(cumulative_gap))
+
+        effective_n = np.round(reference_totals * current_totals / np.maximum(reference_totals + current_totals, 1))
+        p_values = kstwo.sf(statistics, np.maximum(effective_n, 1))
+        return statistics, p_values
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def _get_categorical_features(categorical_columns: List[str], reference_counts: np.ndarray, current_counts: np.ndarray,
+                              column_ids: np.ndarray, threshold: float, categorical_stat_test: str,
+                              psi_threshold: float) -> dict:
+    n_columns = len(categorical_columns)
+    features = {}
+    if categorical_stat_test == "psi":
+        statistics = psi_columns(reference_counts, current_counts, column_ids, n_columns)
+        for column, statistic in zip(categorical_columns, statistics):
+            features[column] = {"column_type": "cat", "stat_test": "psi", "statistic": float(statistic),
+                                "drift_detected": bool(statistic >= psi_threshold)}
+    else:
+        statistics, p_values = chisquare_columns(reference_counts, current_counts, column_ids, n_columns)
+        for column, statistic, p_value in zip(categorical_columns, statistics, p_values):
+            features[column] = {"column_type": "cat", "stat_test": "chisquare", "statistic": float(statistic),
+                                "p_value": float(p_value), "drift_detected": bool(p_value < threshold)}
+    return features
+
+
+
+def _summarize_drift(features: dict, threshold: float, drift_share: float) -> dict:
+    n_features = len(features)
+    n_drifted_features = sum(feature["drift_detected"] for feature in features.values())
+    share_drifted_features = n_drifted_features / n_features if n_features else 0.0
+    return {
+        "dataset_drift": bool(n_features > 0 and share_drifted_features >= drift_share),
+        "n_features": n_features,
+        "n_drifted_features": n_drifted_features,
+        "share_drifted_features": share_drifted_features,
+        "threshold": threshold,
+        "drift_share": drift_share,
+        "features": features
+    }
+
+
+
+def get_binned_drift_report(numerical_columns: List[str], reference_bin_counts: np.ndarray, current_bin_counts: np.ndarray,
+                            bin_column_ids: np.ndarray, categorical_columns: List[str], reference_category_counts: np.ndarray,
+                            current_category_counts: np.ndarray, category_column_ids: np.ndarray, threshold: float = 0.05,
+                            drift_share: float = 0.5, categorical_stat_test: str = "chisquare",
+                            psi_threshold: float = 0.1) -> dict:
+    """
+    Compares current data against reference data column by column, from histogram counts of the numerical columns
+    and frequency tables of the categorical columns: binned Kolmogorov-Smirnov for numerical columns, chi-square or
+    PSI for categorical columns. A column drifts when its p-value is below `threshold` (or its PSI reaches
+    `psi_threshold`), and the dataset drifts when at least `drift_share` of the columns drift. Counts are flattened
+    across columns, with `*_column_ids` giving the column each bin or category belongs to.
+    """
+    try:
+        features = {}
+        if numerical_columns:
+            statistics, p_values = ks_from_binned_counts(reference_bin_counts, current_bin_counts, bin_column_ids,
+                                                         len(numerical_columns))
+            for column, statistic, p_value in zip(numerical_columns, statistics, p_values):
+                features[column] = {"column_type": "num", "stat_test": "ks_binned", "statistic": float(statistic),
+                                    "p_value": float(p_value), "drift_detected": bool(p_value < threshold)}
+
+        if categorical_columns:
+            features.update(_get_categorical_features(categorical_columns, reference_category_counts, current_category_counts,
+                                                      category_column_ids, threshold, categorical_stat_test, psi_threshold))
+
+        return _summarize_drift(features, threshold, drift_share)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
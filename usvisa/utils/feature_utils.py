@@ -0,0 +1,37 @@
+import sys
+from typing import List, Tuple
+
+import pandas as pd
+
+from usvisa.exception.exception import UsVisaException
+from usvisa.entity.estimator import TargetValueMapping
+from usvisa.constants import TARGET_COLUMN, CURRENT_YEAR, DATA_TRANSFORMATION_TARGET_DTYPE
+from usvisa.utils.main_utils import time_step
+
+
+def engineer_features(dataframe: pd.DataFrame, drop_cols: List[str], memory_profile: dict = None) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Splits a dataset into input features and encoded target, shared by the training and testing datasets.
+    Every step works in place on `dataframe`, which is consumed: the target column is popped off, the
+    'company_age' column is added and `drop_cols` are dropped without copying the remaining columns.
+    The time of each step is recorded in `memory_profile` when it is given.
+    """
+    try:
+        memory_profile = {} if memory_profile is None else memory_profile
+
+        with time_step(memory_profile, "pop_target"):
+            target = dataframe.pop(TARGET_COLUMN)
+
+        with time_step(memory_profile, "encode_target"):
+            target = target.map(TargetValueMapping()._asdict()).astype(DATA_TRANSFORMATION_TARGET_DTYPE)
+
+        with time_step(memory_profile, "add_company_age"):
+            dataframe["company_age"] = CURRENT_YEAR - dataframe["yr_of_estab"].to_numpy()
+
+        with time_step(memory_profile, "drop_columns"):
+            dataframe.drop(columns = drop_cols, inplace = True)
+
+        return dataframe, target
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
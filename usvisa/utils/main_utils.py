@@ -1,8 +1,15 @@
 import os
 import sys
+import json
+import time
+import hashlib
+import tracemalloc
+import dataclasses
+from contextlib import contextmanager
 
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 import dill
 import yaml
 
@@ -42,6 +49,20 @@ def write_yaml_file(file_path: str, content: object, replace: bool = False) -> N
 
 
 
+def write_json_file(file_path: str, content: object) -> None:
+    """
+    Writes content to a JSON file, creating any necessary directories. An existing file is overwritten.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+        with open(file_path, "w") as file:
+            json.dump(content, file, indent = 2)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
 def load_object(file_path: str) -> object:
     """
     Loads an object from a specified file path using dill serialization.
@@ -92,11 +113,14 @@ def save_numpy_array_data(file_path: str, array: np.array):
     
 
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: str = None) -> np.array:
     """
     Loads a NumPy array from a specified file path. If the file does not exist or cannot be read, an exception is raised.
+    With `mmap_mode` (e.g. "r"), the array is memory-mapped instead of read, so pages are only loaded when accessed.
     """
     try:
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode = mmap_mode)
         with open(file_path, 'rb') as file_obj:
             return np.load(file_obj)
     
@@ -105,6 +129,38 @@ def load_numpy_array_data(file_path: str) -> np.array:
 
 
 
+def save_feature_matrix(file_path: str, matrix: object, dtype: str = "float32") -> None:
+    """
+    Saves a feature matrix with the given dtype: scipy sparse matrices as an uncompressed CSR .npz file,
+    dense arrays as a .npy file.
+    """
+    try:
+        if sp.issparse(matrix):
+            os.makedirs(os.path.dirname(file_path), exist_ok = True)
+            sp.save_npz(file_path, sp.csr_matrix(matrix, dtype = dtype), compressed = False)
+        else:
+            save_numpy_array_data(file_path, array = np.ascontiguousarray(matrix, dtype = dtype))
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def load_feature_matrix(file_path: str, mmap_mode: str = None) -> object:
+    """
+    Loads a feature matrix saved with `save_feature_matrix`: .npz files as a CSR matrix, .npy files as an array,
+    memory-mapped with `mmap_mode`. Sparse matrices are always loaded into memory.
+    """
+    try:
+        if file_path.endswith(".npz"):
+            return sp.load_npz(file_path).tocsr()
+        return load_numpy_array_data(file_path, mmap_mode = mmap_mode)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
 def drop_columns(df: pd.DataFrame, cols: list)-> pd.DataFrame:
     """
     Drops specified columns from a DataFrame.
@@ -115,4 +171,81 @@ def drop_columns(df: pd.DataFrame, cols: list)-> pd.DataFrame:
         return df
     
     except Exception as e:
-        raise UsVisaException(e, sys)
\ No newline at end of file
+        raise UsVisaException(e, sys)
+
+
+
+def get_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Computes the SHA-256 hash of a file's content. The file is read in chunks so that large
+    artifacts can be hashed without loading them into memory.
+    """
+    try:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def rebase_artifact_paths(obj: object, old_prefix: str, new_prefix: str) -> object:
+    """
+    Returns a copy of a config or artifact dataclass where every string field starting with
+    `old_prefix` is moved under `new_prefix`. Nested dataclasses are rebased recursively.
+    """
+    try:
+        changes = {}
+        for field in dataclasses.fields(obj):
+            value = getattr(obj, field.name)
+            if dataclasses.is_dataclass(value):
+                changes[field.name] = rebase_artifact_paths(value, old_prefix, new_prefix)
+            elif isinstance(value, str) and value.startswith(old_prefix):
+                changes[field.name] = new_prefix + value[len(old_prefix):]
+        return dataclasses.replace(obj, **changes)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+
+@contextmanager
+def trace_memory(profile: dict, step: str):
+    """
+    Records the time, the peak traced memory and the net allocation of the enclosed block under `profile[step]`.
+    Unless tracemalloc is already tracing, tracing is started for the block only, as it slows down every allocation
+    of the process, including those of concurrent pipeline stages. The peak then only counts memory allocated in the block.
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        profile[step] = {
+            "seconds": round(time.perf_counter() - start_time, 3),
+            "peak_memory_mb": round(peak_memory / 1024 ** 2, 2),
+            "allocated_mb": round((current_memory - start_memory) / 1024 ** 2, 2)
+        }
+        if not tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def time_step(profile: dict, step: str):
+    """
+    Records the time of the enclosed block under `profile[step]`, for steps whose memory is not traced.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile[step] = {"seconds": round(time.perf_counter() - start_time, 3)}
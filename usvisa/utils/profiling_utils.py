@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import cProfile
+import threading
+import functools
+import dataclasses
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+from usvisa.utils.main_utils import write_json_file
+
+_active_profiler = None
+
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    Returns the resident set size of the process, read from /proc on Linux, or None where it is not available.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_io_bytes() -> Optional[Dict[str, int]]:
+    """
+    Returns the bytes the process has read and written so far (rchar/wchar of /proc/self/io, which includes
+    page-cache hits), or None where it is not available.
+    """
+    try:
+        with open("/proc/self/io") as file:
+            counters = dict(line.split(": ") for line in file.read().splitlines())
+        return {"read": int(counters["rchar"]), "written": int(counters["wchar"])}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def count_rows(file_path: str) -> Optional[int]:
+    """
+    Counts the data rows of a CSV file, or reads the number of rows of a .npy array (memory-mapped, so only its
+    header is read) or of a sparse .npz matrix from its stored shape. Returns None for other files.
+    """
+    try:
+        if file_path.endswith(".csv"):
+            n_lines = 0
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(16 * 1024 * 1024), b""):
+                    n_lines += block.count(b"\n")
+            return max(n_lines - 1, 0)
+        if file_path.endswith(".npy"):
+            shape = np.load(file_path, mmap_mode = "r").shape
+            return int(shape[0]) if shape else 1
+        if file_path.endswith(".npz"):
+            with np.load(file_path) as npz:
+                return int(npz["shape"][0]) if "shape" in npz else None
+        return None
+
+    except Exception:
+        return None
+
+
+
+class RunProfiler:
+    """
+    RunProfiler records the performance of the profiled stages of a training run: wall time, CPU time of the
+    calling thread and of the whole process, the peak resident memory (sampled by a background thread), the bytes
+    read and written by the process, and the rows of the files in the input and output artifacts.
+    Process-wide counters include the stages running concurrently and exclude joblib worker processes.
+    With `cprofile_dir`, the outermost stages are also run under cProfile and their stats are dumped to `<stage>.prof`.
+    """
+    def __init__(self, cprofile_dir: str = None, memory_sample_seconds: float = 0.05):
+        self.cprofile_dir = cprofile_dir
+        self.memory_sample_seconds = memory_sample_seconds
+        self.records: List[dict] = []
+        self.lock = threading.Lock()
+        self.cprofile_lock = threading.Lock()
+        self.row_counts: Dict[tuple, Optional[int]] = {}
+        self.local = threading.local()
+
+    def activate(self) -> None:
+        global _active_profiler
+        _active_profiler = self
+
+    def deactivate(self) -> None:
+        global _active_profiler
+        if _active_profiler is self:
+            _active_profiler = None
+
+    def get_artifact_rows(self, artifacts: List[object]) -> Dict[str, int]:
+        """
+        Counts the rows of the existing files referenced by string fields of artifact dataclasses, caching the
+        counts by file path, size and modification time.
+        """
+        rows = {}
+        for artifact in artifacts:
+            for field in dataclasses.fields(artifact):
+                file_path = getattr(artifact, field.name)
+                if not isinstance(file_path, str) or not os.path.isfile(file_path):
+                    continue
+                stat = os.stat(file_path)
+                key = (file_path, stat.st_size, stat.st_mtime)
+                if key not in self.row_counts:
+                    self.row_counts[key] = count_rows(file_path)
+                if self.row_counts[key] is not None:
+                    rows[field.name] = self.row_counts[key]
+        return rows
+
+    @staticmethod
+    def get_input_artifacts(args: tuple, kwargs: dict) -> List[object]:
+        # Components hold their input artifacts as attributes named *_artifact
+        owner_artifacts = []
+        if args and hasattr(args[0], "__dict__"):
+            owner_artifacts = [value for name, value in vars(args[0]).items() if name.endswith("_artifact")]
+        return [value for value in owner_artifacts + list(args[1:]) + list(kwargs.values())
+                if dataclasses.is_dataclass(value) and not isinstance(value, type)]
+
+    def run(self, stage: str, func: Callable, args: tuple, kwargs: dict) -> object:
+        stack = getattr(self.local, "stack", [])
+        self.local.stack = stack + [stage]
+        record = {"stage": stage, "parent": stack[-1] if stack else None, "started_at": datetime.now().isoformat(),
+                  "rows_in": self.get_artifact_rows(self.get_input_artifacts(args, kwargs))}
+
+        peak_rss = [get_rss_bytes()]
+        sampling_done = threading.Event()
+        def sample_memory() -> None:
+            while not sampling_done.wait(self.memory_sample_seconds):
+                rss = get_rss_bytes()
+                if rss is not None and peak_rss[0] is not None:
+                    peak_rss[0] = max(peak_rss[0], rss)
+        sampler = threading.Thread(target = sample_memory, daemon = True)
+        sampler.start()
+
+        # Only one cProfile profiler can be active at a time, so nested and concurrent stages are not cProfiled
+        # separately: their calls are part of the dump of the outer stage
+        result, profile = None, None
+        if self.cprofile_dir is not None and not stack and self.cprofile_lock.acquire(blocking = False):
+            profile = cProfile.Profile()
+        start_io, start_wall, start_thread_cpu, start_process_cpu = get_io_bytes(), time.perf_counter(), time.thread_time(), time.process_time()
+        try:
+            if profile is not None:
+                profile.enable()
+            result = func(*args, **kwargs)
+            record["status"] = "completed"
+            return result
+
+        except Exception:
+            record["status"] = "failed"
+            raise
+
+        finally:
+            if profile is not None:
+                profile.disable()
+            sampling_done.set()
+            sampler.join()
+            end_io = get_io_bytes()
+            record.update({
+                "wall_seconds": round(time.perf_counter() - start_wall, 3),
+                "cpu_seconds": round(time.thread_time() - start_thread_cpu, 3),
+                "process_cpu_seconds": round(time.process_time() - start_process_cpu, 3),
+                "peak_rss_mb": None if peak_rss[0] is None else round(peak_rss[0] / 1024 ** 2, 2),
+                "bytes_read": None if start_io is None or end_io is None else end_io["read"] - start_io["read"],
+                "bytes_written": None if start_io is None or end_io is None else end_io["written"] - start_io["written"],
+                "rows_out": self.get_artifact_rows([result]) if dataclasses.is_dataclass(result) else {}
+            })
+            if profile is not None:
+                self.cprofile_lock.release()
+                record["cprofile_file_path"] = os.path.join(self.cprofile_dir, f"{stage}.prof")
+                os.makedirs(self.cprofile_dir, exist_ok = True)
+                profile.dump_stats(record["cprofile_file_path"])
+            self.local.stack = stack
+            with self.lock:
+                self.records.append(record)
+            logging.info(f"Profiled {stage}: {record['wall_seconds']}s wall, {record['cpu_seconds']}s CPU, "
+                         f"peak RSS {record['peak_rss_mb']} MB")
+
+    def write(self, file_path: str) -> None:
+        try:
+            with self.lock:
+                write_json_file(file_path, {"stages": self.records})
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+
+
+def profile_stage(func: Callable) -> Callable:
+    """
+    Decorator recording a stage method with the active RunProfiler, under the qualified name of the method.
+    Without an active profiler the method runs unchanged.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler
+        if profiler is None:
+            return func(*args, **kwargs)
+        return profiler.run(func.__qualname__, func, args, kwargs)
+    return wrapper
@@ -0,0 +1,136 @@
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE, RandomOverSampler
+from imblearn.under_sampling import EditedNearestNeighbours, RandomUnderSampler
+from sklearn.model_selection import StratifiedKFold
+from sklearn.neighbors import NearestNeighbors
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+
+RESAMPLING_METHODS = ("smoteenn", "smote", "random_over", "random_under", "class_weight", "none")
+
+
+def get_resampler(resampling_config: dict) -> Optional[object]:
+    """
+    Creates the imblearn sampler configured in the `resampling` block of the transformation YAML.
+    Returns None for the methods that do not resample ("class_weight" and "none").
+    The nearest-neighbour searches of SMOTE and ENN run on `n_jobs` cores.
+    """
+    try:
+        method = resampling_config.get("method", "smoteenn")
+        if method not in RESAMPLING_METHODS:
+            raise ValueError(f"Unknown resampling method {method}, expected one of {RESAMPLING_METHODS}")
+
+        sampling_strategy = resampling_config.get("sampling_strategy", "auto")
+        random_state = resampling_config.get("random_state")
+        n_jobs = resampling_config.get("n_jobs", -1)
+        # Neighbour estimators passed to imblearn are used as-is, so they must include the sample itself
+        k_neighbors = NearestNeighbors(n_neighbors = resampling_config.get("k_neighbors", 5) + 1, n_jobs = n_jobs)
+
+        if method == "smoteenn":
+            return SMOTEENN(
+                smote = SMOTE(sampling_strategy = sampling_strategy, k_neighbors = k_neighbors, random_state = random_state),
+                # SMOTEENN's own ENN cleans every class; an explicit ENN defaults to the majority class only
+                enn = EditedNearestNeighbours(
+                    sampling_strategy = "all",
+                    n_neighbors = NearestNeighbors(n_neighbors = resampling_config.get("enn_n_neighbors", 3) + 1, n_jobs = n_jobs)),
+                random_state = random_state
+            )
+        if method == "smote":
+            return SMOTE(sampling_strategy = sampling_strategy, k_neighbors = k_neighbors, random_state = random_state)
+        if method == "random_over":
+            return RandomOverSampler(sampling_strategy = sampling_strategy, random_state = random_state)
+        if method == "random_under":
+            return RandomUnderSampler(sampling_strategy = sampling_strategy, random_state = random_state)
+        return None
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def resample(X, y: np.ndarray, resampler: object, chunk_size: Optional[int] = None,
+             random_state: Optional[int] = None) -> Tuple[object, np.ndarray, dict]:
+    """
+    Resamples the data with the given sampler and reports the time it took. Tracing is left to the caller: when
+    tracemalloc is already tracing, the report also holds the peak traced memory since the caller last reset it.
+    With `chunk_size`, the rows are split into stratified chunks that are resampled independently, so the
+    nearest-neighbour searches only ever see one chunk. Without a sampler the data is returned unchanged.
+    """
+    try:
+        y = np.asarray(y)
+        start_time = time.perf_counter()
+
+        if resampler is None:
+            X_res, y_res = X, y
+        elif chunk_size and len(y) > chunk_size:
+            n_chunks = int(np.ceil(len(y) / chunk_size))
+            splitter = StratifiedKFold(n_splits = n_chunks, shuffle = True, random_state = random_state)
+            X_parts, y_parts = [], []
+            for _, chunk_index in splitter.split(np.zeros(len(y)), y):
+                X_chunk, y_chunk = resampler.fit_resample(X[chunk_index], y[chunk_index])
+                X_parts.append(X_chunk)
+                y_parts.append(y_chunk)
+            X_res = sp.vstack(X_parts, format = "csr") if sp.issparse(X) else np.concatenate(X_parts)
+            y_res = np.concatenate(y_parts)
+        else:
+            X_res, y_res = resampler.fit_resample(X, y)
+
+        seconds = time.perf_counter() - start_time
+
+        classes_before, counts_before = np.unique(y, return_counts = True)
+        classes_after, counts_after = np.unique(y_res, return_counts = True)
+        report = {
+            "method": type(resampler).__name__ if resampler is not None else None,
+            "rows_before": int(len(y)),
+            "rows_after": int(len(y_res)),
+            "class_counts_before": {int(c): int(n) for c, n in zip(classes_before, counts_before)},
+            "class_counts_after": {int(c): int(n) for c, n in zip(classes_after, counts_after)},
+            "seconds": round(seconds, 3)
+        }
+        if tracemalloc.is_tracing():
+            report["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        logging.info(f"Resampling report: {report}")
+        return X_res, y_res, report
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def merge_resampling_reports(reports: List[dict]) -> dict:
+    """
+    Combines the reports of data resampled chunk by chunk into one report: rows, class counts and time are
+    summed and the peak memory, when traced, is the largest peak of any chunk.
+    """
+    try:
+        def sum_counts(key: str) -> dict:
+            counts = {}
+            for report in reports:
+                for label, count in report[key].items():
+                    counts[label] = counts.get(label, 0) + count
+            return counts
+
+        merged_report = {
+            "method": reports[0]["method"] if reports else None,
+            "chunks": len(reports),
+            "rows_before": sum(report["rows_before"] for report in reports),
+            "rows_after": sum(report["rows_after"] for report in reports),
+            "class_counts_before": sum_counts("class_counts_before"),
+            "class_counts_after": sum_counts("class_counts_after"),
+            "seconds": round(sum(report["seconds"] for report in reports), 3)
+        }
+        peaks = [report["peak_memory_mb"] for report in reports if "peak_memory_mb" in report]
+        if peaks:
+            merged_report["peak_memory_mb"] = max(peaks)
+        return merged_report
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
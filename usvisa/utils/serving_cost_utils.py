@@ -0,0 +1,49 @@
+import sys
+import time
+
+import dill
+import numpy as np
+
+from usvisa.exception.exception import UsVisaException
+
+
+def measure_serving_cost(model: object, X: object, n_single_rows: int = 200, batch_size: int = 1000,
+                         n_repeats: int = 3) -> dict:
+    """
+    Measures what a fitted model costs to serve on held-out rows of `X`, e.g. a UsVisaModel on raw feature rows:
+    its serialized size (dill, as saved with the trained model), its deserialization time, the p50/p99 latency of
+    single-row predictions and the latency and throughput of batch predictions. Load and batch timings keep the
+    fastest of `n_repeats` runs.
+    """
+    try:
+        serialized = dill.dumps(model)
+        load_seconds = []
+        for _ in range(n_repeats):
+            start_time = time.perf_counter()
+            dill.loads(serialized)
+            load_seconds.append(time.perf_counter() - start_time)
+
+        single_row_latencies = []
+        for row in range(min(n_single_rows, X.shape[0])):
+            start_time = time.perf_counter()
+            model.predict(X[row:row + 1])
+            single_row_latencies.append(time.perf_counter() - start_time)
+
+        batch = X[:min(batch_size, X.shape[0])]
+        batch_seconds = []
+        for _ in range(n_repeats):
+            start_time = time.perf_counter()
+            model.predict(batch)
+            batch_seconds.append(time.perf_counter() - start_time)
+
+        return {
+            "model_size_mb": round(len(serialized) / 1024 ** 2, 4),
+            "load_seconds": round(min(load_seconds), 4),
+            "p50_latency_ms": round(float(np.percentile(single_row_latencies, 50)) * 1000, 3),
+            "p99_latency_ms": round(float(np.percentile(single_row_latencies, 99)) * 1000, 3),
+            "batch_latency_ms": round(min(batch_seconds) * 1000, 3),
+            "batch_rows_per_second": round(batch.shape[0] / max(min(batch_seconds), 1e-9), 1)
+        }
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
@@ -0,0 +1,96 @@
+import os
+import sys
+import shutil
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from usvisa.exception.exception import UsVisaException
+
+
+def read_chunks(file_path: str, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """
+    Yields a CSV or Parquet file as DataFrame chunks of at most `chunk_size` rows.
+    Parquet files are read batch by batch with pyarrow, which is only needed for Parquet input.
+    """
+    try:
+        if file_path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size = chunk_size):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(file_path, chunksize = chunk_size)
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+class RowSampler:
+    """
+    RowSampler keeps a uniform random sample of at most `sample_size` rows over a stream of chunks.
+    Every row gets a random key and the rows with the smallest keys seen so far are kept, so memory is
+    bounded by the sample size whatever the length of the stream.
+    """
+    SAMPLE_KEY_COLUMN: str = "_sample_key"
+
+    def __init__(self, sample_size: int, random_state: Optional[int] = None):
+        self.sample_size = sample_size
+        self.random_generator = np.random.default_rng(random_state)
+        self._sample: Optional[pd.DataFrame] = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        chunk = chunk.assign(**{self.SAMPLE_KEY_COLUMN: self.random_generator.random(len(chunk))})
+        combined = chunk if self._sample is None else pd.concat([self._sample, chunk], ignore_index = True)
+        self._sample = combined.nsmallest(self.sample_size, self.SAMPLE_KEY_COLUMN)
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        return self._sample.drop(columns = [self.SAMPLE_KEY_COLUMN]).reset_index(drop = True)
+
+
+
+class NpyChunkWriter:
+    """
+    NpyChunkWriter writes a .npy array whose number of rows is not known in advance, e.g. the output of a
+    transformation streamed chunk by chunk. Rows are appended to a raw part file; `close` writes the .npy header
+    with the final shape and copies the rows behind it, so the array never has to fit in memory.
+    """
+    def __init__(self, file_path: str, dtype: str):
+        self.file_path = file_path
+        self.part_file_path = f"{file_path}.part"
+        self.dtype = np.dtype(dtype)
+        self.n_rows = 0
+        self.row_shape = None
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+        self.part_file = open(self.part_file_path, "wb")
+
+    def write(self, array: np.ndarray) -> None:
+        try:
+            array = np.ascontiguousarray(array, dtype = self.dtype)
+            if self.row_shape is None:
+                self.row_shape = array.shape[1:]
+            elif array.shape[1:] != self.row_shape:
+                raise ValueError(f"Chunk rows of shape {array.shape[1:]} do not match {self.row_shape} in {self.file_path}")
+            array.tofile(self.part_file)
+            self.n_rows += len(array)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
+
+    def close(self) -> None:
+        try:
+            self.part_file.close()
+            header = {
+                "descr": np.lib.format.dtype_to_descr(self.dtype),
+                "fortran_order": False,
+                "shape": (self.n_rows,) + tuple(self.row_shape or ())
+            }
+            with open(self.file_path, "wb") as file_obj, open(self.part_file_path, "rb") as part_file:
+                np.lib.format.write_array_header_1_0(file_obj, header)
+                shutil.copyfileobj(part_file, file_obj, 16 * 1024 * 1024)
+            os.remove(self.part_file_path)
+
+        except Exception as e:
+            raise UsVisaException(e, sys)
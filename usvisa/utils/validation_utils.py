@@ -0,0 +1,145 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import effective_n_jobs
+
+from usvisa.logger.logger import logging
+from usvisa.exception.exception import UsVisaException
+
+REJECTION_REASON_COLUMN: str = "rejection_reason"
+
+
+def learn_allowed_categories(file_path: str, columns: List[str], chunk_size: int = 100000) -> Dict[str, List[str]]:
+    """
+    Learns the set of values of categorical columns by streaming a CSV file in chunks.
+    """
+    try:
+        categories = {column: set() for column in columns}
+        if not columns:
+            return {}
+        for chunk in pd.read_csv(file_path, usecols = columns, chunksize = chunk_size):
+            for column in columns:
+                categories[column].update(chunk[column].dropna().astype(str).unique())
+        return {column: sorted(values) for column, values in categories.items()}
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def get_row_validation_rules(schema_config: dict, learned_categories: Dict[str, List[str]] = None) -> dict:
+    """
+    Builds the row validation rules from the schema: required columns (no nulls), numerical columns
+    (type and range checks) and categorical columns (allowed values, declared or learned).
+    """
+    try:
+        allowed_categories = dict(learned_categories or {})
+        allowed_categories.update({column: [str(value) for value in values]
+                                   for column, values in (schema_config.get("allowed_categories") or {}).items()})
+        return {
+            "required_columns": [list(column.keys())[0] for column in schema_config["columns"]],
+            "numerical_columns": schema_config["numerical_columns"],
+            "numerical_ranges": schema_config.get("numerical_ranges") or {},
+            "allowed_categories": allowed_categories
+        }
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def validate_rows(dataframe: pd.DataFrame, rules: dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Checks every row of a chunk against the validation rules with column-wise vectorized masks.
+    Returns the valid rows and the rejected rows, the latter with a column listing every failed check.
+    """
+    try:
+        failures = {}
+        for column in rules["required_columns"]:
+            if column in dataframe.columns:
+                failures[f"{column}:null"] = dataframe[column].isna().to_numpy()
+
+        for column in rules["numerical_columns"]:
+            if column not in dataframe.columns:
+                continue
+            values = pd.to_numeric(dataframe[column], errors = "coerce").to_numpy(dtype = np.float64)
+            failures[f"{column}:type"] = np.isnan(values) & dataframe[column].notna().to_numpy()
+            column_range = rules["numerical_ranges"].get(column, {})
+            with np.errstate(invalid = "ignore"):
+                if "min" in column_range:
+                    failures[f"{column}:below_min"] = values < column_range["min"]
+                if "max" in column_range:
+                    failures[f"{column}:above_max"] = values > column_range["max"]
+
+        for column, allowed_values in rules["allowed_categories"].items():
+            if column not in dataframe.columns:
+                continue
+            values = dataframe[column]
+            failures[f"{column}:category"] = (values.notna() & ~values.astype(str).isin(allowed_values)).to_numpy()
+
+        failure_masks = pd.DataFrame(failures, index = dataframe.index)
+        rejected = failure_masks.any(axis = 1).to_numpy()
+
+        invalid_df = dataframe[rejected].copy()
+        if len(invalid_df):
+            # Multiplying the boolean masks with the check names concatenates the names of the failed checks
+            invalid_df[REJECTION_REASON_COLUMN] = failure_masks[rejected].dot(failure_masks.columns + ";").str.rstrip(";")
+        else:
+            invalid_df[REJECTION_REASON_COLUMN] = pd.Series(dtype = object)
+        return dataframe[~rejected], invalid_df
+
+    except Exception as e:
+        raise UsVisaException(e, sys)
+
+
+
+def validate_file(file_path: str, valid_file_path: str, invalid_file_path: str, rules: dict,
+                  chunk_size: int = 100000, n_jobs: int = 1) -> Tuple[int, int]:
+    """
+    Validates a CSV file chunk by chunk, optionally on a process pool, writing the valid rows to `valid_file_path`
+    and the rejected rows with their rejection reasons to `invalid_file_path`. Chunks are written in input order,
+    and at most 2 * n_jobs chunks are in flight to bound memory. The invalid file is only created if rows are
+    rejected. Returns the number of valid and rejected rows.
+    """
+    try:
+        os.makedirs(os.path.dirname(valid_file_path), exist_ok = True)
+        for path in (valid_file_path, invalid_file_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+        counts = {"valid": 0, "invalid": 0}
+
+        def write_result(valid_df: pd.DataFrame, invalid_df: pd.DataFrame) -> None:
+            valid_df.to_csv(valid_file_path, mode = "a", index = False, header = not os.path.exists(valid_file_path))
+            counts["valid"] += len(valid_df)
+            if len(invalid_df):
+                os.makedirs(os.path.dirname(invalid_file_path), exist_ok = True)
+                invalid_df.to_csv(invalid_file_path, mode = "a", index = False, header = not os.path.exists(invalid_file_path))
+                counts["invalid"] += len(invalid_df)
+
+        # Resolves -1 and other negative counts to a worker count, as ProcessPoolExecutor does not accept them
+        n_jobs = effective_n_jobs(n_jobs)
+        chunks = pd.read_csv(file_path, chunksize = chunk_size)
+        if n_jobs == 1:
+            for chunk in chunks:
+                write_result(*validate_rows(chunk, rules))
+        else:
+            with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+                in_flight = deque()
+                for chunk in chunks:
+                    in_flight.append(executor.submit(validate_rows, chunk, rules))
+                    if len(in_flight) >= 2 * n_jobs:
+                        write_result(*in_flight.popleft().result())
+                while in_flight:
+                    write_result(*in_flight.popleft().result())
+
+        logging.info(f"Validated {file_path}: {counts['valid']} valid rows, {counts['invalid']} rejected rows")
+        return counts["valid"], counts["invalid"]
+
+    except Exception as e:
+        raise UsVisaException(e, sys)